@@ -0,0 +1,45 @@
+import { type NextRequest, NextResponse } from "next/server"
+import { getQueryWorker } from "@/lib/query-worker"
+
+// One pass for "Analyse Selected Text": the resident query worker retrieves once and
+// returns the answer and insights together. The podcast is requested separately from
+// /api/generate-podcast with the returned context_text, so it never holds up this
+// response or occupies the shared worker.
+export async function POST(request: NextRequest) {
+  try {
+    const { content, num = 5, source } = await request.json()
+
+    if (!content) {
+      return NextResponse.json({ error: "Content is required" }, { status: 400 })
+    }
+
+    console.log(`[v0] Analysing selection (${content.length} characters) from ${source ?? "unknown document"}`)
+
+    try {
+      const result = await getQueryWorker().analyse(content, { num, source })
+      if (result.error) {
+        console.error("[v0] Analysis failed:", result.error)
+        return NextResponse.json(result, { status: 500 })
+      }
+      if (result.errors && Object.keys(result.errors).length > 0) {
+        console.error("[v0] Analysis partly failed:", JSON.stringify(result.errors))
+      }
+      if (result.selection) {
+        console.log("[v0] Selection fast path:", result.selection.fast_path, result.selection.reason ?? "")
+      }
+      return NextResponse.json(result)
+    } catch (workerError) {
+      console.error("[v0] Query worker failed:", workerError)
+      return NextResponse.json(
+        {
+          error: "Analysis failed",
+          details: workerError instanceof Error ? workerError.message : String(workerError),
+        },
+        { status: 500 },
+      )
+    }
+  } catch (error) {
+    console.error("[v0] Analyse API error:", error)
+    return NextResponse.json({ error: "Internal server error" }, { status: 500 })
+  }
+}
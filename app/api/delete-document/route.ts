@@ -1,8 +1,27 @@
 import { type NextRequest, NextResponse } from "next/server"
 import { unlink } from "fs/promises"
 import { existsSync } from "fs"
+import { execFile } from "child_process"
+import { promisify } from "util"
 import path from "path"
 
+const execFileAsync = promisify(execFile)
+
+// Drops the file's chunks from the vector store, lexical index and manifest. The name
+// is passed as an argument, never through a shell, and after "--" so it can't be an option.
+async function removeFromIndex(fileName: string) {
+  const { stdout, stderr } = await execFileAsync("python", ["scripts/maintain_index.py", "delete", "--", fileName], {
+    cwd: process.cwd(),
+    timeout: 120000,
+  })
+  if (stderr) {
+    console.log("[v0] Python stderr:", stderr)
+  }
+
+  const resultMatch = stdout.match(/RESULT: (.+)/)
+  return resultMatch ? JSON.parse(resultMatch[1]) : { success: false, message: "No result found" }
+}
+
 export async function DELETE(request: NextRequest) {
   try {
     const { fileName } = await request.json()
@@ -11,17 +30,31 @@ export async function DELETE(request: NextRequest) {
       return NextResponse.json({ error: "No filename provided" }, { status: 400 })
     }
 
-    const filePath = path.join(process.cwd(), "docs", fileName)
+    const safeName = path.basename(fileName)
+    const filePath = path.join(process.cwd(), "docs", safeName)
     console.log("[v0] Attempting to delete file:", filePath)
 
-    if (existsSync(filePath)) {
+    const fileExists = existsSync(filePath)
+    if (fileExists) {
       await unlink(filePath)
-      console.log("[v0] Successfully deleted file:", fileName)
-      return NextResponse.json({ success: true })
+      console.log("[v0] Successfully deleted file:", safeName)
     } else {
       console.log("[v0] File not found for deletion:", filePath)
+    }
+
+    let index = null
+    try {
+      index = await removeFromIndex(safeName)
+      console.log("[v0] Index cleanup:", index.message)
+    } catch (indexError) {
+      // The file is gone either way; `maintain_index.py reconcile --apply` catches up later
+      console.error("[v0] Failed to remove document from index:", indexError)
+    }
+
+    if (!fileExists && !index?.removed_chunks_count) {
       return NextResponse.json({ error: "File not found" }, { status: 404 })
     }
+    return NextResponse.json({ success: true, index })
   } catch (error) {
     console.error("[v0] Error deleting document:", error)
     return NextResponse.json({ error: "Failed to delete document" }, { status: 500 })
@@ -4,7 +4,11 @@ import path from "path"
 
 export async function POST(request: NextRequest) {
   try {
-    const { content, gender = "F" } = await request.json()
+    // context is the retrieved text from /api/analyse-selection, so the dialogue is grounded
+    // in the same excerpts as the answer without retrieving again
+    // progressive writes the WAV as lines finish; the script then reports the file
+    // location in an early "audio_started" line before its final result line
+    const { content, gender = "F", format = "wav", context, progressive = false } = await request.json()
 
     if (!content) {
       return NextResponse.json({ error: "Content is required" }, { status: 400 })
@@ -31,13 +35,28 @@ export async function POST(request: NextRequest) {
     console.log(`[v0] Voice gender: ${gender}`)
 
     return new Promise((resolve) => {
-      const pythonProcess = spawn("python", [scriptPath, content, "--gender", gender])
+      const args = [scriptPath, content, "--gender", gender, "--format", format]
+      if (context) {
+        args.push("--context-stdin")
+      }
+      if (progressive) {
+        args.push("--progressive")
+      }
+      const pythonProcess = spawn("python", args)
+      if (context) {
+        pythonProcess.stdin.write(context)
+      }
+      pythonProcess.stdin.end()
 
       let output = ""
       let errorOutput = ""
 
       pythonProcess.stdout.on("data", (data) => {
-        output += data.toString()
+        const text = data.toString()
+        if (!output && text.includes('"audio_started"')) {
+          console.log(`[v0] Podcast audio started: ${text.split("\n")[0]}`)
+        }
+        output += text
       })
 
       pythonProcess.stderr.on("data", (data) => {
@@ -55,7 +74,9 @@ export async function POST(request: NextRequest) {
 
         if (code === 0) {
           try {
-            const result = JSON.parse(output)
+            // The result is the last line; earlier lines are progress events
+            const lines = output.trim().split("\n")
+            const result = JSON.parse(lines[lines.length - 1])
             if (result.ok) {
               console.log(`[v0] Podcast generated successfully: ${result.audio_file}`)
               resolve(
@@ -1,10 +1,9 @@
 import { type NextRequest, NextResponse } from "next/server"
-import { exec } from "child_process"
-import { promisify } from "util"
 import path from "path"
+import { getIngestJob, submitIngestJob, watchIngestJob } from "@/lib/ingest-jobs"
 
-const execAsync = promisify(exec)
-
+// Queues an ingestion job and returns its id straight away; progress and the
+// final result are read with GET ?jobId=..., or streamed with &stream=1.
 export async function POST(request: NextRequest) {
   try {
     const { documentPaths } = await request.json()
@@ -13,40 +12,38 @@ export async function POST(request: NextRequest) {
       return NextResponse.json({ success: false, message: "Document paths array is required" }, { status: 400 })
     }
 
-    console.log("[v0] Starting document ingestion for:", documentPaths)
+    console.log("[v0] Queueing document ingestion for:", documentPaths)
 
     // Convert relative paths to absolute paths
     const absolutePaths = documentPaths.map((docPath) => path.resolve(process.cwd(), docPath))
 
-    // Execute the Python ingest script
-    const command = `python scripts/ingest.py ${absolutePaths.map((p) => `"${p}"`).join(" ")}`
-    console.log("[v0] Executing command:", command)
-
-    const { stdout, stderr } = await execAsync(command, {
-      cwd: process.cwd(),
-      timeout: 120000, // 2 minute timeout
-    })
+    const result = await submitIngestJob(absolutePaths)
+    console.log("[v0] Ingestion job queued:", result.job_id)
 
-    console.log("[v0] Python stdout:", stdout)
-    if (stderr) {
-      console.log("[v0] Python stderr:", stderr)
-    }
+    return NextResponse.json(result, { status: result.success ? 202 : 500 })
+  } catch (error) {
+    console.error("[v0] Ingestion error:", error)
+    return NextResponse.json({ success: false, message: `Ingestion failed: ${error.message}` }, { status: 500 })
+  }
+}
 
-    // Parse the result from Python output
-    const resultMatch = stdout.match(/RESULT: (.+)/)
-    let result = { success: false, message: "No result found" }
+export async function GET(request: NextRequest) {
+  const jobId = request.nextUrl.searchParams.get("jobId")
+  if (!jobId || !/^[0-9a-f]+$/.test(jobId)) {
+    return NextResponse.json({ success: false, message: "A valid jobId is required" }, { status: 400 })
+  }
 
-    if (resultMatch) {
-      try {
-        result = JSON.parse(resultMatch[1])
-      } catch (e) {
-        console.error("[v0] Failed to parse Python result:", e)
-      }
-    }
+  if (request.nextUrl.searchParams.get("stream") === "1") {
+    return new Response(watchIngestJob(jobId), {
+      headers: { "Content-Type": "application/x-ndjson", "Cache-Control": "no-cache" },
+    })
+  }
 
-    return NextResponse.json(result)
+  try {
+    const result = await getIngestJob(jobId)
+    return NextResponse.json(result, { status: result.success ? 200 : 404 })
   } catch (error) {
-    console.error("[v0] Ingestion error:", error)
-    return NextResponse.json({ success: false, message: `Ingestion failed: ${error.message}` }, { status: 500 })
+    console.error("[v0] Ingestion status error:", error)
+    return NextResponse.json({ success: false, message: `Status check failed: ${error.message}` }, { status: 500 })
   }
 }
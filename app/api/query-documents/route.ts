@@ -1,10 +1,10 @@
 import { type NextRequest, NextResponse } from "next/server"
-import { spawn } from "child_process"
-import path from "path"
+import { getQueryWorker } from "@/lib/query-worker"
 
 export async function POST(request: NextRequest) {
   try {
-    const { query } = await request.json()
+    // mode "related" returns BM25-only related sections without embedding or LLM calls
+    const { query, mode, stream } = await request.json()
 
     if (!query) {
       return NextResponse.json({ error: "Query is required" }, { status: 400 })
@@ -12,65 +12,74 @@ export async function POST(request: NextRequest) {
 
     console.log("[v0] Querying documents with:", query)
 
-    const scriptPath = path.join(process.cwd(), "scripts", "query.py")
-
-    return new Promise((resolve) => {
-      const pythonProcess = spawn("python", [scriptPath, query], {
-        cwd: process.cwd(),
-        env: { ...process.env },
-      })
-
-      let output = ""
-      let errorOutput = ""
-
-      pythonProcess.stdout.on("data", (data) => {
-        output += data.toString()
-      })
+    if (stream) {
+      return streamQuery(query)
+    }
 
-      pythonProcess.stderr.on("data", (data) => {
-        errorOutput += data.toString()
-      })
+    try {
+      const worker = getQueryWorker()
+      const result = mode === "related" ? await worker.related(query) : await worker.query(query)
+      console.log("[v0] Query output:", JSON.stringify(result))
+      return NextResponse.json(result)
+    } catch (workerError) {
+      console.error("[v0] Query worker failed:", workerError)
+      return NextResponse.json(
+        {
+          error: "Query script failed",
+          details: workerError instanceof Error ? workerError.message : String(workerError),
+        },
+        { status: 500 },
+      )
+    }
+  } catch (error) {
+    console.error("[v0] Query API error:", error)
+    return NextResponse.json({ error: "Internal server error" }, { status: 500 })
+  }
+}
 
-      pythonProcess.on("close", (code) => {
-        console.log("[v0] Query script finished with code:", code)
-        console.log("[v0] Query output:", output)
+// Passes the worker's NDJSON events straight through: sources first, then answer
+// tokens as the LLM produces them, then a final "done" (or "error") event.
+function streamQuery(query: string) {
+  const encoder = new TextEncoder()
+  const body = new ReadableStream({
+    start(controller) {
+      const write = (event: unknown) => controller.enqueue(encoder.encode(JSON.stringify(event) + "\n"))
 
-        if (errorOutput) {
-          console.log("[v0] Query errors:", errorOutput)
-        }
+      getQueryWorker()
+        .stream(query, write)
+        .catch((workerError) => {
+          console.error("[v0] Query worker failed:", workerError)
+          write({
+            type: "error",
+            error: workerError instanceof Error ? workerError.message : String(workerError),
+          })
+        })
+        .finally(() => controller.close())
+    },
+  })
 
-        if (code !== 0) {
-          resolve(
-            NextResponse.json(
-              {
-                error: "Query script failed",
-                details: errorOutput,
-              },
-              { status: 500 },
-            ),
-          )
-          return
-        }
+  return new Response(body, {
+    headers: {
+      "Content-Type": "application/x-ndjson; charset=utf-8",
+      "Cache-Control": "no-cache",
+    },
+  })
+}
 
-        try {
-          const result = JSON.parse(output.trim())
-          resolve(NextResponse.json(result))
-        } catch (parseError) {
-          console.error("[v0] Failed to parse query result:", parseError)
-          resolve(
-            NextResponse.json(
-              {
-                error: "Failed to parse query result",
-                output: output,
-              },
-              { status: 500 },
-            ),
-          )
-        }
-      })
-    })
+// Health check / warm-up for the resident query worker.
+// GET /api/query-documents            -> worker health
+// GET /api/query-documents?warmup=1   -> load resources and open connections
+export async function GET(request: NextRequest) {
+  try {
+    const worker = getQueryWorker()
+    const warmup = request.nextUrl.searchParams.get("warmup")
+    const result = warmup ? await worker.warmup() : await worker.health()
+    return NextResponse.json(result, { status: result.error ? 503 : 200 })
   } catch (error) {
-    console.error("[v0] Query API error:", error)
-    return NextResponse.json({ error: "Internal server error" }, { status: 500 })
+    console.error("[v0] Query worker health check failed:", error)
+    return NextResponse.json(
+      { ok: false, error: error instanceof Error ? error.message : String(error) },
+      { status: 503 },
+    )
   }
 }
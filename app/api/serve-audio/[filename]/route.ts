@@ -12,9 +12,10 @@ export async function GET(request: NextRequest, { params }: { params: { filename
       return new NextResponse("Invalid filename", { status: 400 })
     }
 
-    // Only allow .wav files
-    if (!filename.endsWith(".wav")) {
-      return new NextResponse("Only WAV files are allowed", { status: 400 })
+    // Only allow audio files produced by generate-podcast.py
+    const contentType = filename.endsWith(".wav") ? "audio/wav" : filename.endsWith(".mp3") ? "audio/mpeg" : null
+    if (!contentType) {
+      return new NextResponse("Only WAV and MP3 files are allowed", { status: 400 })
     }
 
     const audioPath = path.join(process.cwd(), "temp", "audio", filename)
@@ -30,7 +31,7 @@ export async function GET(request: NextRequest, { params }: { params: { filename
     // Return the audio file with proper headers
     return new NextResponse(audioBuffer, {
       headers: {
-        "Content-Type": "audio/wav",
+        "Content-Type": contentType,
         "Content-Length": audioBuffer.length.toString(),
         "Cache-Control": "public, max-age=3600", // Cache for 1 hour
       },
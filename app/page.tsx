@@ -26,6 +26,8 @@ export default function PDFReaderApp() {
   const [isGeneratingPodcast, setIsGeneratingPodcast] = useState(false)
   const [activeTab, setActiveTab] = useState<"insights" | "related" | "podcast">("insights")
   const audioRef = useRef<HTMLAudioElement>(null)
+  // Bumped per selection so a podcast that finishes after a newer selection is dropped
+  const podcastRequestRef = useRef(0)
   const [isPlaying, setIsPlaying] = useState(false)
 
   useEffect(() => {
@@ -94,6 +96,21 @@ export default function PDFReaderApp() {
     })
   }
 
+  // Ingestion runs as a queued job; poll until it has a final result
+  const waitForIngestJob = async (jobId: string) => {
+    while (true) {
+      await new Promise((resolve) => setTimeout(resolve, 1000))
+      const response = await fetch(`/api/ingest-documents?jobId=${jobId}`)
+      const job = await response.json()
+      if (!job.success) {
+        return job
+      }
+      if (job.status === "succeeded" || job.status === "failed") {
+        return job.result ?? { success: false, message: job.error }
+      }
+    }
+  }
+
   const ingestDocument = async (fileName: string, docId: string) => {
     try {
       setDocuments((prev) =>
@@ -119,7 +136,8 @@ export default function PDFReaderApp() {
         }),
       })
 
-      const result = await response.json()
+      const job = await response.json()
+      const result = job.success ? await waitForIngestJob(job.job_id) : job
 
       if (result.success) {
         setDocuments((prev) =>
@@ -293,69 +311,46 @@ export default function PDFReaderApp() {
     setIsPlaying(false)
   }
 
-  const processInsights = async (content: string): Promise<InsightsData | null> => {
-    try {
-      const response = await fetch("/api/run-script", {
-        method: "POST",
-        headers: {
-          "Content-Type": "application/json",
-        },
-        body: JSON.stringify({
-          script: "insights.py",
-          args: [content],
-        }),
-      })
-
-      const result = await response.json()
-
-      if (result.success && result.output) {
-        const insightsData = JSON.parse(result.output)
-        if (insightsData.ok) {
-          return insightsData
-        } else {
-          console.error("[v0] Insights script error:", insightsData.error)
-          return null
-        }
-      } else {
-        console.error("[v0] API call failed:", result.error)
-        return null
-      }
-    } catch (error) {
-      console.error("[v0] Error processing insights:", error)
-      return null
-    }
-  }
-
-  const queryDocuments = async (query: string): Promise<QueryResult | null> => {
+  // Answer and insights from a single retrieval over the selection. context is the
+  // retrieved text, passed on to generatePodcast so it doesn't retrieve again.
+  const analyseSelection = async (
+    content: string,
+  ): Promise<{ insights: InsightsData | null; query: QueryResult | null; context: string | null } | null> => {
     try {
-      const response = await fetch("/api/query-documents", {
+      const response = await fetch("/api/analyse-selection", {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
         },
-        body: JSON.stringify({ query }),
+        body: JSON.stringify({ content, source: selectedDocument?.name }),
       })
 
       const result = await response.json()
 
       if (result.error) {
-        console.error("[v0] Query error:", result.error)
+        console.error("[v0] Analysis error:", result.error)
         return null
       }
-
-      // Limit sources to max 5 for better UI
-      if (result.sources && result.sources.length > 5) {
-        result.sources = result.sources.slice(0, 5)
+      if (result.errors && Object.keys(result.errors).length > 0) {
+        console.error("[v0] Analysis partly failed:", result.errors)
       }
 
-      return result
+      return {
+        insights: result.insights,
+        // Limit sources to max 5 for better UI
+        query:
+          result.answer !== null
+            ? { answer: result.answer, sources: (result.sources || []).slice(0, 5), query: result.query }
+            : null,
+        context: result.context_text || null,
+      }
     } catch (error) {
-      console.error("[v0] Error querying documents:", error)
+      console.error("[v0] Error analysing selection:", error)
       return null
     }
   }
 
-  const generatePodcast = async (content: string): Promise<PodcastData | null> => {
+  const generatePodcast = async (content: string, context: string | null): Promise<PodcastData | null> => {
     try {
       const response = await fetch("/api/generate-podcast", {
         method: "POST",
@@ -365,6 +360,7 @@ export default function PDFReaderApp() {
         body: JSON.stringify({
           content,
           gender: "F", // Default to female voice
+          context,
         }),
       })
 
@@ -393,6 +389,8 @@ export default function PDFReaderApp() {
     }
 
     setIsGettingSelection(true)
+    podcastRequestRef.current += 1
+    setIsGeneratingPodcast(false)
     setSelectedContent(null)
     setInsights(null)
     setQueryResult(null)
@@ -409,27 +407,26 @@ export default function PDFReaderApp() {
         setSelectedContent(selectedContentResult.data)
 
         setIsProcessingInsights(true)
-        const insightsResult = await processInsights(selectedContentResult.data)
-        if (insightsResult) {
-          setInsights(insightsResult)
-        }
-        setIsProcessingInsights(false)
-
         setIsQueryingDocuments(true)
-        const queryResults = await queryDocuments(selectedContentResult.data)
-        if (queryResults) {
-          setQueryResult(queryResults)
+        const analysis = await analyseSelection(selectedContentResult.data)
+        if (analysis) {
+          setInsights(analysis.insights)
+          setQueryResult(analysis.query)
         }
+        setIsProcessingInsights(false)
         setIsQueryingDocuments(false)
+        setIsGettingSelection(false)
 
+        // The podcast takes far longer than the analysis, so it loads on its own
+        // and never holds back the answer and insights shown above
+        const podcastRequest = podcastRequestRef.current
         setIsGeneratingPodcast(true)
-        const podcastResult = await generatePodcast(selectedContentResult.data)
-        if (podcastResult) {
-          setPodcast(podcastResult)
-        }
-        setIsGeneratingPodcast(false)
-
-        setIsGettingSelection(false)
+        generatePodcast(selectedContentResult.data, analysis?.context ?? null).then((podcastResult) => {
+          if (podcastRequestRef.current === podcastRequest) {
+            setPodcast(podcastResult)
+            setIsGeneratingPodcast(false)
+          }
+        })
       } else {
         console.log("[v0] No valid text selected")
         alert("No text selected. Please select some text in the PDF first.")
@@ -0,0 +1,89 @@
+import { execFile, spawn, type ChildProcess } from "child_process"
+import { promisify } from "util"
+import path from "path"
+
+const execFileAsync = promisify(execFile)
+
+const SCRIPT_PATH = path.join("scripts", "ingest_jobs.py")
+
+const globalForJobs = globalThis as unknown as { ingestWorker?: ChildProcess | null }
+
+// Arguments go straight to python, never through a shell, so paths and ids are never interpreted
+async function runJobsCommand(args: string[]) {
+  const { stdout, stderr } = await execFileAsync("python", [SCRIPT_PATH, ...args], {
+    cwd: process.cwd(),
+    timeout: 30000,
+  })
+  if (stderr) {
+    console.log("[v0] Ingest jobs stderr:", stderr)
+  }
+
+  const resultMatch = stdout.match(/RESULT: (.+)/)
+  if (!resultMatch) {
+    return { success: false, message: "No result found" }
+  }
+  return JSON.parse(resultMatch[1])
+}
+
+// `python scripts/ingest_jobs.py worker` drains the queue and exits once idle.
+// Only one worker can hold the queue, so an extra spawn simply exits.
+function ensureWorker() {
+  const current = globalForJobs.ingestWorker
+  if (current && current.exitCode === null) {
+    return
+  }
+
+  console.log("[v0] Starting ingestion worker")
+  const child = spawn("python", [SCRIPT_PATH, "worker"], {
+    cwd: process.cwd(),
+    env: { ...process.env },
+  })
+  child.stdout?.on("data", (data) => {
+    console.log("[v0] Ingestion worker:", data.toString().trim())
+  })
+  child.stderr?.on("data", (data) => {
+    console.log("[v0] Ingestion worker stderr:", data.toString().trim())
+  })
+  child.on("close", (code) => {
+    console.log("[v0] Ingestion worker stopped with exit code", code)
+    if (globalForJobs.ingestWorker === child) {
+      globalForJobs.ingestWorker = null
+    }
+  })
+  globalForJobs.ingestWorker = child
+}
+
+export async function submitIngestJob(documentPaths: string[]) {
+  // "--" keeps a path that starts with "-" from being read as an option
+  const result = await runJobsCommand(["submit", "--", ...documentPaths])
+  ensureWorker()
+  return result
+}
+
+export async function getIngestJob(jobId: string) {
+  const result = await runJobsCommand(["status", "--", jobId])
+  // Restart a worker that exited while this job was still queued
+  if (result.status === "queued") {
+    ensureWorker()
+  }
+  return result
+}
+
+// Streams the job as NDJSON "progress" events, then one "done" event
+export function watchIngestJob(jobId: string): ReadableStream<Uint8Array> {
+  let child: ChildProcess
+  return new ReadableStream({
+    start(controller) {
+      child = spawn("python", [SCRIPT_PATH, "watch", "--", jobId], { cwd: process.cwd() })
+      child.stdout?.on("data", (data) => controller.enqueue(data))
+      child.stderr?.on("data", (data) => {
+        console.log("[v0] Ingest watch stderr:", data.toString().trim())
+      })
+      child.on("close", () => controller.close())
+      child.on("error", (error) => controller.error(error))
+    },
+    cancel() {
+      child.kill()
+    },
+  })
+}
@@ -0,0 +1,200 @@
+import { spawn, type ChildProcessWithoutNullStreams } from "child_process"
+import path from "path"
+
+type PendingRequest = {
+  id: number
+  command: Record<string, unknown>
+  resolve: (value: any) => void
+  reject: (reason: Error) => void
+  timeoutMs: number
+  timer?: NodeJS.Timeout
+  onEvent?: (event: any) => void
+}
+
+// Intermediate events of a streamed request; anything else completes the request
+const PROGRESS_EVENTS = new Set(["sources", "token"])
+
+const REQUEST_TIMEOUT_MS = 120000
+
+// Long-lived `python scripts/query.py --serve` process shared by all requests.
+// It loads the vector store, embeddings client, LLM and prompt once and then
+// answers JSON-lines requests, so queries don't pay the Python cold start.
+//
+// The worker answers one request at a time, so requests wait in a queue here and
+// are written to it one by one. A request's timeout starts when it is written, so
+// time spent queued behind others never counts against it, and a timeout or crash
+// fails only the request the worker was running; the queue carries on with a
+// fresh worker.
+class QueryWorker {
+  private process: ChildProcessWithoutNullStreams | null = null
+  private queue: PendingRequest[] = []
+  private active: PendingRequest | null = null
+  private nextId = 1
+  private buffer = ""
+
+  private start() {
+    const scriptPath = path.join(process.cwd(), "scripts", "query.py")
+    console.log("[v0] Starting query worker:", scriptPath)
+
+    const child = spawn("python", [scriptPath, "--serve"], {
+      cwd: process.cwd(),
+      env: { ...process.env },
+    })
+
+    child.stdout.on("data", (data) => {
+      if (this.process !== child) {
+        return
+      }
+      this.buffer += data.toString()
+      let newline = this.buffer.indexOf("\n")
+      while (newline !== -1) {
+        const line = this.buffer.slice(0, newline).trim()
+        this.buffer = this.buffer.slice(newline + 1)
+        if (line) {
+          this.handleLine(line)
+        }
+        newline = this.buffer.indexOf("\n")
+      }
+    })
+
+    child.stderr.on("data", (data) => {
+      console.log("[v0] Query worker stderr:", data.toString().trim())
+    })
+
+    // Writing to a worker that just died fails here; its exit handler fails the request
+    child.stdin.on("error", (error) => {
+      console.error("[v0] Query worker stdin error:", error.message)
+    })
+
+    let exited = false
+    const onExit = (reason: string) => {
+      if (exited) {
+        return
+      }
+      exited = true
+      console.log("[v0] Query worker stopped:", reason)
+      if (this.process !== child) {
+        // Already replaced after a timeout; its request has been failed
+        return
+      }
+      this.process = null
+      this.buffer = ""
+      const request = this.active
+      this.active = null
+      if (request) {
+        clearTimeout(request.timer)
+        request.reject(new Error(`Query worker stopped: ${reason}`))
+      }
+      this.dispatch()
+    }
+
+    child.on("close", (code) => onExit(`exit code ${code}`))
+    child.on("error", (error) => onExit(error.message))
+
+    this.process = child
+    return child
+  }
+
+  // Write the next queued request to the worker once the previous one has finished
+  private dispatch() {
+    if (this.active || this.queue.length === 0) {
+      return
+    }
+    const request = this.queue.shift()!
+    const child = this.process ?? this.start()
+    this.active = request
+
+    request.timer = setTimeout(() => {
+      if (this.active !== request) {
+        return
+      }
+      this.active = null
+      request.reject(new Error("Query worker timed out"))
+      // A hung worker would block every later request, so replace it. Detach it first
+      // so its exit doesn't touch the next request.
+      this.process = null
+      this.buffer = ""
+      child.kill()
+      this.dispatch()
+    }, request.timeoutMs)
+
+    child.stdin.write(JSON.stringify({ id: request.id, ...request.command }) + "\n")
+  }
+
+  private handleLine(line: string) {
+    let message: any
+    try {
+      message = JSON.parse(line)
+    } catch (parseError) {
+      console.error("[v0] Failed to parse query worker output:", line)
+      return
+    }
+
+    const request = this.active
+    if (!request || request.id !== message.id) {
+      return
+    }
+
+    const { id, ...payload } = message
+    if (request.onEvent) {
+      request.onEvent(payload)
+    }
+    if (PROGRESS_EVENTS.has(payload.type)) {
+      return
+    }
+
+    clearTimeout(request.timer)
+    this.active = null
+    request.resolve(payload)
+    this.dispatch()
+  }
+
+  send(
+    command: Record<string, unknown>,
+    onEvent?: (event: any) => void,
+    timeoutMs: number = REQUEST_TIMEOUT_MS,
+  ): Promise<any> {
+    const id = this.nextId++
+
+    return new Promise((resolve, reject) => {
+      this.queue.push({ id, command, resolve, reject, timeoutMs, onEvent })
+      this.dispatch()
+    })
+  }
+
+  query(query: string) {
+    return this.send({ cmd: "query", query })
+  }
+
+  // Streams NDJSON events ("sources", "token", then "done" or "error") to onEvent
+  stream(query: string, onEvent: (event: any) => void) {
+    return this.send({ cmd: "stream", query }, onEvent)
+  }
+
+  // Answer and insights from one retrieval. source is the file name of the open PDF,
+  // which lets the worker reuse its stored chunk embeddings.
+  analyse(query: string, options: { num?: number; source?: string } = {}) {
+    return this.send({ cmd: "analyse", query, ...options })
+  }
+
+  related(query: string) {
+    return this.send({ cmd: "related", query })
+  }
+
+  health() {
+    return this.send({ cmd: "health" })
+  }
+
+  warmup() {
+    return this.send({ cmd: "warmup" })
+  }
+}
+
+const globalForWorker = globalThis as unknown as { queryWorker?: QueryWorker }
+
+export function getQueryWorker(): QueryWorker {
+  if (!globalForWorker.queryWorker) {
+    globalForWorker.queryWorker = new QueryWorker()
+  }
+  return globalForWorker.queryWorker
+}
@@ -0,0 +1,175 @@
+import sys
+import json
+import time
+import asyncio
+import argparse
+from context_packing import count_tokens
+from embedding import cache_stats
+from insights import build_insights_chain, insights_sections
+from metrics import Metrics
+from query import (LLM_MODEL, LLM_TEMPERATURE, TOP_K, answer_cache_info, build_context, format_sources,
+                   load_resources, lookup_answer, remember_answer)
+
+# One pass over a selection for "Analyse Selected Text": the selection is embedded
+# and retrieved once, then the answer and insights LLM calls run concurrently on
+# that shared context. The packed context is returned as well, so a podcast can be
+# generated from it in a separate request (generate-podcast.py --context-stdin)
+# without holding up the answer and insights. Selections from an ingested PDF
+# reuse the stored chunk embeddings and skip the embedding call, and a selection
+# analysed before is served from the answer cache without retrieval or LLM calls.
+
+def emit(payload, ok=True, code=0):
+    out = {"ok": ok, **payload}
+    sys.stdout.write(json.dumps(out, ensure_ascii=False))
+    sys.stdout.flush()
+    sys.exit(code)
+
+async def timed(metrics, name, awaitable):
+    started_at = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        metrics.add_time(name, time.perf_counter() - started_at)
+
+def selection_vector(resources, selection, source, metrics):
+    """
+    Return (query vector, selection details). The stored embeddings of the chunks
+    the selection overlaps in `source` are used when they cover it; otherwise the
+    selection is embedded.
+    """
+    query_vector, details = None, {"fast_path": False, "source": source}
+    if resources.get("selection_resolver") is not None:
+        with metrics.span("resolve_selection"):
+            query_vector, details = resources["selection_resolver"].resolve(selection, source)
+    if query_vector is not None:
+        metrics.count("selection_fast_path")
+        return query_vector, details
+    with metrics.span("embed_query"):
+        return resources["embeddings"].embed_query(selection), details
+
+def analysis_scope(source, num):
+    """Answer cache scope of an analysis: the same selection in another PDF, or with another num, is a different entry."""
+    return f"analyse|{source or ''}|{num}"
+
+async def run_analysis(resources, selection, num=5, source=None):
+    """
+    Retrieve once for the selection and run the answer and insights LLM calls
+    concurrently. A failing part is reported under "errors" without discarding
+    the other. source is the file name of the PDF the selection was made in, if any.
+    A complete analysis is cached by selection and source and served again from
+    the answer cache.
+    """
+    from retrieval import RETRIEVAL_MODE, retrieve_by_vector
+
+    metrics = Metrics("analyse")
+    embeddings = resources["embeddings"]
+    cache_baseline = cache_stats(embeddings)
+    scope = analysis_scope(source, num)
+
+    # 1. Embed the selection once, or reuse stored chunk embeddings; the answer cache,
+    #    retrieval and MMR all use the vector. An exact cache match needs no vector at all.
+    selection_details = {"fast_path": False, "source": source}
+
+    def embed_selection(text):
+        vector, details = selection_vector(resources, text, source, metrics)
+        selection_details.update(details)
+        return vector
+
+    with metrics.span("answer_cache"):
+        hit, query_vector = lookup_answer(resources, selection, embed_selection, scope)
+    if hit:
+        metrics.count("answer_cache_hits")
+        metrics.count_cache("embedding_cache", cache_stats(embeddings), cache_baseline)
+        return {
+            **hit["payload"],
+            "query": selection,
+            "selection": selection_details,
+            "answer_cache": answer_cache_info(resources, hit),
+            "embedding_cache": cache_stats(embeddings),
+            "metrics": metrics.finish(),
+        }
+    if query_vector is None:
+        query_vector = embed_selection(selection)
+    with metrics.span("retrieval"):
+        documents = retrieve_by_vector(resources["vector_store"], resources["lexical_index"], selection,
+                                       query_vector, mode=RETRIEVAL_MODE, k=TOP_K)
+    with metrics.span("context_packing"):
+        context, packing = build_context(resources, documents, selection, query_vector)
+
+    # 2. Fan out from the shared context
+    insights_prompt, insights_chain = build_insights_chain(resources["llm"])
+    tasks = {
+        "answer": timed(metrics, "llm_answer",
+                        resources["qa_chain"].ainvoke({"context": context, "question": selection})),
+        "insights": timed(metrics, "llm_insights", insights_chain.ainvoke({"question": selection, "n": num})),
+    }
+    outcomes = dict(zip(tasks, await asyncio.gather(*tasks.values(), return_exceptions=True)))
+    errors = {name: str(outcome) for name, outcome in outcomes.items() if isinstance(outcome, Exception)}
+
+    # 3. Combine
+    answer = outcomes["answer"] if "answer" not in errors else None
+    insights = None
+    if "insights" not in errors:
+        insights = {"query": selection, "model": LLM_MODEL, "temperature": LLM_TEMPERATURE,
+                    **insights_sections(outcomes["insights"])}
+
+    if answer is not None:
+        metrics.count("llm_calls")
+        metrics.count("prompt_tokens", packing["prompt_tokens_after"])
+        metrics.count("completion_tokens", count_tokens(answer))
+    if insights is not None:
+        metrics.count("llm_calls")
+        metrics.count("prompt_tokens", count_tokens(insights_prompt.format(question=selection, n=num)))
+        metrics.count("completion_tokens", count_tokens(json.dumps(outcomes["insights"])))
+    metrics.count_cache("embedding_cache", cache_stats(embeddings), cache_baseline)
+
+    # 4. Only a complete analysis is cached; a failed part is retried next time
+    payload = {
+        "answer": answer,
+        "sources": format_sources(documents),
+        "context": packing,
+        "context_text": context,
+        "insights": insights,
+        "errors": errors,
+    }
+    if resources.get("answer_cache") is not None:
+        metrics.count("answer_cache_misses")
+    if not errors:
+        remember_answer(resources, selection, query_vector, payload, documents, scope)
+    return {
+        **payload,
+        "query": selection,
+        "selection": selection_details,
+        "answer_cache": answer_cache_info(resources, None),
+        "embedding_cache": cache_stats(embeddings),
+        "metrics": metrics.finish(),
+    }
+
+def analyse_selection(resources, selection, num=5, source=None):
+    """Synchronous entry point for callers without an event loop, such as query.py --serve."""
+    return asyncio.run(run_analysis(resources, selection, num, source))
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer and insights for a selection in one pass.")
+    parser.add_argument("selection", type=str, help="Selected text, or '-' to read from stdin.")
+    parser.add_argument("-n", "--num", type=int, default=5, help="Max items per insights section.")
+    parser.add_argument("--source", type=str, help="File name of the ingested PDF the selection comes from")
+    args = parser.parse_args()
+
+    selection = args.selection
+    if selection == "-":
+        selection = sys.stdin.read().strip()
+    if not selection:
+        emit({"error": "No selection provided"}, ok=False, code=1)
+
+    resources = load_resources()
+    if "error" in resources:
+        emit({"error": resources["error"]}, ok=False, code=1)
+
+    try:
+        emit(analyse_selection(resources, selection, args.num, args.source), ok=True)
+    except Exception as e:
+        emit({"error": str(e)}, ok=False, code=2)
+
+if __name__ == "__main__":
+    main()
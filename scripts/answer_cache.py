@@ -0,0 +1,204 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from embedding_cache import pack_vector
+from manifest import IngestManifest
+
+# --- Configuration ---
+ANSWER_CACHE = os.getenv("ANSWER_CACHE", "on") == "on"
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", "./answer_cache.sqlite3")
+# Cosine similarity at or above which a new query reuses a cached answer
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2000"))
+# Evict down to this fraction of the limit so eviction does not run on every insert
+EVICTION_TARGET = 0.9
+
+def normalize_query(text):
+    """Selections that differ only in whitespace or case share an exact-match key."""
+    return re.sub(r"\s+", " ", text).strip().casefold()
+
+def query_hash(text):
+    return hashlib.sha256(normalize_query(text).encode("utf-8")).hexdigest()
+
+class AnswerCache:
+    """
+    Persistent cache of query answers. A query is matched first by its normalized
+    text, which needs no embedding call, and then by cosine similarity of its
+    embedding to earlier queries. Every entry records the content hash of each
+    source document behind it and is only served while the ingest manifest still
+    has those hashes, so re-ingesting or deleting a source invalidates it. Expired
+    entries and the least recently used ones beyond the size limit are evicted.
+    """
+
+    def __init__(self, namespace="", path=ANSWER_CACHE_PATH, similarity=ANSWER_CACHE_SIMILARITY,
+                 ttl_seconds=ANSWER_CACHE_TTL_SECONDS, max_entries=ANSWER_CACHE_MAX_ENTRIES, manifest=None):
+        # Answers from another embedding model or LLM must never be served, so they live apart
+        self.namespace = namespace
+        self.path = path
+        self.similarity = similarity
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.manifest = manifest or IngestManifest()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                namespace TEXT NOT NULL,
+                query_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                payload TEXT NOT NULL,
+                source_hashes TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                UNIQUE (namespace, query_hash)
+            );
+            CREATE INDEX IF NOT EXISTS answers_last_used ON answers(last_used);
+        """)
+
+    def _is_current(self, source_hashes, files):
+        return all(source in files and files[source][0] == content_hash
+                   for source, content_hash in source_hashes.items())
+
+    def _use(self, row_id, payload, match, similarity, created_at):
+        now = time.time()
+        with self.conn:
+            self.conn.execute("UPDATE answers SET last_used = ? WHERE id = ?", (now, row_id))
+        self.hits += 1
+        return {
+            "payload": json.loads(payload),
+            "match": match,
+            "similarity": round(similarity, 4),
+            "age_seconds": round(now - created_at, 1),
+        }
+
+    def _invalidate(self, row_ids):
+        if row_ids:
+            with self.conn:
+                self.conn.executemany("DELETE FROM answers WHERE id = ?", [(row_id,) for row_id in row_ids])
+            self.invalidations += len(row_ids)
+
+    def _scoped(self, scope):
+        return f"{self.namespace}|{scope}" if scope else self.namespace
+
+    def lookup(self, query, embed_query, scope=""):
+        """
+        Return (hit, query_vector). hit is None on a miss, otherwise a dict with the
+        cached payload, the match type ("exact" or "similar"), similarity and age.
+        embed_query(query) is only called when there is no exact match; its vector
+        is returned so the caller can retrieve with it on a miss. Entries stored
+        under a scope only match lookups with the same scope.
+        """
+        import numpy as np
+
+        namespace = self._scoped(scope)
+        oldest = time.time() - self.ttl_seconds
+        with self.lock:
+            files = self.manifest.files()
+            row = self.conn.execute(
+                "SELECT id, payload, source_hashes, created_at FROM answers "
+                "WHERE namespace = ? AND query_hash = ? AND created_at >= ?",
+                (namespace, query_hash(query), oldest),
+            ).fetchone()
+            if row:
+                if self._is_current(json.loads(row[2]), files):
+                    return self._use(row[0], row[1], "exact", 1.0, row[3]), None
+                self._invalidate([row[0]])
+
+        query_vector = embed_query(query)
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, vector, payload, source_hashes, created_at FROM answers "
+                "WHERE namespace = ? AND created_at >= ?",
+                (namespace, oldest),
+            ).fetchall()
+            if rows:
+                matrix = np.stack([np.frombuffer(r[1], dtype=np.float32) for r in rows])
+                vector = np.asarray(query_vector, dtype=np.float32)
+                norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(vector)
+                scores = matrix @ vector / np.where(norms == 0, 1, norms)
+                stale = []
+                for i in np.argsort(-scores):
+                    if scores[i] < self.similarity:
+                        break
+                    row_id, _, payload, source_hashes, created_at = rows[i]
+                    if self._is_current(json.loads(source_hashes), files):
+                        self._invalidate(stale)
+                        return self._use(row_id, payload, "similar", float(scores[i]), created_at), query_vector
+                    stale.append(row_id)
+                self._invalidate(stale)
+            self.misses += 1
+        return None, query_vector
+
+    def store(self, query, query_vector, payload, sources, scope=""):
+        """
+        Cache payload for query. sources are the documents the answer was built from,
+        as stored in chunk metadata (the paths given to ingest); the manifest is keyed
+        by file name. Nothing is cached when one of them is not in the manifest, since
+        the entry could then never be invalidated.
+        """
+        now = time.time()
+        sources = {os.path.basename(source) if source else source for source in sources}
+        with self.lock:
+            files = self.manifest.files()
+            if any(source not in files for source in sources):
+                return False
+            source_hashes = {source: files[source][0] for source in sources}
+            with self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO answers "
+                    "(namespace, query_hash, vector, payload, source_hashes, created_at, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (self._scoped(scope), query_hash(query), pack_vector(query_vector), json.dumps(payload),
+                     json.dumps(source_hashes), now, now),
+                )
+            self._evict(now)
+        return True
+
+    def _evict(self, now):
+        with self.conn:
+            expired = self.conn.execute(
+                "DELETE FROM answers WHERE created_at < ?", (now - self.ttl_seconds,)
+            ).rowcount
+            count = self.conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+            overflow = 0
+            if count > self.max_entries:
+                overflow = count - int(self.max_entries * EVICTION_TARGET)
+                self.conn.execute(
+                    "DELETE FROM answers WHERE id IN (SELECT id FROM answers ORDER BY last_used LIMIT ?)",
+                    (overflow,),
+                )
+        self.evictions += expired + overflow
+
+    def prune(self):
+        """Drop expired entries and entries whose sources changed or were deleted."""
+        with self.lock:
+            files = self.manifest.files()
+            rows = self.conn.execute("SELECT id, source_hashes FROM answers").fetchall()
+            self._invalidate([row_id for row_id, source_hashes in rows
+                              if not self._is_current(json.loads(source_hashes), files)])
+            self._evict(time.time())
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+        }
+
+    def close(self):
+        self.conn.close()
+        self.manifest.close()
@@ -0,0 +1,284 @@
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import platform
+import subprocess
+import importlib.util
+from metrics import peak_rss_mb
+
+# Offline benchmark for the ingest, query, insights and podcast pipelines.
+# Every external service is replaced by a deterministic local stand-in and all
+# stores are created in a scratch directory, so results are comparable between
+# commits. Run from the repo root: python scripts/benchmark.py --pages 200
+
+SCRIPTS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+VOCABULARY = (
+    "system pressure valve torque sensor calibration voltage current thermal load "
+    "assembly bearing housing firmware protocol latency throughput network module "
+    "inspection maintenance schedule warranty compliance safety procedure battery "
+    "controller interface signal filter amplitude frequency resonance tolerance"
+).split()
+PART_NUMBERS = [f"XR-{n}" for n in range(100, 140)]
+
+def percentile(values, pct):
+    """Nearest-rank percentile; None for an empty list."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = min(len(ordered), max(1, math.ceil(pct / 100 * len(ordered))))
+    return round(ordered[rank - 1], 4)
+
+def latency_summary(values):
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 4) if values else None,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+    }
+
+def pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def write_pdf(path, pages):
+    """Write a minimal text-only PDF with one Helvetica text block per page."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in pages:
+        stream = "BT /F1 10 Tf 14 TL 50 790 Td " + " ".join(f"({pdf_escape(line)}) '" for line in lines) + " ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    with open(path, "wb") as f:
+        f.write(out)
+
+def generate_corpus(directory, documents, pages, seed):
+    """Deterministic corpus of `documents` PDFs with `pages` pages in total."""
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    per_document = max(1, pages // documents)
+    for doc_index in range(documents):
+        doc_pages = []
+        for page_index in range(per_document):
+            lines = []
+            for _ in range(40):
+                words = [rng.choice(VOCABULARY) for _ in range(rng.randint(8, 14))]
+                if rng.random() < 0.2:
+                    words.insert(rng.randrange(len(words)), rng.choice(PART_NUMBERS))
+                sentence = " ".join(words)
+                lines.append(sentence[0].upper() + sentence[1:] + ".")
+            doc_pages.append([f"Document {doc_index} section {page_index}"] + lines)
+        path = os.path.join(directory, f"bench_{doc_index:03d}.pdf")
+        write_pdf(path, doc_pages)
+        paths.append(path)
+    return paths, per_document * documents
+
+def generate_queries(count, seed):
+    rng = random.Random(seed + 1)
+    queries = []
+    for i in range(count):
+        if i % 3 == 0:
+            queries.append(f"What is the tolerance for {rng.choice(PART_NUMBERS)}?")
+        else:
+            queries.append(" ".join(rng.sample(VOCABULARY, 3)))
+    return queries
+
+def load_podcast_module():
+    spec = importlib.util.spec_from_file_location("generate_podcast", os.path.join(SCRIPTS_DIRECTORY, "generate-podcast.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=SCRIPTS_DIRECTORY).stdout.strip() or None
+    except OSError:
+        return None
+
+def bench_ingest(paths, total_pages):
+    from ingest import ingest_documents
+
+    events = []
+    started_at = time.time()
+
+    def on_progress(progress):
+        events.append((time.time() - started_at, progress))
+
+    result = ingest_documents(paths, progress=on_progress)
+    seconds = time.time() - started_at
+    if not result.get("success"):
+        raise RuntimeError(f"Ingest failed: {result.get('message')}")
+
+    parsed_at = next((t for t, p in events if p["tasks_parsed"] == p["tasks_total"]), None)
+    embedding = result.get("embedding") or {}
+    chunks = result.get("chunks_count", 0)
+    return {
+        "seconds": round(seconds, 3),
+        "pages": total_pages,
+        "chunks": chunks,
+        "pages_per_sec": round(total_pages / seconds, 2) if seconds else None,
+        "chunks_per_sec": round(chunks / seconds, 2) if seconds else None,
+        "committed_batches": result.get("committed_batches"),
+        "stages": {
+            "parse_complete_seconds": round(parsed_at, 3) if parsed_at is not None else None,
+            "embedding_seconds": embedding.get("seconds"),
+            "embedding_requests": embedding.get("requests"),
+            "spans": result["metrics"]["spans"],
+        },
+    }
+
+def bench_reingest(paths):
+    """Second pass over an unchanged corpus: measures the manifest skip path."""
+    from ingest import ingest_documents
+
+    started_at = time.time()
+    result = ingest_documents(paths)
+    return {"seconds": round(time.time() - started_at, 3), "skipped_files": len(result.get("skipped_files", []))}
+
+def bench_queries(queries):
+    from query import load_resources, stream_query
+
+    started_at = time.time()
+    resources = load_resources()
+    if "error" in resources:
+        raise RuntimeError(resources["error"])
+    load_seconds = time.time() - started_at
+
+    retrieval, first_token, total, prompt_tokens = [], [], [], []
+    for user_query in queries:
+        events = {}
+        stream_query(resources, user_query, lambda event: events.setdefault(event["type"], event))
+        retrieval.append(events["sources"]["retrieval_seconds"])
+        done = events["done"]
+        total.append(done["total_seconds"])
+        if done["first_token_seconds"] is not None:
+            first_token.append(done["first_token_seconds"])
+        prompt_tokens.append(done["context"]["prompt_tokens_after"])
+
+    return {
+        "load_seconds": round(load_seconds, 3),
+        "latency": latency_summary(total),
+        "stages": {
+            "retrieval": latency_summary(retrieval),
+            "first_token": latency_summary(first_token),
+        },
+        "mean_prompt_tokens": round(sum(prompt_tokens) / len(prompt_tokens), 1) if prompt_tokens else None,
+    }
+
+def bench_insights(queries):
+    from insights import generate_insights
+
+    latencies = []
+    for user_query in queries:
+        started_at = time.time()
+        generate_insights(user_query)
+        latencies.append(time.time() - started_at)
+    return {"latency": latency_summary(latencies)}
+
+def bench_podcast(topics):
+    podcast = load_podcast_module()
+    runs = []
+    for topic in topics:
+        result = podcast.generate_podcast(topic)
+        runs.append(result["tts"])
+    return {
+        "latency": latency_summary([run["total_seconds"] for run in runs]),
+        "stages": {
+            "llm": latency_summary([run["llm_seconds"] for run in runs]),
+            "tts": latency_summary([run["seconds"] for run in runs]),
+        },
+        "lines": sum(run["lines"] for run in runs),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the ingest, query, insights and podcast pipelines.")
+    parser.add_argument("--pages", type=int, default=200, help="Total pages in the generated corpus")
+    parser.add_argument("--documents", type=int, default=4, help="Number of generated PDFs")
+    parser.add_argument("--queries", type=int, default=30)
+    parser.add_argument("--insights", type=int, default=5)
+    parser.add_argument("--podcasts", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--backend", choices=["chroma", "faiss", "quantized"], default="chroma")
+    parser.add_argument("--embed-latency", type=float, default=0.02, help="Seconds per fake embedding request")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Seconds before the fake LLM's first token")
+    parser.add_argument("--llm-token-latency", type=float, default=0.002)
+    parser.add_argument("--tts-latency", type=float, default=0.05, help="Seconds per fake TTS line")
+    parser.add_argument("--workdir", default=os.path.join("temp", "benchmark"), help="Scratch directory, wiped first")
+    parser.add_argument("--output", default="bench_results.json", help="Machine-readable results file")
+    args = parser.parse_args()
+
+    output_path = os.path.abspath(args.output)
+    workdir = os.path.abspath(args.workdir)
+    if os.path.exists(workdir):
+        import shutil
+        shutil.rmtree(workdir)
+    os.makedirs(workdir)
+
+    # Modules read their configuration at import time, so set it before importing them
+    os.environ.update({
+        "EMBEDDING_PROVIDER": "fake",
+        "EMBEDDING_CACHE": "off",
+        "ANSWER_CACHE": "off",
+        "FAKE_EMBEDDING_LATENCY": str(args.embed_latency),
+        "LLM_PROVIDER": "fake",
+        "FAKE_LLM_LATENCY": str(args.llm_latency),
+        "FAKE_LLM_TOKEN_LATENCY": str(args.llm_token_latency),
+        "TTS_PROVIDER": "fake",
+        "TTS_CACHE": "off",
+        "FAKE_TTS_LATENCY": str(args.tts_latency),
+        "VECTOR_BACKEND": args.backend,
+    })
+    sys.path.insert(0, SCRIPTS_DIRECTORY)
+    # Every store path is relative, so this keeps the real stores untouched
+    os.chdir(workdir)
+
+    started_at = time.time()
+    paths, total_pages = generate_corpus(os.path.join(workdir, "docs"), args.documents, args.pages, args.seed)
+    corpus_seconds = time.time() - started_at
+    queries = generate_queries(args.queries, args.seed)
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": vars(args),
+        },
+        "corpus": {"documents": len(paths), "pages": total_pages, "seconds": round(corpus_seconds, 3)},
+    }
+    results["ingest"] = bench_ingest(paths, total_pages)
+    results["reingest"] = bench_reingest(paths)
+    results["query"] = bench_queries(queries)
+    results["insights"] = bench_insights(queries[:args.insights])
+    results["podcast"] = bench_podcast(queries[:args.podcasts])
+    results["peak_rss_mb"] = peak_rss_mb()
+    results["total_seconds"] = round(time.time() - started_at, 3)
+
+    with open(output_path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print(f"Benchmark results written to {output_path}", file=sys.stderr)
+    print("RESULT:", json.dumps(results))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import os
+import re
+import hashlib
+import threading
+
+# --- Configuration ---
+TTS_CACHE_DIRECTORY = os.getenv("TTS_CACHE_DIRECTORY", os.path.join("temp", "tts_cache"))
+TTS_CACHE_MAX_MB = float(os.getenv("TTS_CACHE_MAX_MB", "256"))
+TTS_CACHE = os.getenv("TTS_CACHE", "on") == "on"
+# Evict down to this fraction of the limit so eviction does not run on every insert
+EVICTION_TARGET = 0.9
+
+def normalize_text(text):
+    """Whitespace differences must not change what the listener hears, so they share a key."""
+    return re.sub(r"\s+", " ", text).strip()
+
+def clip_key(voice, text, audio_format):
+    return hashlib.sha256(f"{voice}|{audio_format}|{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+class ClipCache:
+    """
+    Disk-backed, content-addressed cache of synthesized clips with least-recently
+    used eviction by total bytes. File modification times track recency.
+    """
+
+    def __init__(self, directory=TTS_CACHE_DIRECTORY, max_bytes=int(TTS_CACHE_MAX_MB * 1024 * 1024)):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.total_bytes = sum(entry.stat().st_size for entry in os.scandir(directory) if entry.name.endswith(".clip"))
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.clip")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return data
+
+    def put(self, key, data):
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        with self.lock:
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            self.total_bytes += len(data) - previous
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        target = int(self.max_bytes * EVICTION_TARGET)
+        entries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith(".clip")),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in entries:
+            if self.total_bytes <= target:
+                break
+            size = entry.stat().st_size
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            self.total_bytes -= size
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "bytes": self.total_bytes,
+        }
+
+class CachedTTS:
+    """Wraps a TTS provider so every synthesize call checks the clip cache first."""
+
+    def __init__(self, provider, cache, audio_format):
+        self.provider = provider
+        self.cache = cache
+        self.audio_format = audio_format
+
+    def synthesize(self, text, voice):
+        key = clip_key(voice, text, self.audio_format)
+        data = self.cache.get(key)
+        if data is not None:
+            return data
+        data = self.provider.synthesize(text, voice)
+        self.cache.put(key, data)
+        return data
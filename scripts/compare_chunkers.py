@@ -0,0 +1,103 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+
+# Ingests the same PDFs once with each chunker, into separate scratch stores, and
+# reports chunk count, embedded characters and ingest time side by side. The
+# embedding cache is off so the second run gets no head start. Run from the repo
+# root: python scripts/compare_chunkers.py docs/*.pdf
+
+SCRIPTS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+CHUNKERS = ("recursive", "sections")
+
+def reduction(before, after):
+    return round(1 - after / before, 4) if before else None
+
+def run_ingest(chunker, paths, workdir):
+    from ingest import ingest_documents
+
+    directory = os.path.join(workdir, chunker)
+    os.makedirs(directory)
+    cwd = os.getcwd()
+    # Every store path is relative, so this keeps the real stores untouched
+    os.chdir(directory)
+    try:
+        started_at = time.perf_counter()
+        result = ingest_documents(paths, chunker=chunker)
+        seconds = time.perf_counter() - started_at
+    finally:
+        os.chdir(cwd)
+    if not result.get("success"):
+        raise RuntimeError(f"{chunker} ingest failed: {result.get('message')}")
+
+    counters = result["metrics"]["counters"]
+    spans = result["metrics"]["spans"]
+    chunks = result["chunks_count"]
+    characters = counters.get("chunk_characters", 0)
+    return {
+        "seconds": round(seconds, 3),
+        "chunks": chunks,
+        "embedded_characters": characters,
+        "mean_chunk_characters": round(characters / chunks, 1) if chunks else None,
+        "embedding_requests": (result.get("embedding") or {}).get("requests"),
+        "stages": {name: spans[name]["seconds"] for name in ("parse_wait", "split", "embed_wait", "vector_store_write")
+                   if name in spans},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the recursive and section chunkers on the same PDFs.")
+    parser.add_argument("document_paths", nargs="*", help="PDF files; defaults to every PDF in --docs-dir")
+    parser.add_argument("--docs-dir", default="./docs")
+    parser.add_argument("--fake-embeddings", action="store_true",
+                        help="Embed with the local stand-in so no API calls are made")
+    parser.add_argument("--workdir", default=os.path.join("temp", "compare_chunkers"), help="Scratch directory, wiped first")
+    parser.add_argument("--output", default="chunker_comparison.json", help="Machine-readable results file")
+    args = parser.parse_args()
+
+    paths = args.document_paths
+    if not paths and os.path.isdir(args.docs_dir):
+        paths = sorted(os.path.join(args.docs_dir, name) for name in os.listdir(args.docs_dir) if name.endswith(".pdf"))
+    if not paths:
+        print("RESULT:", json.dumps({"success": False, "message": "No PDFs to compare"}))
+        return
+    paths = [os.path.abspath(path) for path in paths]
+    output_path = os.path.abspath(args.output)
+    workdir = os.path.abspath(args.workdir)
+    if os.path.exists(workdir):
+        shutil.rmtree(workdir)
+
+    # Modules read their configuration at import time, so set it before importing them
+    os.environ["EMBEDDING_CACHE"] = "off"
+    if args.fake_embeddings:
+        os.environ["EMBEDDING_PROVIDER"] = "fake"
+    sys.path.insert(0, SCRIPTS_DIRECTORY)
+
+    runs = {chunker: run_ingest(chunker, paths, workdir) for chunker in CHUNKERS}
+    baseline, sections = runs["recursive"], runs["sections"]
+    results = {
+        "success": True,
+        "documents": len(paths),
+        "embedding_provider": os.getenv("EMBEDDING_PROVIDER", "google"),
+        "runs": runs,
+        "chunk_reduction": reduction(baseline["chunks"], sections["chunks"]),
+        "embedded_characters_reduction": reduction(baseline["embedded_characters"], sections["embedded_characters"]),
+        "ingest_time_reduction": reduction(baseline["seconds"], sections["seconds"]),
+    }
+
+    for chunker, run in runs.items():
+        print(f"{chunker:10s} {run['chunks']:7d} chunks  {run['mean_chunk_characters'] or 0:7.1f} chars/chunk  "
+              f"{run['seconds']:8.2f} s", file=sys.stderr)
+    if baseline["chunks"]:
+        print(f"Sections: {results['chunk_reduction']:.1%} fewer chunks, "
+              f"{results['ingest_time_reduction']:.1%} less ingest time", file=sys.stderr)
+
+    with open(output_path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Comparison written to {output_path}", file=sys.stderr)
+    print("RESULT:", json.dumps(results))
+
+if __name__ == "__main__":
+    main()
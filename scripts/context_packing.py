@@ -0,0 +1,183 @@
+import os
+import re
+import math
+
+# --- Configuration ---
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+# Gemini's tokenizer is not public; cl100k_base is close enough to budget with
+CONTEXT_ENCODING = "cl100k_base"
+CONTEXT_MMR = os.getenv("CONTEXT_MMR", "off") == "on"
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))
+# Word-trigram Jaccard similarity above which two chunks count as the same text
+NEAR_DUPLICATE_THRESHOLD = 0.85
+# Shortest suffix/prefix match treated as splitter overlap rather than coincidence
+MIN_OVERLAP_CHARS = 20
+CONTEXT_SEPARATOR = "\n\n"
+
+_encoding = None
+
+def count_tokens(text):
+    """
+    Token count with tiktoken. Falls back to a 4-characters-per-token estimate
+    when the encoding cannot be loaded (it is downloaded on first use).
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+
+            _encoding = tiktoken.get_encoding(CONTEXT_ENCODING)
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / 4)
+
+def truncate_to_tokens(text, max_tokens):
+    if _encoding:
+        return _encoding.decode(_encoding.encode(text, disallowed_special=())[:max_tokens])
+    return text[:max_tokens * 4]
+
+def shingles(text, size=3):
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+def drop_near_duplicates(documents, threshold=NEAR_DUPLICATE_THRESHOLD):
+    """Keep the best ranked of any group of chunks with nearly the same text."""
+    kept = []
+    kept_shingles = []
+    for doc in documents:
+        doc_shingles = shingles(doc.page_content)
+        if any(jaccard(doc_shingles, other) >= threshold for other in kept_shingles):
+            continue
+        kept.append(doc)
+        kept_shingles.append(doc_shingles)
+    return kept
+
+def overlap_length(left, right, min_chars=MIN_OVERLAP_CHARS):
+    """Length of the longest suffix of left that is a prefix of right, or 0."""
+    for length in range(min(len(left), len(right)), min_chars - 1, -1):
+        if left.endswith(right[:length]):
+            return length
+    return 0
+
+def merge_texts(left, right):
+    """Join two chunk texts if one contains the other or they overlap; None otherwise."""
+    if right in left:
+        return left
+    if left in right:
+        return right
+    length = overlap_length(left, right)
+    if length:
+        return left + right[length:]
+    length = overlap_length(right, left)
+    if length:
+        return right + left[length:]
+    return None
+
+def page_key(doc):
+    return (doc.metadata.get("source"), doc.metadata.get("page"))
+
+def merge_overlapping(documents):
+    """
+    Merge chunks of the same page that overlap, as consecutive chunks do with the
+    splitter's CHUNK_OVERLAP, or that contain one another. A merged chunk takes
+    the rank of its best ranked part.
+    """
+    from langchain_core.documents import Document
+
+    merged = []
+    for doc in documents:
+        position = None
+        i = 0
+        while i < len(merged):
+            other = merged[i]
+            combined = merge_texts(other.page_content, doc.page_content) if page_key(other) == page_key(doc) else None
+            if combined is None:
+                i += 1
+                continue
+            doc = Document(page_content=combined, metadata=other.metadata)
+            del merged[i]
+            position = i if position is None else min(position, i)
+            # The grown chunk may now bridge to entries it did not overlap before
+            i = 0
+        merged.insert(len(merged) if position is None else position, doc)
+    return merged
+
+def cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+def mmr_order(documents, query, embeddings, lambda_mult=MMR_LAMBDA, query_vector=None):
+    """
+    Reorder by maximal marginal relevance. Chunk texts come straight from the
+    store, so with the embedding cache on their vectors are usually cache hits.
+    """
+    if len(documents) < 3:
+        return documents
+    if query_vector is None:
+        query_vector = embeddings.embed_query(query)
+    vectors = embeddings.embed_documents([doc.page_content for doc in documents])
+    relevance = [cosine(query_vector, vector) for vector in vectors]
+    selected = []
+    remaining = list(range(len(documents)))
+    while remaining:
+        def score(i):
+            redundancy = max((cosine(vectors[i], vectors[j]) for j in selected), default=0.0)
+            return lambda_mult * relevance[i] - (1 - lambda_mult) * redundancy
+        best = max(remaining, key=score)
+        selected.append(best)
+        remaining.remove(best)
+    return [documents[i] for i in selected]
+
+def pack_context(documents, query=None, embeddings=None, budget=CONTEXT_TOKEN_BUDGET, mmr=CONTEXT_MMR,
+                 query_vector=None):
+    """
+    Assemble retrieved chunks into a prompt context that fits a token budget.
+
+    Near-duplicates are dropped, chunks are optionally reordered with MMR, overlapping
+    chunks from the same page are merged, and the result is packed best-first until
+    the budget is spent. A chunk that does not fit is skipped in favour of smaller
+    ones further down; only a top chunk that is larger than the whole budget is cut.
+    Pass query_vector when the query is already embedded so MMR does not embed it again.
+
+    Returns:
+        tuple: (context string, stats dict with token counts before and after)
+    """
+    tokens_before = count_tokens(CONTEXT_SEPARATOR.join(doc.page_content for doc in documents))
+    candidates = drop_near_duplicates(documents)
+    near_duplicates = len(documents) - len(candidates)
+    if mmr and embeddings is not None and query:
+        candidates = mmr_order(candidates, query, embeddings, query_vector=query_vector)
+    merged = merge_overlapping(candidates)
+
+    separator_tokens = count_tokens(CONTEXT_SEPARATOR)
+    packed = []
+    used = 0
+    for doc in merged:
+        cost = count_tokens(doc.page_content) + (separator_tokens if packed else 0)
+        if used + cost <= budget:
+            packed.append(doc.page_content)
+            used += cost
+        elif not packed:
+            packed.append(truncate_to_tokens(doc.page_content, budget))
+            used = budget
+
+    context = CONTEXT_SEPARATOR.join(packed)
+    return context, {
+        "chunks_before": len(documents),
+        "chunks_after": len(packed),
+        "near_duplicates_dropped": near_duplicates,
+        "chunks_merged": len(candidates) - len(merged),
+        "context_tokens_before": tokens_before,
+        "context_tokens_after": count_tokens(context),
+        "token_budget": budget,
+        "mmr": bool(mmr and embeddings is not None and query),
+        "tokenizer": CONTEXT_ENCODING if _encoding else "estimate",
+    }
@@ -0,0 +1,234 @@
+import os
+import time
+import random
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# --- Configuration ---
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "google")  # "google", "local" or "fake"
+EMBEDDING_MODEL = "models/embedding-001"
+# Directory of a sentence-transformers model, e.g. ./models/all-MiniLM-L6-v2, for EMBEDDING_PROVIDER=local
+LOCAL_EMBEDDING_MODEL_PATH = os.getenv("LOCAL_EMBEDDING_MODEL_PATH", "./models/all-MiniLM-L6-v2")
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "64"))
+LOCAL_EMBEDDING_THREADS = int(os.getenv("LOCAL_EMBEDDING_THREADS", str(os.cpu_count() or 1)))
+EMBEDDING_CACHE = os.getenv("EMBEDDING_CACHE", "on") == "on"
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "6"))
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+
+class EmbeddingError(Exception):
+    """Raised when a batch still fails after all retries."""
+
+class StubEmbeddings:
+    """
+    Deterministic offline embedder for tests and benchmarks. Vectors are derived
+    from a hash of the text; latency and rate limiting can be simulated.
+
+    Implements the embed_documents/embed_query interface of langchain Embeddings.
+    """
+
+    def __init__(self, dim=768, latency=0.0, rate_limit_rate=0.0, seed=0):
+        self.dim = dim
+        self.latency = latency
+        self.rate_limit_rate = rate_limit_rate
+        self.random = random.Random(seed)
+        self.calls = 0
+
+    def _vector(self, text):
+        values = []
+        counter = 0
+        while len(values) < self.dim:
+            digest = hashlib.sha256(f"{counter}|{text}".encode("utf-8")).digest()
+            values.extend((b - 127.5) / 127.5 for b in digest)
+            counter += 1
+        values = values[:self.dim]
+        norm = sum(v * v for v in values) ** 0.5 or 1.0
+        return [v / norm for v in values]
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.rate_limit_rate and self.random.random() < self.rate_limit_rate:
+            raise RuntimeError("429 Resource has been exhausted (e.g. check quota).")
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+class LocalEmbeddings:
+    """
+    Sentence-embedding model loaded from a local directory and run on the CPU, so
+    neither ingest nor queries need the network. torch already spreads one batch
+    over every core, so concurrent callers take turns instead of oversubscribing
+    the CPU; embed_texts can keep its thread pool and batches simply queue.
+    """
+
+    def __init__(self, model_path=LOCAL_EMBEDDING_MODEL_PATH, batch_size=LOCAL_EMBEDDING_BATCH_SIZE,
+                 threads=LOCAL_EMBEDDING_THREADS):
+        if not os.path.isdir(model_path):
+            raise EmbeddingError(f"Local embedding model not found at '{model_path}'. "
+                                 "Set LOCAL_EMBEDDING_MODEL_PATH to a sentence-transformers model directory.")
+        import torch
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        torch.set_num_threads(max(1, threads))
+        self.model_path = model_path
+        self.lock = threading.Lock()
+        self.client = HuggingFaceEmbeddings(
+            model_name=model_path,
+            model_kwargs={"device": "cpu"},
+            encode_kwargs={"batch_size": batch_size, "normalize_embeddings": True},
+        )
+
+    def embed_documents(self, texts):
+        with self.lock:
+            return self.client.embed_documents(texts)
+
+    def embed_query(self, text):
+        with self.lock:
+            return self.client.embed_query(text)
+
+# Loading a model takes seconds, so it stays resident for the life of the process
+_local_embeddings = {}
+_local_embeddings_lock = threading.Lock()
+
+def local_embeddings(model_path=LOCAL_EMBEDDING_MODEL_PATH):
+    with _local_embeddings_lock:
+        if model_path not in _local_embeddings:
+            _local_embeddings[model_path] = LocalEmbeddings(model_path)
+        return _local_embeddings[model_path]
+
+def embedding_model_name():
+    """
+    Identity of the embedding model EMBEDDING_PROVIDER selects. Vectors from
+    different models are not comparable, so stores and caches are keyed by it.
+    """
+    if EMBEDDING_PROVIDER == "fake":
+        return "fake"
+    if EMBEDDING_PROVIDER == "local":
+        # The full path: model directories with the same name can hold different models
+        return f"local:{os.path.realpath(LOCAL_EMBEDDING_MODEL_PATH)}"
+    return EMBEDDING_MODEL
+
+def legacy_embedding_model_names():
+    """
+    Identities earlier versions recorded for the configured model. Stores built
+    with them are still accepted, and ingest records the current identity.
+    """
+    if EMBEDDING_PROVIDER == "local":
+        return [f"local:{os.path.basename(os.path.normpath(LOCAL_EMBEDDING_MODEL_PATH))}"]
+    return []
+
+def get_embeddings(google_api_key=None, cache=EMBEDDING_CACHE):
+    """
+    Build the embeddings client selected by EMBEDDING_PROVIDER, wrapped in the
+    persistent embedding cache unless EMBEDDING_CACHE=off.
+    """
+    model = embedding_model_name()
+    if EMBEDDING_PROVIDER == "fake":
+        embeddings = StubEmbeddings(
+            latency=float(os.getenv("FAKE_EMBEDDING_LATENCY", "0")),
+            rate_limit_rate=float(os.getenv("FAKE_EMBEDDING_RATE_LIMIT_RATE", "0")),
+        )
+    elif EMBEDDING_PROVIDER == "local":
+        embeddings = local_embeddings()
+    else:
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+        embeddings = GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL, google_api_key=google_api_key)
+
+    if not cache:
+        return embeddings
+
+    from embedding_cache import CachedEmbeddings, EmbeddingCache
+    return CachedEmbeddings(embeddings, model, EmbeddingCache())
+
+def cache_stats(embeddings):
+    """Hit/miss counters of the embedding cache, or None when caching is off."""
+    cache = getattr(embeddings, "cache", None)
+    return cache.stats() if cache is not None else None
+
+def is_rate_limit_error(error):
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in ("429", "resourceexhausted", "resource has been exhausted", "rate limit", "quota"))
+
+def backoff_delay(attempt):
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)))
+
+def embed_texts(
+    texts,
+    embedder,
+    batch_size=EMBED_BATCH_SIZE,
+    max_concurrency=EMBED_CONCURRENCY,
+    max_retries=EMBED_MAX_RETRIES,
+):
+    """
+    Embed texts in batches with a bounded number of requests in flight.
+
+    Concurrency adapts to rate limits: a 429 halves the in-flight limit and the
+    failed batch is retried after a jittered exponential backoff, while runs of
+    successful batches raise the limit again. Only failed batches are retried.
+
+    Returns:
+        tuple: (vectors in input order, stats dict)
+    """
+    started_at = time.time()
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    results = [None] * len(batches)
+    attempts = [0] * len(batches)
+    ready_at = [0.0] * len(batches)
+    pending = list(range(len(batches)))
+    limit = max(1, max_concurrency)
+    successes_since_change = 0
+    stats = {"batches": len(batches), "requests": 0, "retries": 0, "rate_limited": 0}
+
+    with ThreadPoolExecutor(max_workers=limit) as executor:
+        in_flight = {}
+        while pending or in_flight:
+            now = time.time()
+            for idx in [i for i in pending if ready_at[i] <= now]:
+                if len(in_flight) >= limit:
+                    break
+                pending.remove(idx)
+                stats["requests"] += 1
+                in_flight[executor.submit(embedder.embed_documents, batches[idx])] = idx
+
+            if not in_flight:
+                # Everything left is waiting out a backoff
+                time.sleep(max(0.0, min(ready_at[i] for i in pending) - time.time()))
+                continue
+
+            done, _ = wait(in_flight, timeout=0.1, return_when=FIRST_COMPLETED)
+            for future in done:
+                idx = in_flight.pop(future)
+                try:
+                    results[idx] = future.result()
+                    successes_since_change += 1
+                    if successes_since_change >= limit and limit < max_concurrency:
+                        limit += 1
+                        successes_since_change = 0
+                except Exception as e:
+                    attempts[idx] += 1
+                    if attempts[idx] > max_retries:
+                        raise EmbeddingError(f"Batch {idx} failed after {max_retries} retries: {e}") from e
+                    if is_rate_limit_error(e):
+                        stats["rate_limited"] += 1
+                        limit = max(1, limit // 2)
+                        successes_since_change = 0
+                    stats["retries"] += 1
+                    ready_at[idx] = time.time() + backoff_delay(attempts[idx])
+                    pending.append(idx)
+
+    vectors = [vector for batch in results for vector in batch]
+    elapsed = time.time() - started_at
+    stats.update({
+        "chunks": len(texts),
+        "seconds": round(elapsed, 3),
+        "chunks_per_sec": round(len(texts) / elapsed, 2) if elapsed > 0 else None,
+        "final_concurrency": limit,
+    })
+    return vectors, stats
@@ -0,0 +1,157 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+
+# --- Configuration ---
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache.sqlite3")
+EMBEDDING_CACHE_MAX_MB = float(os.getenv("EMBEDDING_CACHE_MAX_MB", "512"))
+# Evict down to this fraction of the limit so eviction does not run on every insert
+EVICTION_TARGET = 0.9
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def pack_vector(vector):
+    return array("f", vector).tobytes()
+
+def unpack_vector(blob):
+    values = array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache keyed by (model, sha256(text)) with least-recently-used
+    eviction bounded by total vector bytes. Safe to share between threads.
+    """
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH, max_bytes=int(EMBEDDING_CACHE_MAX_MB * 1024 * 1024)):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            );
+            CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used);
+        """)
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+
+    def get_many(self, model, hashes):
+        """Return {text_hash: vector} for the hashes present in the cache."""
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        with self.lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(unique), 500):
+                part = unique[start:start + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self.conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *part],
+                ).fetchall()
+                found.update((h, unpack_vector(blob)) for h, blob in rows)
+            if found:
+                now = time.time()
+                with self.conn:
+                    self.conn.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                        [(now, model, h) for h in found],
+                    )
+            self.hits += sum(1 for h in hashes if h in found)
+            self.misses += sum(1 for h in hashes if h not in found)
+        return found
+
+    def put_many(self, model, items):
+        """Store [(text_hash, vector)] and evict least recently used entries if over budget."""
+        now = time.time()
+        rows = [(model, h, pack_vector(v), now) for h, v in items]
+        with self.lock:
+            with self.conn:
+                for model_name, h, blob, used in rows:
+                    previous = self.conn.execute(
+                        "SELECT size FROM embeddings WHERE model = ? AND text_hash = ?", (model_name, h)
+                    ).fetchone()
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                        (model_name, h, blob, len(blob), used),
+                    )
+                    self.total_bytes += len(blob) - (previous[0] if previous else 0)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        target = int(self.max_bytes * EVICTION_TARGET)
+        with self.conn:
+            rows = self.conn.execute(
+                "SELECT model, text_hash, size FROM embeddings ORDER BY last_used"
+            )
+            doomed = []
+            for model, h, size in rows:
+                if self.total_bytes <= target:
+                    break
+                doomed.append((model, h))
+                self.total_bytes -= size
+            self.conn.executemany("DELETE FROM embeddings WHERE model = ? AND text_hash = ?", doomed)
+        self.evictions += len(doomed)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "bytes": self.total_bytes,
+        }
+
+class CachedEmbeddings:
+    """
+    Wraps an embeddings client so embed_documents/embed_query consult the cache
+    first and only send misses to the wrapped client.
+    """
+
+    def __init__(self, inner, model, cache):
+        self.inner = inner
+        self.model = model
+        self.cache = cache
+
+    def embed_documents(self, texts):
+        hashes = [text_hash(text) for text in texts]
+        found = self.cache.get_many(self.model, hashes)
+
+        missing = {}
+        for h, text in zip(hashes, texts):
+            if h not in found:
+                missing.setdefault(h, text)
+        if missing:
+            vectors = self.inner.embed_documents(list(missing.values()))
+            new_items = list(zip(missing.keys(), vectors))
+            self.cache.put_many(self.model, new_items)
+            found.update(new_items)
+
+        return [found[h] for h in hashes]
+
+    def embed_query(self, text):
+        # Query and document embeddings use different task types, so key them apart
+        model = f"{self.model}#query"
+        h = text_hash(text)
+        found = self.cache.get_many(model, [h])
+        if h in found:
+            return found[h]
+        vector = self.inner.embed_query(text)
+        self.cache.put_many(model, [(h, vector)])
+        return vector
@@ -0,0 +1,131 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+from benchmark import latency_summary
+
+# Recall and latency of the quantized vector store against the current Chroma
+# retriever (as_retriever(search_kwargs={"k": 6}), i.e. similarity search with
+# k=6) and against exact float32 search. Copies ./chroma_db into scratch
+# quantized stores, so the real stores are never touched.
+# Run from the repo root: python scripts/eval_quantized.py --queries 200
+
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+
+def result_key(metadata, content):
+    return ((metadata or {}).get("source"), (metadata or {}).get("page"), content)
+
+def load_collection(chroma):
+    ids, keys, vectors = [], [], []
+    for batch_ids, texts, metadatas, embeddings in chroma.iter_batches():
+        ids.extend(batch_ids)
+        keys.extend(result_key(m, t) for m, t in zip(metadatas, texts))
+        vectors.extend(embeddings)
+    return ids, keys, vectors
+
+def query_vectors(np, matrix, count, noise, seed, query_file):
+    """
+    Embed the queries in query_file with the configured provider, or, offline,
+    perturb randomly chosen stored vectors so each query has a known neighbourhood.
+    """
+    if query_file:
+        from embedding import get_embeddings
+
+        with open(query_file) as f:
+            queries = [line.strip() for line in f if line.strip()][:count]
+        embeddings = get_embeddings(GOOGLE_API_KEY)
+        return np.asarray([embeddings.embed_query(q) for q in queries], dtype="float32")
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(matrix), size=min(count, len(matrix)), replace=False)
+    queries = matrix[picks] + rng.normal(scale=noise, size=(len(picks), matrix.shape[1])).astype("float32")
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+def evaluate(search, queries, truth, baseline, k):
+    latencies, recall, agreement, results = [], 0.0, 0.0, []
+    for i, query in enumerate(queries):
+        started_at = time.perf_counter()
+        docs = search(query.tolist(), k)
+        latencies.append(time.perf_counter() - started_at)
+        got = {result_key(doc.metadata, doc.page_content) for doc in docs}
+        results.append(got)
+        recall += len(got & truth[i]) / k
+        if baseline is not None:
+            agreement += len(got & baseline[i]) / k
+    return results, {
+        "recall_at_k": round(recall / len(queries), 4),
+        "agreement_with_chroma": round(agreement / len(queries), 4) if baseline is not None else 1.0,
+        "latency": latency_summary(latencies),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k and latency of quantized vector storage vs Chroma.")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=6)
+    parser.add_argument("--noise", type=float, default=0.05, help="Noise added to sampled vectors for offline queries")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--query-file", help="One query per line, embedded with the configured provider")
+    parser.add_argument("--multiplier", type=int, default=4, help="Re-ranked candidates per result")
+    parser.add_argument("--workdir", default=os.path.join("temp", "eval_quantized"), help="Scratch directory, wiped first")
+    parser.add_argument("--output", default="quantized_eval.json", help="Machine-readable results file")
+    args = parser.parse_args()
+
+    import numpy as np
+    from vector_backends import CHROMA_DIRECTORY, ChromaBackend, QuantizedBackend, copy_batches
+
+    if not os.path.exists(CHROMA_DIRECTORY):
+        print("RESULT:", json.dumps({"success": False, "message": f"Chroma directory '{CHROMA_DIRECTORY}' not found"}))
+        return
+
+    chroma = ChromaBackend(embeddings=None)
+    ids, keys, vectors = load_collection(chroma)
+    if not ids:
+        print("RESULT:", json.dumps({"success": False, "message": "The Chroma collection is empty"}))
+        return
+    matrix = np.asarray(vectors, dtype="float32")
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix /= np.where(norms == 0, 1, norms)
+    queries = query_vectors(np, matrix, args.queries, args.noise, args.seed, args.query_file)
+    print(f"Evaluating {len(queries)} queries over {len(ids)} chunks", file=sys.stderr)
+
+    # Exact float32 nearest neighbours are the reference for recall
+    truth = [{keys[j] for j in np.argsort(-(matrix @ query))[:args.k]} for query in queries]
+
+    modes = {}
+    baseline, modes["chroma"] = evaluate(chroma.similarity_search_by_vector, queries, truth, None, args.k)
+    modes["chroma"]["vector_bytes"] = matrix.nbytes
+
+    if os.path.exists(args.workdir):
+        shutil.rmtree(args.workdir)
+    for dtype in ("int8", "float16"):
+        store = QuantizedBackend(embeddings=None, directory=os.path.join(args.workdir, dtype), dtype=dtype)
+        copy_batches(chroma.iter_batches(), store)
+        for multiplier in (0, args.multiplier):
+            store.rerank_multiplier = multiplier
+            name = f"{dtype}_rerank_x{multiplier}" if multiplier else f"{dtype}_first_pass"
+            _, modes[name] = evaluate(store.similarity_search_by_vector, queries, truth, baseline, args.k)
+            modes[name]["vector_bytes"] = store.resident_bytes()
+
+    for name, result in modes.items():
+        print(f"{name:22s} recall@{args.k} {result['recall_at_k']:.3f}  "
+              f"agreement {result['agreement_with_chroma']:.3f}  "
+              f"p50 {result['latency']['p50'] * 1000:7.2f} ms  p95 {result['latency']['p95'] * 1000:7.2f} ms  "
+              f"vectors {result['vector_bytes'] / 1e6:8.1f} MB", file=sys.stderr)
+
+    results = {
+        "success": True,
+        "chunks": len(ids),
+        "dimension": matrix.shape[1],
+        "queries": len(queries),
+        "query_source": args.query_file or f"stored vectors + N(0, {args.noise})",
+        "k": args.k,
+        "modes": modes,
+    }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Evaluation written to {os.path.abspath(args.output)}", file=sys.stderr)
+    print("RESULT:", json.dumps(results))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import re
+import json
+import time
+from typing import Any, Iterator, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic offline chat model for tests and benchmarks. Replies are built
+    from the prompt so the answer, insights (JSON) and podcast (Person1:/Person2:
+    lines) code paths all get output they can parse. latency is paid before the
+    first token and token_latency for every streamed token after it.
+    """
+
+    latency: float = 0.0
+    token_latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _respond(self, messages: List[BaseMessage]) -> str:
+        prompt = "\n".join(str(message.content) for message in messages)
+        words = re.findall(r"[A-Za-z]{4,}", prompt.split("Input:")[-1])[:12] or ["the", "topic"]
+        topic = " ".join(words)
+        if "JSON" in prompt:
+            return json.dumps({
+                "key_takeaways": [f"{topic} point {i}" for i in range(1, 4)],
+                "did_you_know": [f"{topic} fact"],
+                "contradictions": [],
+                "examples": [f"{topic} example"],
+            })
+        if "Person1:" in prompt:
+            return "\n".join(
+                f"Person{1 + i % 2}: Line {i} about {topic}, said in a natural conversational tone."
+                for i in range(12)
+            )
+        return f"Based on the context, {topic} is described in the documents. " * 3
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        text = self._respond(messages)
+        time.sleep(self.latency + self.token_latency * len(text.split()))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        text = self._respond(messages)
+        time.sleep(self.latency)
+        for token in re.findall(r"\S+\s*|\s+", text):
+            if self.token_latency:
+                time.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
@@ -4,7 +4,7 @@ import sys
 import json
 import argparse
 import time
-from pydub import AudioSegment
+import uuid
 
 def log_error(message):
     print(f"[PODCAST ERROR] {message}", file=sys.stderr)
@@ -20,47 +20,50 @@ os.environ.setdefault("AZURE_SPEECH_KEY", azure_key)
 os.environ.setdefault("AZURE_SPEECH_REGION", azure_region)
 
 try:
-    from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
-    from langchain_community.vectorstores import Chroma
-    from langchain.prompts import PromptTemplate
-    from langchain.chains import RetrievalQA
-    import azure.cognitiveservices.speech as speechsdk
+    from llm import get_chat_model
+    from metrics import Metrics
+    from context_packing import count_tokens
+    from tts import VOICES, ProgressiveWavWriter, SynthesisPipeline, assemble_audio, clip_cache_stats, get_tts_provider
 except ImportError as e:
     log_error(f"Import error: {e}")
     sys.exit(1)
 
-def text_to_speech(text, output_file, gender="F"):
-    speech_config = speechsdk.SpeechConfig(subscription=azure_key, region=azure_region)
-    voice = "en-IN-AartiIndicNeural" if gender.upper()=="F" else "en-IN-PrabhatIndicNeural"
-    speech_config.speech_synthesis_voice_name = voice
-    audio_conf = speechsdk.audio.AudioOutputConfig(filename=output_file)
-    synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config, audio_config=audio_conf)
-    res = synthesizer.speak_text_async(text).get()
-    if res.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
-        log_error(f"Generated {output_file}")
-        return True
-    log_error(f"TTS failed for {output_file}: {res.cancellation_details.reason}")
-    return False
-
-def generate_dialogue_script(topic):
-    # Use fallback direct generation for simplicity
-    llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash", google_api_key=google_key, temperature=0.7)
-    prompt = f"""
+DIALOGUE_PROMPT = """
 You are a podcast writer. Create a 2-3 minute conversational dialogue between two speakers about the topic: {topic}.
 Structure as alternating short exchanges prefixed by "Person1:" and "Person2:".
 Separate each line with a newline.
 Make it engaging and informative with natural conversation flow.
 """
-    resp = llm.invoke(prompt)
-    return resp.content.strip()
 
-def merge_audios(audio_paths, output_path):
-    combined = AudioSegment.empty()
-    for p in audio_paths:
-        seg = AudioSegment.from_file(p)
-        combined += seg
-    combined.export(output_path, format="wav")
-    log_error(f"Merged audio saved to {output_path}")
+CONTEXT_PROMPT = """
+Base the conversation on these excerpts from the user's documents:
+{context}
+"""
+
+def dialogue_prompt(topic, context=None):
+    prompt = DIALOGUE_PROMPT.format(topic=topic)
+    return prompt + CONTEXT_PROMPT.format(context=context) if context else prompt
+
+def stream_dialogue_lines(prompt):
+    """Yield non-empty script lines as soon as the LLM has streamed each one completely."""
+    llm = get_chat_model("gemini-1.5-flash", 0.7, google_key)
+    pending = ""
+    for chunk in llm.stream(prompt):
+        pending += chunk.content
+        *complete, pending = pending.split("\n")
+        for line in complete:
+            if line.strip():
+                yield line.strip()
+    if pending.strip():
+        yield pending.strip()
+
+def parse_dialogue_line(line):
+    """Return (text, voice) for a Person1:/Person2: line, or None for anything else."""
+    if line.startswith("Person1:"):
+        return line.split("Person1:",1)[1].strip(), VOICES["F"]
+    if line.startswith("Person2:"):
+        return line.split("Person2:",1)[1].strip(), VOICES["M"]
+    return None
 
 def emit(payload, ok=True, code=0):
     out = {"ok": ok, **payload}
@@ -68,55 +71,97 @@ def emit(payload, ok=True, code=0):
     sys.stdout.flush()
     sys.exit(code)
 
+def emit_event(event):
+    """Write an NDJSON progress line ahead of the final result."""
+    sys.stdout.write(json.dumps(event, ensure_ascii=False) + "\n")
+    sys.stdout.flush()
+
+def generate_podcast(topic, audio_format="wav", progressive=False, context=None):
+    """
+    Stream the dialogue script from the LLM, synthesize each line as soon as it is
+    complete and write the audio file. context, when given, is retrieved document
+    text the dialogue should draw on. With progressive WAV output the file location
+    is reported as an "audio_started" event before the first line is synthesized.
+
+    Returns:
+        dict: script, audio file location and timing/cache stats
+    """
+    log_error(f"Starting two-person podcast generation for topic: {topic[:100]}...")
+    metrics = Metrics("podcast")
+
+    temp_dir = os.path.join("temp", "audio")
+    os.makedirs(temp_dir, exist_ok=True)
+
+    # Unique per request so concurrent podcasts never share files
+    final_fname = f"podcast_{int(time.time())}_{uuid.uuid4().hex[:8]}.{audio_format}"
+    final_path = os.path.join(temp_dir, final_fname)
+
+    # Lines go to synthesis as soon as they are parsed from the LLM stream,
+    # so TTS overlaps generation instead of waiting for the whole script.
+    provider = get_tts_provider(azure_key, azure_region)
+    writer = ProgressiveWavWriter(final_path) if progressive and audio_format == "wav" else None
+    pipeline = SynthesisPipeline(provider, on_clip=writer.add if writer else None)
+    if writer:
+        log_error(f"Writing audio progressively to {final_path}")
+        emit_event({"type": "audio_started", "audio_file": f"/api/serve-audio/{final_fname}", "audio_path": final_path})
+
+    prompt = dialogue_prompt(topic, context)
+    started_at = time.time()
+    lines = []
+    for line in metrics.timed_iter("llm_stream", stream_dialogue_lines(prompt)):
+        lines.append(line)
+        parsed = parse_dialogue_line(line)
+        if parsed:
+            pipeline.submit(*parsed)
+    llm_seconds = time.time() - started_at
+    script = "\n".join(lines)
+    log_error(f"Dialogue script generated in {llm_seconds:.2f}s.")
+
+    with metrics.span("tts_wait"):
+        clips, tts_stats = pipeline.finish()
+    log_error(f"Synthesized {tts_stats['lines']} lines in {tts_stats['seconds']}s")
+
+    with metrics.span("audio_write"):
+        if writer:
+            audio_stats = writer.close()
+        else:
+            audio_stats = assemble_audio(clips, final_path, audio_format=audio_format)
+    log_error(f"Podcast audio saved to {final_path}")
+
+    tts_stats["llm_seconds"] = round(llm_seconds, 3)
+    tts_stats["total_seconds"] = round(time.time() - started_at, 3)
+    metrics.add_time("tts", tts_stats["seconds"])
+    metrics.count("llm_calls")
+    metrics.count("prompt_tokens", count_tokens(prompt))
+    metrics.count("completion_tokens", count_tokens(script))
+    metrics.count("tts_lines", tts_stats["lines"])
+    metrics.count("tts_failed_lines", len(tts_stats["failed_lines"]))
+    metrics.count("audio_bytes_written", audio_stats["bytes_written"])
+    metrics.count_cache("tts_cache", clip_cache_stats(provider))
+
+    return {
+        "script": script,
+        "audio_file": f"/api/serve-audio/{final_fname}",
+        "audio_path": final_path,
+        "tts": tts_stats,
+        "audio": audio_stats,
+        "tts_cache": clip_cache_stats(provider),
+        "metrics": metrics.finish()
+    }
+
 def main():
     parser = argparse.ArgumentParser(description="Generate two-person podcast from selected content")
     parser.add_argument("topic", type=str, help="Topic or selected content for podcast")
     parser.add_argument("--gender", type=str, default="F", choices=["M", "F"], help="Voice gender (M/F) - ignored for two-person format")
+    parser.add_argument("--format", type=str, default="wav", choices=["wav", "mp3"], help="Output audio format")
+    parser.add_argument("--progressive", action="store_true", help="Append audio to the WAV output as lines finish")
+    parser.add_argument("--context-stdin", action="store_true",
+                        help="Read retrieved document context to base the dialogue on from stdin")
     args = parser.parse_args()
+    context = sys.stdin.read().strip() if args.context_stdin else None
 
     try:
-        log_error(f"Starting two-person podcast generation for topic: {args.topic[:100]}...")
-        
-        script = generate_dialogue_script(args.topic)
-        log_error("Dialogue script generated.")
-        lines = [l.strip() for l in script.splitlines() if l.strip()]
-
-        temp_dir = os.path.join("temp", "audio")
-        os.makedirs(temp_dir, exist_ok=True)
-        
-        audio_files = []
-        for idx, line in enumerate(lines):
-            if line.startswith("Person1:"):
-                text = line.split("Person1:",1)[1].strip()
-                gender = "F"
-            elif line.startswith("Person2:"):
-                text = line.split("Person2:",1)[1].strip()
-                gender = "M"
-            else:
-                continue
-            
-            fname = os.path.join(temp_dir, f"audio_part_{idx}.wav")
-            if text_to_speech(text, fname, gender):
-                audio_files.append(fname)
-
-        timestamp = int(time.time())
-        final_fname = f"podcast_{timestamp}.wav"
-        final_path = os.path.join(temp_dir, final_fname)
-        
-        merge_audios(audio_files, final_path)
-        
-        for audio_file in audio_files:
-            try:
-                os.remove(audio_file)
-            except:
-                pass
-        
-        emit({
-            "script": script,
-            "audio_file": f"/api/serve-audio/{final_fname}",
-            "audio_path": final_path
-        }, ok=True)
-        
+        emit(generate_podcast(args.topic, args.format, args.progressive, context or None), ok=True)
     except Exception as e:
         log_error(f"Exception in main: {str(e)}")
         emit({"error": str(e)}, ok=False, code=2)
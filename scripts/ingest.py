@@ -1,144 +1,467 @@
 import os
-import sys
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_community.vectorstores import Chroma
+import time
+import argparse
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from embedding import (EMBEDDING_PROVIDER, EmbeddingError, cache_stats, embed_texts, embedding_model_name, get_embeddings,
+                       legacy_embedding_model_names)
+from lexical_index import LexicalIndex
+from metrics import Metrics
+from manifest import IngestManifest, chunk_id, file_sha256, text_sha256
+from pdf_parsing import INGEST_WORKERS, PDF_PARSER, iter_parsed_pdfs, plan_tasks
+from sections import SECTION_MAX_CHARS, build_sections, section_chunks
+from vector_backends import EmbeddingModelMismatch, check_embedding_model, get_vector_backend
 
 # Get the Google API key from environment variables
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
 # --- Configuration ---
-VECTOR_STORE_DIRECTORY = "./chroma_db"
 CHUNK_SIZE = 500
 CHUNK_OVERLAP = 100
+# "recursive" splits every page into CHUNK_SIZE pieces; "sections" chunks by the
+# headings found in the PDF's layout. Applies to files ingested from then on.
+CHUNKER = os.getenv("CHUNKER", "recursive")
+# Chunks embedded and committed together; progress is durable per batch
+INGEST_BATCH_CHUNKS = int(os.getenv("INGEST_BATCH_CHUNKS", "256"))
+# Batches held in memory at once, including the one being assembled
+INGEST_MAX_INFLIGHT_BATCHES = int(os.getenv("INGEST_MAX_INFLIGHT_BATCHES", "2"))
+# Held while writing to the vector store, lexical index and manifest
+STORE_LOCK_PATH = "./ingest.lock"
 
-def ingest_documents(document_paths):
+_store_thread_lock = threading.Lock()
+
+@contextmanager
+def store_write_lock(path=STORE_LOCK_PATH):
+    """
+    Serialize store writes between ingests running in other threads or processes.
+    Parsing and embedding still overlap; only the commits take turns.
+    """
+    with _store_thread_lock, open(path, "a") as lock_file:
+        try:
+            import fcntl
+        except ImportError:
+            # No flock on Windows; ingests in the same process are still serialized
+            fcntl = None
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+def new_batch():
+    return {"chunks": [], "ids": [], "pages": [], "replaced_ids": []}
+
+def new_file_state(filepath, content_hash, known_pages, tasks):
+    return {
+        "filepath": filepath,
+        "filename": os.path.basename(filepath),
+        "content_hash": content_hash,
+        "known_pages": known_pages,
+        "tasks": tasks,
+        "tasks_left": len(tasks),
+        "page_count": 0,
+        "changed_pages": 0,
+        "unchanged_pages": 0,
+        "error": None,
+        # Section chunking only: tasks held back until the ones before them are
+        # chunked, and the heading still open at the end of the last chunked task
+        "pending": {},
+        "next_start": tasks[0][1] or 0,
+        "open_section": None,
+    }
+
+def add_section_chunks(batch, parsed, state, splitter, metrics):
     """
-    Ingest specific PDF documents, create embeddings, and store them in a Chroma vector store.
-    
+    Chunk a whole parse task by section into batch. Sections run across pages, so
+    the task is the unit of change: it is skipped when every page is unchanged
+    and otherwise re-chunked in full, replacing the chunks of all its pages.
+    Chunks are recorded in the manifest under the page they start on. The heading
+    open at the end of the previous task carries into this one, so tasks must
+    arrive in page order (see in_page_order).
+    """
+    from langchain_core.documents import Document
+
+    title = state["open_section"]
+    # Salted so that pages chunked page by page never count as unchanged here. The
+    # carried heading ends up in the chunks' metadata, so it is part of the hash.
+    salt = "sections\n" if title is None else f"sections\n{title}\n"
+    hashes = {page_number: text_sha256(f"{salt}{text}") for page_number, text, _ in parsed["pages"]}
+    known = {page_number: state["known_pages"].get(page_number) for page_number in hashes}
+    for page_number in hashes:
+        state["page_count"] = max(state["page_count"], page_number + 1)
+    sections = build_sections(parsed["pages"], title)
+    if sections:
+        state["open_section"] = sections[-1]["title"]
+    changed = [n for n in hashes if not known[n] or known[n][0] != hashes[n]]
+    state["unchanged_pages"] += len(hashes) - len(changed)
+    metrics.count("pages_unchanged", len(hashes) - len(changed))
+    if not changed:
+        return
+
+    with metrics.span("split"):
+        chunks = section_chunks(sections, splitter.split_text)
+    ids_by_page = {}
+    for chunk in chunks:
+        page_ids = ids_by_page.setdefault(chunk["page"], [])
+        page_ids.append(chunk_id(state["filename"], chunk["page"], hashes[chunk["page"]], len(page_ids)))
+        metadata = {"source": state["filepath"], "page": chunk["page"], "page_end": chunk["page_end"]}
+        if chunk["section"]:
+            metadata["section"] = chunk["section"]
+        batch["chunks"].append(Document(page_content=chunk["text"], metadata=metadata))
+        batch["ids"].append(page_ids[-1])
+    # Chunks of unchanged start pages keep their ids and are overwritten in place
+    new_ids = {cid for ids in ids_by_page.values() for cid in ids}
+    for page_number in hashes:
+        batch["pages"].append((state["filename"], page_number, hashes[page_number], ids_by_page.get(page_number, [])))
+        if known[page_number]:
+            batch["replaced_ids"].extend(cid for cid in known[page_number][1] if cid not in new_ids)
+    state["changed_pages"] += len(changed)
+    metrics.count("pages_changed", len(changed))
+    metrics.count("sections_chunked", len(chunks))
+
+def in_page_order(state, parsed):
+    """
+    Yield a file's parse tasks in page order. Results arrive in completion order,
+    so a task is held until every task before it has been yielded; at most the
+    parse results in flight are ever held.
+    """
+    state["pending"][parsed["start"] or 0] = parsed
+    while state["next_start"] in state["pending"]:
+        ready = state["pending"].pop(state["next_start"])
+        state["next_start"] = ready["end"]
+        yield ready
+
+def iter_chunk_batches(parsed_results, files, splitter, batch_size, metrics, on_parsed=None, chunker=CHUNKER):
+    """
+    Split pages into chunks as parse results stream in and yield batches of about
+    batch_size chunks. Pages whose hash matches the manifest are skipped, which is
+    also what lets an interrupted ingest resume without re-embedding committed pages.
+    """
+    from langchain_core.documents import Document
+
+    batch = new_batch()
+    for parsed in parsed_results:
+        state = files[parsed["filepath"]]
+        state["tasks_left"] -= 1
+        if on_parsed:
+            on_parsed()
+        if parsed["error"]:
+            state["error"] = parsed["error"]
+            print(f"Error loading {state['filename']}: {parsed['error']}")
+            continue
+
+        if chunker == "sections":
+            for ready in in_page_order(state, parsed):
+                add_section_chunks(batch, ready, state, splitter, metrics)
+            if len(batch["chunks"]) >= batch_size:
+                yield batch
+                batch = new_batch()
+        else:
+            for page_number, text in parsed["pages"]:
+                state["page_count"] = max(state["page_count"], page_number + 1)
+                page_hash = text_sha256(text)
+                known = state["known_pages"].get(page_number)
+                if known and known[0] == page_hash:
+                    state["unchanged_pages"] += 1
+                    metrics.count("pages_unchanged")
+                    continue
+
+                page = Document(page_content=text, metadata={"source": state["filepath"], "page": page_number})
+                with metrics.span("split"):
+                    page_chunks = splitter.split_documents([page])
+                ids = [chunk_id(state["filename"], page_number, page_hash, i) for i in range(len(page_chunks))]
+                batch["chunks"].extend(page_chunks)
+                batch["ids"].extend(ids)
+                batch["pages"].append((state["filename"], page_number, page_hash, ids))
+                if known:
+                    batch["replaced_ids"].extend(known[1])
+                state["changed_pages"] += 1
+                metrics.count("pages_changed")
+
+                if len(batch["chunks"]) >= batch_size:
+                    yield batch
+                    batch = new_batch()
+
+        if state["tasks_left"] == 0 and not state["error"]:
+            print(f"  - Parsed {state['filename']} with {parsed['backend']} "
+                  f"({state['page_count']} pages, {state['changed_pages']} new or changed)")
+
+    if batch["pages"]:
+        yield batch
+
+def commit_batch(batch, vectors, vector_store, lexical_index, manifest, metrics):
+    """
+    Write one embedded batch to the vector store and lexical index. The manifest
+    is written last so it never records pages whose chunks are not stored yet.
+    """
+    with metrics.span("vector_store_write"):
+        if batch["ids"]:
+            vector_store.add(batch["ids"], batch["chunks"], vectors)
+        # Old chunks of changed pages go only after their replacements are stored
+        vector_store.delete(batch["replaced_ids"])
+        vector_store.save()
+    with metrics.span("lexical_index_write"):
+        lexical_index.remove(batch["replaced_ids"])
+        lexical_index.add(batch["ids"], batch["chunks"])
+    with metrics.span("manifest_write"):
+        manifest.record_pages(batch["pages"])
+
+def finalize_file(state, vector_store, lexical_index, manifest):
+    """
+    Record the file's content hash once every page is committed and drop anything
+    stored for it that the manifest no longer references: pages past the new end
+    of the file and chunks from ingests that predate the manifest.
+
+    Returns:
+        int: Number of chunks removed
+    """
+    stale = set(manifest.finalize_file(state["filename"], state["content_hash"], state["page_count"],
+                                       stored_source=state["filepath"]))
+    current = {cid for _, ids in manifest.pages(state["filename"]).values() for cid in ids}
+    stale.update(cid for cid in vector_store.ids_for_source(state["filepath"]) if cid not in current)
+    stale = list(stale)
+    if stale:
+        vector_store.delete(stale)
+        vector_store.save()
+        lexical_index.remove(stale)
+    return len(stale)
+
+def merge_embedding_stats(total, stats):
+    if total is None:
+        return dict(stats)
+    for key in ("batches", "requests", "retries", "rate_limited", "chunks"):
+        total[key] += stats[key]
+    total["seconds"] = round(total["seconds"] + stats["seconds"], 3)
+    total["final_concurrency"] = stats["final_concurrency"]
+    return total
+
+def ingest_documents(document_paths, workers=INGEST_WORKERS, parser=PDF_PARSER,
+                     batch_size=INGEST_BATCH_CHUNKS, max_inflight_batches=INGEST_MAX_INFLIGHT_BATCHES,
+                     progress=None, chunker=CHUNKER):
+    """
+    Ingest specific PDF documents, create embeddings, and store them in the configured vector store.
+
+    Runs as a streaming pipeline (page -> chunk -> embed batch -> upsert), so memory
+    stays bounded by the batch size whatever the size of the documents. Every batch
+    is committed to the vector store, lexical index and manifest before the next
+    one is released, so an interrupted ingest picks up where it stopped.
+
+    Unchanged files are skipped by content hash; for changed files only the pages
+    whose text changed are re-embedded and their old chunks are replaced.
+
+    Commits hold store_write_lock, so concurrent ingests queue for the store
+    instead of racing on it.
+
     Args:
         document_paths (list): List of file paths to process
+        workers (int): Number of PDF parsing processes
+        parser (str): PDF text extraction backend, "pypdfium2" or "pypdf"
+        batch_size (int): Chunks embedded and committed together
+        max_inflight_batches (int): Batches held in memory at once
+        progress (callable): Called with a dict of counters as work advances
+        chunker (str): "recursive" or "sections"
     """
     print(f"--- Starting Document Ingestion for {len(document_paths)} documents ---")
+    started_at = time.time()
+    metrics = Metrics("ingest")
 
-    already_processed = set()
-    if os.path.exists(VECTOR_STORE_DIRECTORY):
-        try:
-            embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001", google_api_key=GOOGLE_API_KEY)
-            vector_store = Chroma(
-                persist_directory=VECTOR_STORE_DIRECTORY,
-                embedding_function=embeddings
-            )
-            # Get existing document sources to avoid duplicates
-            existing_docs = vector_store.get()
-            if existing_docs and 'metadatas' in existing_docs:
-                for metadata in existing_docs['metadatas']:
-                    if metadata and 'source' in metadata:
-                        already_processed.add(os.path.basename(metadata['source']))
-            print(f"Found {len(already_processed)} already processed documents")
-        except Exception as e:
-            print(f"Warning: Could not check existing documents: {e}")
-
-    # 1. Load Documents
-    documents = []
-    processed_files = []
+    if not GOOGLE_API_KEY and EMBEDDING_PROVIDER == "google":
+        print("Error: GOOGLE_API_KEY not found in environment variables.")
+        return {"success": False, "message": "GOOGLE_API_KEY not found"}
+
+    with metrics.span("open_stores"):
+        embeddings = get_embeddings(GOOGLE_API_KEY)
+        vector_store = get_vector_backend(embeddings)
+        manifest = IngestManifest()
+
+    # Vectors from two models in one store would make every search meaningless
+    try:
+        with store_write_lock():
+            check_embedding_model(vector_store, embedding_model_name(), record=True,
+                                  legacy_names=legacy_embedding_model_names())
+    except EmbeddingModelMismatch as e:
+        manifest.close()
+        print(f"Error: {e}")
+        return {"success": False, "message": str(e), "metrics": metrics.finish()}
+
+    # 1. Decide which files need work
     skipped_files = []
-    
+    files = {}
     for filepath in document_paths:
         if not os.path.exists(filepath):
             print(f"Error: File '{filepath}' not found.")
             continue
-            
+
         if not filepath.endswith(".pdf"):
             print(f"Skipping non-PDF file: {filepath}")
             continue
-        
+
         filename = os.path.basename(filepath)
-        if filename in already_processed:
-            print(f"  - Skipping already processed: {filename}")
+        with metrics.span("hash_files"):
+            content_hash = file_sha256(filepath)
+        metrics.count("bytes_read", os.path.getsize(filepath))
+        if manifest.file_hash(filename) == content_hash:
+            print(f"  - Skipping unchanged: {filename}")
+            # Most likely stored under this same path; a wrong guess only costs the selection fast path
+            manifest.record_stored_source(filename, filepath)
             skipped_files.append(filename)
             continue
-            
-        try:
-            loader = PyPDFLoader(filepath)
-            doc_pages = loader.load()
-            documents.extend(doc_pages)
-            processed_files.append(filename)
-            print(f"  - Loaded {filename} ({len(doc_pages)} pages)")
-        except Exception as e:
-            print(f"Error loading {filename}: {e}")
-
-    if not documents:
+
+        with metrics.span("plan_tasks"):
+            tasks = plan_tasks(filepath, parser)
+        files[filepath] = new_file_state(filepath, content_hash, manifest.pages(filename), tasks)
+
+    if not files:
+        manifest.close()
         message = f"No new documents to process. Skipped {len(skipped_files)} already processed files."
         print(message)
-        return {"success": True, "message": message, "skipped_files": skipped_files}
+        return {"success": True, "message": message, "skipped_files": skipped_files, "metrics": metrics.finish()}
 
-    # 2. Split Documents
-    print(f"\nSplitting {len(documents)} pages into chunks...")
+    # 2. Stream pages -> chunks -> embedded batches -> committed batches.
+    # Embedding of one batch overlaps with parsing and splitting of the next.
+    # The section chunker only uses the splitter on sections longer than SECTION_MAX_CHARS
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
     text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=CHUNK_SIZE,
+        chunk_size=SECTION_MAX_CHARS if chunker == "sections" else CHUNK_SIZE,
         chunk_overlap=CHUNK_OVERLAP
     )
-    chunks = text_splitter.split_documents(documents)
-    print(f"Created {len(chunks)} document chunks.")
+    tasks = [task for state in files.values() for task in state["tasks"]]
+    # Time the consumer spends waiting on the parser pool
+    parsed_results = metrics.timed_iter("parse_wait", iter_parsed_pdfs(tasks, workers=workers, backend=parser,
+                                                                       layout=chunker == "sections"))
+    lexical_index = LexicalIndex()
+    max_inflight_batches = max(1, max_inflight_batches)
+    in_flight = deque()
+    totals = {"created": 0, "chunks": 0, "removed": 0, "batches": 0, "embedding": None}
 
-    # 3. Create Embeddings
-    print("\nInitializing Google Generative AI Embeddings...")
-    if not GOOGLE_API_KEY:
-        print("Error: GOOGLE_API_KEY not found in environment variables.")
-        return {"success": False, "message": "GOOGLE_API_KEY not found"}
-        
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001", google_api_key=GOOGLE_API_KEY)
+    def report(stage):
+        if progress is None:
+            return
+        progress({
+            "stage": stage,
+            "files_total": len(files),
+            "files_parsed": sum(1 for state in files.values() if not state["tasks_left"]),
+            "tasks_total": len(tasks),
+            "tasks_parsed": sum(len(state["tasks"]) - state["tasks_left"] for state in files.values()),
+            "chunks_created": totals["created"],
+            "chunks_embedded": totals["chunks"] + sum(len(b["ids"]) for b, f in in_flight if f.done()),
+            "chunks_written": totals["chunks"],
+            "elapsed_seconds": round(time.time() - started_at, 2),
+        })
+
+    def commit_oldest():
+        batch, future = in_flight.popleft()
+        with metrics.span("embed_wait"):
+            vectors, stats = future.result()
+        lock_requested_at = time.perf_counter()
+        with store_write_lock():
+            metrics.add_time("store_lock_wait", time.perf_counter() - lock_requested_at)
+            commit_batch(batch, vectors, vector_store, lexical_index, manifest, metrics)
+        totals["chunks"] += len(batch["ids"])
+        totals["removed"] += len(batch["replaced_ids"])
+        totals["batches"] += 1
+        totals["embedding"] = merge_embedding_stats(totals["embedding"], stats)
+        print(f"  - Committed batch {totals['batches']} ({totals['chunks']} chunks stored so far)")
+        report("writing")
 
-    # 4. Create and Populate Vector Store
-    print("\nCreating and populating Chroma vector store...")
+    print(f"\nUpdating {vector_store.name} vector store in batches of {batch_size} chunks ({chunker} chunker)...")
+    processed_files = []
     try:
-        # Load existing vector store or create new one
-        if os.path.exists(VECTOR_STORE_DIRECTORY):
-            vector_store = Chroma(
-                persist_directory=VECTOR_STORE_DIRECTORY,
-                embedding_function=embeddings
-            )
-            # Add new documents to existing store
-            vector_store.add_documents(chunks)
-        else:
-            # Create new vector store
-            vector_store = Chroma.from_documents(
-                documents=chunks,
-                embedding=embeddings,
-                persist_directory=VECTOR_STORE_DIRECTORY
-            )
-        
-        print(f"Vector store updated with {len(chunks)} chunks from {len(processed_files)} files.")
-        print(f"Processed files: {', '.join(processed_files)}")
-        if skipped_files:
-            print(f"Skipped already processed files: {', '.join(skipped_files)}")
-        
+        with ThreadPoolExecutor(max_workers=max_inflight_batches) as executor:
+            batches = iter_chunk_batches(parsed_results, files, text_splitter, batch_size, metrics,
+                                         on_parsed=lambda: report("parsing"), chunker=chunker)
+            for batch in batches:
+                texts = [chunk.page_content for chunk in batch["chunks"]]
+                totals["created"] += len(texts)
+                metrics.count("chunk_characters", sum(len(text) for text in texts))
+                in_flight.append((batch, executor.submit(embed_texts, texts, embeddings)))
+                while len(in_flight) >= max_inflight_batches:
+                    commit_oldest()
+            while in_flight:
+                commit_oldest()
+
+        # 3. Files are only marked done once all of their pages are committed;
+        # a file with a failed page range is retried in full next time.
+        report("finalizing")
+        for state in files.values():
+            if state["error"] or state["tasks_left"]:
+                continue
+            with store_write_lock(), metrics.span("finalize"):
+                totals["removed"] += finalize_file(state, vector_store, lexical_index, manifest)
+            processed_files.append(state["filename"])
+    except EmbeddingError as e:
+        print(f"Error creating embeddings: {e}")
+        return {"success": False, "message": f"Embedding error: {str(e)}",
+                "chunks_count": totals["chunks"], "committed_batches": totals["batches"], "metrics": metrics.finish()}
     except Exception as e:
         print(f"Error creating/updating vector store: {e}")
-        return {"success": False, "message": f"Vector store error: {str(e)}"}
+        return {"success": False, "message": f"Vector store error: {str(e)}",
+                "chunks_count": totals["chunks"], "committed_batches": totals["batches"], "metrics": metrics.finish()}
+    finally:
+        lexical_index.close()
+        manifest.close()
+
+    embedding_stats = totals["embedding"]
+    if embedding_stats:
+        seconds = embedding_stats["seconds"]
+        embedding_stats["chunks_per_sec"] = round(embedding_stats["chunks"] / seconds, 2) if seconds > 0 else None
+        embedding_stats["cache"] = cache_stats(embeddings)
+        metrics.add_time("embed", embedding_stats["seconds"])
+        metrics.count("embedding_requests", embedding_stats["requests"])
+        metrics.count("embedding_retries", embedding_stats["retries"])
+        metrics.count("embedding_rate_limited", embedding_stats["rate_limited"])
+        metrics.count_cache("embedding_cache", embedding_stats["cache"])
+    metrics.count("chunks_written", totals["chunks"])
+    metrics.count("chunks_removed", totals["removed"])
+    metrics.count("batches_committed", totals["batches"])
+    failed_files = [state["filename"] for state in files.values() if state["error"]]
+
+    print(f"Vector store updated with {totals['chunks']} chunks from {len(processed_files)} files "
+          f"in {time.time() - started_at:.1f}s.")
+    print(f"Removed {totals['removed']} stale chunks.")
+    print(f"Processed files: {', '.join(processed_files)}")
+    if skipped_files:
+        print(f"Skipped unchanged files: {', '.join(skipped_files)}")
 
     print("\n--- Document Ingestion Complete ---")
     return {
-        "success": True, 
-        "message": f"Successfully ingested {len(processed_files)} new documents with {len(chunks)} chunks",
+        "success": True,
+        "message": f"Successfully ingested {len(processed_files)} new or changed documents with {totals['chunks']} chunks",
         "processed_files": processed_files,
+        "failed_files": failed_files,
         "skipped_files": skipped_files,
-        "chunks_count": len(chunks)
+        "chunks_count": totals["chunks"],
+        "removed_chunks_count": totals["removed"],
+        "unchanged_pages": sum(state["unchanged_pages"] for state in files.values()),
+        "committed_batches": totals["batches"],
+        "chunker": chunker,
+        "embedding": embedding_stats,
+        "metrics": metrics.finish()
     }
 
 def main():
     """
     Main function that accepts document paths as command line arguments
     """
-    if len(sys.argv) < 2:
+    arg_parser = argparse.ArgumentParser(description="Ingest PDF documents into the vector store.")
+    arg_parser.add_argument("document_paths", nargs="*", help="PDF files to ingest")
+    arg_parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="Number of PDF parsing processes")
+    arg_parser.add_argument("--parser", choices=["pypdfium2", "pypdf"], default=PDF_PARSER, help="PDF text extraction backend")
+    arg_parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_CHUNKS, help="Chunks embedded and committed together")
+    arg_parser.add_argument("--max-inflight-batches", type=int, default=INGEST_MAX_INFLIGHT_BATCHES,
+                            help="Batches held in memory at once")
+    arg_parser.add_argument("--chunker", choices=["recursive", "sections"], default=CHUNKER,
+                            help="Split pages into fixed-size pieces or chunk by detected sections")
+    args = arg_parser.parse_args()
+
+    if not args.document_paths:
         print("Usage: python ingest.py <document_path1> [document_path2] ...")
         return
-    
-    document_paths = sys.argv[1:]
-    result = ingest_documents(document_paths)
-    
+
+    result = ingest_documents(args.document_paths, workers=args.workers, parser=args.parser,
+                              batch_size=args.batch_size, max_inflight_batches=args.max_inflight_batches,
+                              chunker=args.chunker)
+
     # Print result as JSON for API consumption
     import json
     print("RESULT:", json.dumps(result))
@@ -0,0 +1,261 @@
+import os
+import sys
+import json
+import time
+import uuid
+import sqlite3
+import argparse
+import threading
+
+# --- Configuration ---
+JOBS_PATH = os.getenv("INGEST_JOBS_PATH", "./ingest_jobs.sqlite3")
+# Jobs processed at once by a worker; their store writes still take turns
+INGEST_JOB_CONCURRENCY = int(os.getenv("INGEST_JOB_CONCURRENCY", "1"))
+# An idle worker exits after this long; the API starts a new one on the next submit
+INGEST_WORKER_IDLE_SECONDS = float(os.getenv("INGEST_WORKER_IDLE_SECONDS", "60"))
+WORKER_LOCK_PATH = "./ingest_worker.lock"
+POLL_SECONDS = 0.5
+# Progress is written to the job row at most this often
+PROGRESS_INTERVAL_SECONDS = 0.5
+
+FINISHED = ("succeeded", "failed")
+
+def estimate_eta(progress):
+    """
+    Seconds left, extrapolated from how much of the parsed input has been written.
+    None until there is enough to go on.
+    """
+    tasks_parsed = progress.get("tasks_parsed") or 0
+    created = progress.get("chunks_created") or 0
+    written = progress.get("chunks_written") or 0
+    elapsed = progress.get("elapsed_seconds") or 0
+    if not tasks_parsed or not written or not elapsed:
+        return None
+    expected_chunks = created * progress["tasks_total"] / tasks_parsed
+    done = min(1.0, written / expected_chunks) if expected_chunks else 1.0
+    return round(elapsed * (1 - done) / done, 1)
+
+class JobQueue:
+    """
+    FIFO queue of ingestion jobs in SQLite, shared by the API (submit/status) and
+    the worker process. Jobs are claimed in submission order, so uploads are
+    processed fairly no matter who submitted them.
+    """
+
+    def __init__(self, path=JOBS_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                id TEXT UNIQUE NOT NULL,
+                document_paths TEXT NOT NULL,
+                status TEXT NOT NULL,
+                progress TEXT,
+                result TEXT,
+                error TEXT,
+                worker_pid INTEGER,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, seq);
+        """)
+
+    def close(self):
+        self.conn.close()
+
+    def submit(self, document_paths):
+        job_id = uuid.uuid4().hex
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO jobs (id, document_paths, status, created_at) VALUES (?, ?, 'queued', ?)",
+                (job_id, json.dumps(document_paths), time.time()),
+            )
+        return job_id
+
+    def claim(self):
+        """Atomically move the oldest queued job to running; None when the queue is empty."""
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                "SELECT id, document_paths FROM jobs WHERE status = 'queued' ORDER BY seq LIMIT 1"
+            ).fetchone()
+            if not row:
+                return None
+            self.conn.execute(
+                "UPDATE jobs SET status = 'running', worker_pid = ?, started_at = ? WHERE id = ?",
+                (os.getpid(), time.time(), row[0]),
+            )
+        return row[0], json.loads(row[1])
+
+    def update_progress(self, job_id, progress):
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE jobs SET progress = ? WHERE id = ?", (json.dumps(progress), job_id))
+
+    def finish(self, job_id, result):
+        status = "succeeded" if result.get("success") else "failed"
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, json.dumps(result), None if result.get("success") else result.get("message"),
+                 time.time(), job_id),
+            )
+
+    def requeue_orphans(self):
+        """
+        Put back every running job. Only call this from a worker holding the worker
+        lock before it claims anything: no other worker can be running then, so any
+        job still marked running was interrupted, whatever its recorded pid now
+        belongs to. They keep their place in the queue, and since ingestion commits
+        per batch the retry resumes from the last committed batch.
+        """
+        with self.lock, self.conn:
+            orphans = [row[0] for row in self.conn.execute("SELECT id FROM jobs WHERE status = 'running' ORDER BY seq")]
+            self.conn.execute("UPDATE jobs SET status = 'queued', worker_pid = NULL WHERE status = 'running'")
+        return orphans
+
+    def get(self, job_id):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT id, document_paths, status, progress, result, error, created_at, started_at, finished_at, seq "
+                "FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if not row:
+                return None
+            position = None
+            if row[2] == "queued":
+                position = self.conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND seq < ?", (row[9],)
+                ).fetchone()[0]
+        progress = json.loads(row[3]) if row[3] else None
+        if progress is not None and row[2] == "running":
+            progress["eta_seconds"] = estimate_eta(progress)
+        return {
+            "job_id": row[0],
+            "document_paths": json.loads(row[1]),
+            "status": row[2],
+            "queue_position": position,
+            "progress": progress,
+            "result": json.loads(row[4]) if row[4] else None,
+            "error": row[5],
+            "created_at": row[6],
+            "started_at": row[7],
+            "finished_at": row[8],
+        }
+
+def run_job(queue, job_id, document_paths):
+    print(f"[JOBS] Starting job {job_id}: {document_paths}", file=sys.stderr)
+    last_write = [0.0]
+
+    def on_progress(progress):
+        now = time.time()
+        if now - last_write[0] >= PROGRESS_INTERVAL_SECONDS:
+            last_write[0] = now
+            queue.update_progress(job_id, progress)
+
+    # Imported per job so submit/status/watch stay fast
+    from ingest import ingest_documents
+
+    try:
+        result = ingest_documents(document_paths, progress=on_progress)
+    except Exception as e:
+        result = {"success": False, "message": f"Ingestion failed: {str(e)}"}
+    queue.finish(job_id, result)
+    print(f"[JOBS] Finished job {job_id}: {result.get('message')}", file=sys.stderr)
+
+def run_worker(concurrency=INGEST_JOB_CONCURRENCY, idle_seconds=INGEST_WORKER_IDLE_SECONDS):
+    """
+    Process queued jobs with at most `concurrency` running at once. Only one worker
+    runs per store; a second one exits straight away.
+    """
+    lock_file = open(WORKER_LOCK_PATH, "a")
+    try:
+        import fcntl
+
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            print("[JOBS] Another ingestion worker is running", file=sys.stderr)
+            return
+    except ImportError:
+        pass
+
+    queue = JobQueue()
+    requeued = queue.requeue_orphans()
+    if requeued:
+        print(f"[JOBS] Requeued {len(requeued)} interrupted jobs", file=sys.stderr)
+
+    concurrency = max(1, concurrency)
+    running = []
+    idle_since = time.time()
+    while True:
+        running = [thread for thread in running if thread.is_alive()]
+        claimed = queue.claim() if len(running) < concurrency else None
+        if claimed:
+            thread = threading.Thread(target=run_job, args=(queue, *claimed))
+            thread.start()
+            running.append(thread)
+            continue
+        if running:
+            idle_since = time.time()
+        elif time.time() - idle_since >= idle_seconds:
+            break
+        time.sleep(POLL_SECONDS)
+
+    queue.close()
+    lock_file.close()
+
+def watch(job_id):
+    """Print the job as a JSON line whenever it changes, until it finishes."""
+    queue = JobQueue()
+    last = None
+    try:
+        while True:
+            job = queue.get(job_id)
+            if job is None:
+                print(json.dumps({"type": "error", "job_id": job_id, "message": "Job not found"}), flush=True)
+                return
+            finished = job["status"] in FINISHED
+            snapshot = json.dumps({"status": job["status"], "progress": job["progress"],
+                                   "queue_position": job["queue_position"]})
+            if snapshot != last or finished:
+                last = snapshot
+                print(json.dumps({"type": "done" if finished else "progress", **job}), flush=True)
+            if finished:
+                return
+            time.sleep(POLL_SECONDS)
+    finally:
+        queue.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Queue and run document ingestion jobs.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    submit_parser = commands.add_parser("submit", help="Queue PDF documents for ingestion")
+    submit_parser.add_argument("document_paths", nargs="+")
+    status_parser = commands.add_parser("status", help="Print a job's status and progress")
+    status_parser.add_argument("job_id")
+    watch_parser = commands.add_parser("watch", help="Stream a job's progress as JSON lines")
+    watch_parser.add_argument("job_id")
+    worker_parser = commands.add_parser("worker", help="Process queued jobs")
+    worker_parser.add_argument("--concurrency", type=int, default=INGEST_JOB_CONCURRENCY)
+    worker_parser.add_argument("--idle-seconds", type=float, default=INGEST_WORKER_IDLE_SECONDS)
+    args = parser.parse_args()
+
+    if args.command == "worker":
+        run_worker(args.concurrency, args.idle_seconds)
+    elif args.command == "watch":
+        watch(args.job_id)
+    else:
+        queue = JobQueue()
+        if args.command == "submit":
+            job_id = queue.submit(args.document_paths)
+            result = {"success": True, "job_id": job_id, "status": "queued"}
+        else:
+            job = queue.get(args.job_id)
+            result = {"success": True, **job} if job else {"success": False, "message": "Job not found"}
+        queue.close()
+        print("RESULT:", json.dumps(result))
+
+if __name__ == "__main__":
+    main()
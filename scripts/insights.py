@@ -1,8 +1,8 @@
 # insights.py
 import os, sys, json, argparse
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
+from llm import LLM_PROVIDER, get_chat_model
+from metrics import Metrics
+from context_packing import count_tokens
 
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
@@ -30,6 +30,47 @@ def emit(payload, ok=True, code=0):
     sys.stdout.flush()
     sys.exit(code)
 
+def build_insights_chain(llm):
+    """Return (prompt, prompt | llm | JSON parser) for an already built chat model."""
+    from langchain_core.prompts import PromptTemplate
+    from langchain_core.output_parsers import JsonOutputParser
+
+    parser = JsonOutputParser()
+    prompt = PromptTemplate(
+        template=PROMPT_TMPL,
+        input_variables=["question", "n"],
+        partial_variables={"format_instructions": parser.get_format_instructions()},
+    )
+    return prompt, prompt | llm | parser  # LCEL, no deprecation warnings
+
+def insights_sections(data):
+    """The four insight lists, each present even when the model left it out."""
+    return {
+        "key_takeaways": data.get("key_takeaways", []) or [],
+        "did_you_know": data.get("did_you_know", []) or [],
+        "contradictions": data.get("contradictions", []) or [],
+        "examples": data.get("examples", []) or [],
+    }
+
+def generate_insights(user_query, num=5, temperature=0.3, model="gemini-2.0-flash"):
+    """Run the insights chain and return the result with every key present."""
+    metrics = Metrics("insights")
+    llm = get_chat_model(model, temperature, GOOGLE_API_KEY)
+    prompt, chain = build_insights_chain(llm)
+
+    with metrics.span("llm"):
+        data = chain.invoke({"question": user_query, "n": num})
+    metrics.count("llm_calls")
+    metrics.count("prompt_tokens", count_tokens(prompt.format(question=user_query, n=num)))
+    metrics.count("completion_tokens", count_tokens(json.dumps(data)))
+    return {
+        "query": user_query,
+        "model": model,
+        "temperature": temperature,
+        **insights_sections(data),
+        "metrics": metrics.finish(),
+    }
+
 def main():
     parser = argparse.ArgumentParser(description="LLM-only insights as strict JSON.")
     parser.add_argument("query", type=str, help="Topic or question, or '-' to read from stdin.")
@@ -38,7 +79,7 @@ def main():
     parser.add_argument("--model", type=str, default=os.getenv("GOOGLE_MODEL_NAME", "gemini-2.0-flash"))
     args = parser.parse_args()
 
-    if not GOOGLE_API_KEY:
+    if not GOOGLE_API_KEY and LLM_PROVIDER == "google":
         emit({"error": "GOOGLE_API_KEY missing"}, ok=False, code=1)
 
     user_query = args.query
@@ -46,30 +87,7 @@ def main():
         user_query = sys.stdin.read().strip()
 
     try:
-        llm = ChatGoogleGenerativeAI(
-            model=args.model,
-            google_api_key=GOOGLE_API_KEY,
-            temperature=args.temperature,
-        )
-        parser = JsonOutputParser()
-        prompt = PromptTemplate(
-            template=PROMPT_TMPL,
-            input_variables=["question", "n"],
-            partial_variables={"format_instructions": parser.get_format_instructions()},
-        )
-        chain = prompt | llm | parser  # LCEL, no deprecation warnings
-
-        data = chain.invoke({"question": user_query, "n": args.num})
-        # Ensure all keys exist
-        result = {
-            "query": user_query,
-            "model": args.model,
-            "temperature": args.temperature,
-            "key_takeaways": data.get("key_takeaways", []) or [],
-            "did_you_know": data.get("did_you_know", []) or [],
-            "contradictions": data.get("contradictions", []) or [],
-            "examples": data.get("examples", []) or [],
-        }
+        result = generate_insights(user_query, args.num, args.temperature, args.model)
         emit(result, ok=True, code=0)
     except Exception as e:
         emit({"error": str(e)}, ok=False, code=2)
@@ -0,0 +1,183 @@
+import os
+import re
+import json
+import math
+import sqlite3
+from collections import Counter
+
+# --- Configuration ---
+LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", "./lexical_index.sqlite3")
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Terms in more than this share of chunks barely separate them but cost the most to score
+LEXICAL_MAX_DF_RATIO = float(os.getenv("LEXICAL_MAX_DF_RATIO", "0.5"))
+# Long queries (a pasted selection) keep only their rarest terms
+LEXICAL_MAX_QUERY_TERMS = int(os.getenv("LEXICAL_MAX_QUERY_TERMS", "32"))
+
+TOKEN_PATTERN = re.compile(r"\w+(?:[-./]\w+)*")
+
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have
+having he her here hers herself him himself his how i if in into is it its itself just me more most
+my myself no nor not now of off on once only or other our ours ourselves out over own same she
+should so some such than that the their theirs them themselves then there these they this those
+through to too under until up very was we were what when where which while who whom why will with
+would you your yours yourself yourselves
+""".split())
+
+def tokenize(text):
+    """
+    Lowercased word tokens. Compound tokens such as part numbers ("xr-200") and
+    acronyms with dots ("u.s.") are kept whole and also split into their parts.
+    """
+    tokens = []
+    for match in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(match)
+        if not match.isalnum():
+            tokens.extend(part for part in re.split(r"[-./]", match) if part)
+    return tokens
+
+class LexicalIndex:
+    """
+    Persistent BM25 index over chunk text, stored as an inverted index in SQLite so
+    chunks can be added and removed incrementally during ingest.
+    """
+
+    def __init__(self, path=LEXICAL_INDEX_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                chunk_id TEXT PRIMARY KEY,
+                length INTEGER NOT NULL,
+                content TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term, chunk_id)
+            );
+            CREATE INDEX IF NOT EXISTS postings_chunk ON postings(chunk_id);
+            CREATE TABLE IF NOT EXISTS totals (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                chunk_count INTEGER NOT NULL,
+                total_length INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO totals (id, chunk_count, total_length) VALUES (0, 0, 0);
+        """)
+
+    def close(self):
+        self.conn.close()
+
+    def _totals(self):
+        return self.conn.execute("SELECT chunk_count, total_length FROM totals WHERE id = 0").fetchone()
+
+    def add(self, chunk_ids, documents):
+        """Index documents under the given chunk ids, replacing any previous entries."""
+        self.remove(chunk_ids)
+        added_length = 0
+        with self.conn:
+            for cid, doc in zip(chunk_ids, documents):
+                counts = Counter(tokenize(doc.page_content))
+                length = sum(counts.values())
+                added_length += length
+                self.conn.execute(
+                    "INSERT INTO chunks (chunk_id, length, content, metadata) VALUES (?, ?, ?, ?)",
+                    (cid, length, doc.page_content, json.dumps(doc.metadata)),
+                )
+                self.conn.executemany(
+                    "INSERT INTO postings (term, chunk_id, tf) VALUES (?, ?, ?)",
+                    [(term, cid, tf) for term, tf in counts.items()],
+                )
+            self.conn.execute(
+                "UPDATE totals SET chunk_count = chunk_count + ?, total_length = total_length + ? WHERE id = 0",
+                (len(chunk_ids), added_length),
+            )
+
+    def remove(self, chunk_ids):
+        """Drop chunks from the index; unknown ids are ignored."""
+        removed = 0
+        removed_length = 0
+        with self.conn:
+            for cid in chunk_ids:
+                row = self.conn.execute("SELECT length FROM chunks WHERE chunk_id = ?", (cid,)).fetchone()
+                if not row:
+                    continue
+                removed += 1
+                removed_length += row[0]
+                self.conn.execute("DELETE FROM postings WHERE chunk_id = ?", (cid,))
+                self.conn.execute("DELETE FROM chunks WHERE chunk_id = ?", (cid,))
+            if removed:
+                self.conn.execute(
+                    "UPDATE totals SET chunk_count = chunk_count - ?, total_length = total_length - ? WHERE id = 0",
+                    (removed, removed_length),
+                )
+        return removed
+
+    def _query_terms(self, query, chunk_count):
+        """
+        Return {term: df} for the terms worth scoring: stopwords, terms no chunk
+        contains and terms in more than LEXICAL_MAX_DF_RATIO of the chunks are
+        dropped, then only the LEXICAL_MAX_QUERY_TERMS rarest are kept.
+        """
+        terms = [term for term in dict.fromkeys(tokenize(query)) if term not in STOPWORDS]
+        if not terms:
+            return {}
+        placeholders = ",".join("?" * len(terms))
+        df = dict(self.conn.execute(
+            f"SELECT term, COUNT(*) FROM postings WHERE term IN ({placeholders}) GROUP BY term", terms
+        ))
+        # A query made only of common terms still ranks by them
+        selective = {term: n for term, n in df.items() if n <= LEXICAL_MAX_DF_RATIO * chunk_count} or df
+        rarest = sorted(selective, key=selective.get)[:LEXICAL_MAX_QUERY_TERMS]
+        return {term: selective[term] for term in rarest}
+
+    def search(self, query, k=6):
+        """
+        Score chunks with Okapi BM25 against the query terms, summed in SQLite.
+
+        Returns:
+            list: [(chunk_id, score, content, metadata)] best first
+        """
+        chunk_count, total_length = self._totals()
+        if not chunk_count:
+            return []
+        terms = self._query_terms(query, chunk_count)
+        if not terms:
+            return []
+        avg_length = total_length / chunk_count
+
+        # Non-negative idf variant so very common terms never subtract score
+        weights = [(term, math.log(1 + (chunk_count - df + 0.5) / (df + 0.5))) for term, df in terms.items()]
+        rows = self.conn.execute(
+            f"""
+            WITH q(term, idf) AS (VALUES {", ".join(["(?, ?)"] * len(weights))}),
+            scores AS (
+                SELECT p.chunk_id, SUM(q.idf * p.tf * (? + 1) / (p.tf + ? * (1 - ? + ? * c.length / ?))) AS score
+                FROM q
+                JOIN postings p ON p.term = q.term
+                JOIN chunks c ON c.chunk_id = p.chunk_id
+                GROUP BY p.chunk_id
+                ORDER BY score DESC
+                LIMIT ?
+            )
+            SELECT s.chunk_id, s.score, c.content, c.metadata
+            FROM scores s JOIN chunks c ON c.chunk_id = s.chunk_id
+            ORDER BY s.score DESC
+            """,
+            [value for pair in weights for value in pair] + [BM25_K1, BM25_K1, BM25_B, BM25_B, avg_length, k],
+        ).fetchall()
+        return [(cid, score, content, json.loads(metadata)) for cid, score, content, metadata in rows]
+
+    def chunk_count(self):
+        return self._totals()[0]
+
+    def chunk_ids(self):
+        return [r[0] for r in self.conn.execute("SELECT chunk_id FROM chunks")]
+
+    def compact(self):
+        """Return the pages freed by removals to the filesystem."""
+        self.conn.execute("VACUUM")
@@ -0,0 +1,16 @@
+import os
+
+# --- Configuration ---
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "google")  # "google" or "fake"
+
+def get_chat_model(model, temperature, google_api_key=None):
+    """Build the chat model selected by LLM_PROVIDER."""
+    # Providers are imported here so importing this module stays cheap
+    if LLM_PROVIDER == "fake":
+        from fake_llm import FakeChatModel
+        return FakeChatModel(
+            latency=float(os.getenv("FAKE_LLM_LATENCY", "0.5")),
+            token_latency=float(os.getenv("FAKE_LLM_TOKEN_LATENCY", "0.01")),
+        )
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(model=model, google_api_key=google_api_key, temperature=temperature)
@@ -0,0 +1,224 @@
+import os
+import json
+import argparse
+from answer_cache import ANSWER_CACHE_PATH, AnswerCache
+from ingest import store_write_lock
+from lexical_index import LexicalIndex
+from manifest import IngestManifest, file_sha256
+from vector_backends import get_vector_backend
+
+# --- Configuration ---
+DOCS_DIRECTORY = "./docs"
+
+def path_size(path):
+    """Bytes used by a file or everything under a directory."""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                continue
+    return total
+
+class IndexStores:
+    """The vector store, lexical index and manifest opened together for maintenance."""
+
+    def __init__(self):
+        # Maintenance never embeds, so no embeddings client is needed
+        self.vector_store = get_vector_backend(None)
+        self.lexical_index = LexicalIndex()
+        self.manifest = IngestManifest()
+
+    def close(self):
+        self.lexical_index.close()
+        self.manifest.close()
+
+    def size_bytes(self):
+        return {
+            "vector_store": path_size(self.vector_store.directory),
+            "lexical_index": path_size(self.lexical_index.path),
+            "manifest": path_size(self.manifest.path),
+        }
+
+    def sources_named(self, filename):
+        """
+        Stored sources are full paths; the manifest and the API use file names. The
+        manifest records the paths, so the store is only scanned for files ingested
+        before it did.
+        """
+        stored_sources = self.manifest.stored_sources(filename)
+        if stored_sources is not None:
+            return stored_sources
+        return [source for source in self.vector_store.source_counts() if source and os.path.basename(source) == filename]
+
+    def delete_ids(self, ids):
+        ids = list(ids)
+        if ids:
+            self.vector_store.delete(ids)
+            self.vector_store.save()
+            self.lexical_index.remove(ids)
+        return len(ids)
+
+    def remove_source(self, filename):
+        # Look the paths up before the manifest forgets them
+        sources = self.sources_named(filename)
+        ids = set(self.manifest.remove_file(filename))
+        for source in sources:
+            ids.update(self.vector_store.ids_for_source(source))
+        return self.delete_ids(ids)
+
+    def orphan_chunks(self):
+        """
+        Returns:
+            tuple: (chunk ids stored but not in the manifest, manifest chunk ids missing
+            from the store, lexical index entries with no stored chunk)
+        """
+        stored = set(self.vector_store.all_ids())
+        recorded = self.manifest.all_chunk_ids()
+        lexical = set(self.lexical_index.chunk_ids())
+        return stored - recorded, recorded - stored, lexical - stored
+
+def delete_source(filename):
+    """Remove every chunk of a source from the vector store, lexical index and manifest."""
+    stores = IndexStores()
+    try:
+        with store_write_lock():
+            removed = stores.remove_source(filename)
+    finally:
+        stores.close()
+    print(f"Removed {removed} chunks for {filename}")
+    return {"success": True, "message": f"Removed {removed} chunks for {filename}", "source": filename,
+            "removed_chunks_count": removed}
+
+def reconcile(docs_directory=DOCS_DIRECTORY, apply=False):
+    """
+    Diff the PDFs in docs/ against what is indexed.
+
+    Reports sources indexed but no longer on disk, files never ingested and files
+    whose content changed since ingest, plus chunks the manifest does not account
+    for. With apply=True orphaned sources and chunks are deleted and the missing
+    or changed files are queued for ingestion.
+    """
+    on_disk = {}
+    if os.path.isdir(docs_directory):
+        on_disk = {name: os.path.join(docs_directory, name) for name in os.listdir(docs_directory) if name.endswith(".pdf")}
+
+    stores = IndexStores()
+    try:
+        ingested = stores.manifest.files()
+        stored_names = {os.path.basename(source) for source in stores.vector_store.source_counts() if source}
+        orphaned_sources = sorted((stored_names | set(ingested)) - set(on_disk))
+        not_ingested = sorted(name for name in on_disk if name not in ingested)
+        changed = sorted(name for name in on_disk if name in ingested and file_sha256(on_disk[name]) != ingested[name][0])
+        unreferenced, missing, lexical_orphans = stores.orphan_chunks()
+
+        result = {
+            "success": True,
+            "orphaned_sources": orphaned_sources,
+            "not_ingested": not_ingested,
+            "changed": changed,
+            "orphan_chunks_count": len(unreferenced),
+            "missing_chunks_count": len(missing),
+            "lexical_orphans_count": len(lexical_orphans),
+            "applied": apply,
+        }
+        if not apply:
+            return result
+
+        removed = 0
+        with store_write_lock():
+            for name in orphaned_sources:
+                removed += stores.remove_source(name)
+            # Chunks of sources that still exist but were replaced outside the manifest
+            unreferenced, _, lexical_orphans = stores.orphan_chunks()
+            removed += stores.delete_ids(unreferenced)
+            removed += stores.lexical_index.remove(list(lexical_orphans))
+        result["removed_chunks_count"] = removed
+    finally:
+        stores.close()
+
+    to_ingest = sorted(set(not_ingested) | set(changed))
+    if to_ingest:
+        from ingest_jobs import JobQueue
+
+        queue = JobQueue()
+        result["job_id"] = queue.submit([os.path.abspath(on_disk[name]) for name in to_ingest])
+        queue.close()
+        print(f"Queued {len(to_ingest)} files for ingestion as job {result['job_id']}")
+    return result
+
+def compact():
+    """Reclaim space left behind by deletes in every store."""
+    stores = IndexStores()
+    try:
+        before = stores.size_bytes()
+        with store_write_lock():
+            details = stores.vector_store.compact()
+            stores.lexical_index.compact()
+        after = stores.size_bytes()
+    finally:
+        stores.close()
+    answer_cache = None
+    if os.path.exists(ANSWER_CACHE_PATH):
+        cache = AnswerCache()
+        try:
+            cache.prune()
+            answer_cache = cache.stats()
+        finally:
+            cache.close()
+    reclaimed = sum(before.values()) - sum(after.values())
+    print(f"Compaction reclaimed {reclaimed} bytes")
+    return {"success": True, "size_before": before, "size_after": after, "reclaimed_bytes": reclaimed,
+            stores.vector_store.name: details, "answer_cache": answer_cache}
+
+def index_stats():
+    """Store sizes, chunk counts per source and orphan counts."""
+    stores = IndexStores()
+    try:
+        vector_store = stores.vector_store
+        unreferenced, missing, lexical_orphans = stores.orphan_chunks()
+        result = {
+            "success": True,
+            "backend": vector_store.name,
+            "chunks_count": vector_store.count(),
+            "lexical_chunks_count": stores.lexical_index.chunk_count(),
+            "manifest_files_count": len(stores.manifest.files()),
+            "chunks_per_source": vector_store.source_counts(),
+            "orphan_chunks_count": len(unreferenced),
+            "missing_chunks_count": len(missing),
+            "lexical_orphans_count": len(lexical_orphans),
+            "size_bytes": stores.size_bytes(),
+        }
+        if hasattr(vector_store, "tombstone_count"):
+            result["tombstones_count"] = vector_store.tombstone_count()
+    finally:
+        stores.close()
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Index maintenance commands.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    delete = subparsers.add_parser("delete", help="Remove every chunk of a source file")
+    delete.add_argument("filename")
+    reconcile_parser = subparsers.add_parser("reconcile", help="Diff docs/ against the indexed sources")
+    reconcile_parser.add_argument("--docs-dir", default=DOCS_DIRECTORY)
+    reconcile_parser.add_argument("--apply", action="store_true", help="Delete orphans and queue missing files")
+    subparsers.add_parser("compact", help="Reclaim space left by deletes")
+    subparsers.add_parser("stats", help="Report index health")
+    args = parser.parse_args()
+
+    if args.command == "delete":
+        result = delete_source(os.path.basename(args.filename))
+    elif args.command == "reconcile":
+        result = reconcile(args.docs_dir, args.apply)
+    elif args.command == "compact":
+        result = compact()
+    else:
+        result = index_stats()
+    print("RESULT:", json.dumps(result))
+
+if __name__ == "__main__":
+    main()
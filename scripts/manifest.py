@@ -0,0 +1,141 @@
+import hashlib
+import json
+import sqlite3
+import time
+
+# Kept next to ./chroma_db; records what the store currently contains
+MANIFEST_PATH = "./ingest_manifest.sqlite3"
+
+def file_sha256(filepath, block_size=1 << 20):
+    """Hash a file's bytes without reading it into memory at once."""
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def text_sha256(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class IngestManifest:
+    """
+    Persistent record of what has been ingested, keyed by file name with the
+    content hash of the file and of every page, plus the chunk ids each page
+    produced in the vector store and the paths its chunks are stored under.
+    """
+
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                source TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                page_count INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS files_content_hash ON files(content_hash);
+            CREATE TABLE IF NOT EXISTS pages (
+                source TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                page_hash TEXT NOT NULL,
+                chunk_ids TEXT NOT NULL,
+                PRIMARY KEY (source, page)
+            );
+        """)
+        # Manifests written before stored paths were recorded lack the column
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(files)")}
+        if "stored_sources" not in columns:
+            with self.conn:
+                self.conn.execute("ALTER TABLE files ADD COLUMN stored_sources TEXT")
+
+    def close(self):
+        self.conn.close()
+
+    def data_version(self):
+        """Changes whenever another connection, in any process, commits to the manifest."""
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def file_hash(self, source):
+        """Return the stored content hash for a file, or None if it was never ingested."""
+        row = self.conn.execute(
+            "SELECT content_hash FROM files WHERE source = ?", (source,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def pages(self, source):
+        """Return {page: (page_hash, [chunk_ids])} for a file."""
+        rows = self.conn.execute(
+            "SELECT page, page_hash, chunk_ids FROM pages WHERE source = ?", (source,)
+        ).fetchall()
+        return {page: (page_hash, json.loads(chunk_ids)) for page, page_hash, chunk_ids in rows}
+
+    def record_pages(self, rows):
+        """
+        Commit pages whose chunks are now in the vector store.
+
+        Args:
+            rows (list): [(source, page, page_hash, [chunk_ids])]
+        """
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO pages (source, page, page_hash, chunk_ids) VALUES (?, ?, ?, ?)",
+                [(source, page, page_hash, json.dumps(chunk_ids)) for source, page, page_hash, chunk_ids in rows],
+            )
+
+    def finalize_file(self, source, content_hash, page_count, stored_source=None):
+        """
+        Mark a file as fully ingested once every page is committed. Pages past the
+        end of the new version are dropped; their chunk ids are returned.
+        stored_source is the path the file's chunks were stored under. It is added to
+        the paths already recorded, since unchanged pages keep their chunks from an
+        ingest that may have used another path.
+        """
+        stale = [cid for page, (_, ids) in self.pages(source).items() if page >= page_count for cid in ids]
+        stored_sources = self.stored_sources(source) or []
+        if stored_source and stored_source not in stored_sources:
+            stored_sources.append(stored_source)
+        with self.conn:
+            self.conn.execute("DELETE FROM pages WHERE source = ? AND page >= ?", (source, page_count))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO files (source, content_hash, page_count, updated_at, stored_sources) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (source, content_hash, page_count, time.time(), json.dumps(stored_sources) if stored_sources else None),
+            )
+        return stale
+
+    def stored_sources(self, source):
+        """
+        Return the paths a file's chunks are stored under (their "source" metadata),
+        or None when the file is unknown or was ingested before paths were recorded.
+        """
+        row = self.conn.execute("SELECT stored_sources FROM files WHERE source = ?", (source,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def record_stored_source(self, source, stored_source):
+        """Fill in the stored path of a file ingested before paths were recorded."""
+        with self.conn:
+            self.conn.execute(
+                "UPDATE files SET stored_sources = ? WHERE source = ? AND stored_sources IS NULL",
+                (json.dumps([stored_source]), source),
+            )
+
+    def files(self):
+        """Return {source: (content_hash, page_count)} for every ingested file."""
+        rows = self.conn.execute("SELECT source, content_hash, page_count FROM files").fetchall()
+        return {source: (content_hash, page_count) for source, content_hash, page_count in rows}
+
+    def all_chunk_ids(self):
+        return {cid for (chunk_ids,) in self.conn.execute("SELECT chunk_ids FROM pages") for cid in json.loads(chunk_ids)}
+
+    def remove_file(self, source):
+        """Forget a file and return the chunk ids it owned."""
+        chunk_ids = [cid for _, ids in self.pages(source).values() for cid in ids]
+        with self.conn:
+            self.conn.execute("DELETE FROM pages WHERE source = ?", (source,))
+            self.conn.execute("DELETE FROM files WHERE source = ?", (source,))
+        return chunk_ids
+
+def chunk_id(source, page, page_hash, index):
+    """Deterministic vector store id for the index-th chunk of a page version."""
+    return hashlib.sha1(f"{source}|{page}|{page_hash}|{index}".encode("utf-8")).hexdigest()
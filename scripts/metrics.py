@@ -0,0 +1,151 @@
+import os
+import sys
+import time
+import threading
+from contextlib import contextmanager
+
+# --- Configuration ---
+# Append every run's metrics here in Prometheus text format; unset to disable
+METRICS_LOG = os.getenv("METRICS_LOG")
+METRIC_PREFIX = "pdf_reader"
+PROMETHEUS_METRICS = ["run_seconds", "span_seconds", "span_count", "counter", "process_peak_rss_bytes",
+                      "peak_rss_growth_bytes"]
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process and of finished child processes (parser
+    pool) over the whole life of the process, not just the current run.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1),
+    }
+
+def rss_fields(baseline):
+    """
+    The lifetime peak, and how much this run raised it over baseline. A run that
+    stayed below an earlier peak reports 0 growth; a fresh process's growth is its peak.
+    """
+    peak = peak_rss_mb()
+    if peak is None:
+        return {"process_peak_rss_mb": None, "peak_rss_growth_mb": None}
+    return {
+        "process_peak_rss_mb": peak,
+        "peak_rss_growth_mb": {process: round(megabytes - baseline[process], 1) for process, megabytes in peak.items()},
+    }
+
+class Metrics:
+    """
+    Timed spans and counters for one run of a script (one ingest, query, insights
+    call or podcast). Spans with the same name accumulate, so a stage that runs once
+    per batch reports its total time and how often it ran. Safe to record from
+    worker threads.
+    """
+
+    def __init__(self, script):
+        self.script = script
+        self.started_at = time.time()
+        self.spans = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+        # The peak only ever grows, so a run in a long-lived process reports how far it raised it
+        self.rss_baseline = peak_rss_mb()
+
+    def add_time(self, name, seconds):
+        with self.lock:
+            span = self.spans.setdefault(name, {"count": 0, "seconds": 0.0})
+            span["count"] += 1
+            span["seconds"] += seconds
+
+    @contextmanager
+    def span(self, name):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - started_at)
+
+    def timed_iter(self, name, iterable):
+        """Yield from iterable, counting the time spent waiting for each item as a span."""
+        iterator = iter(iterable)
+        while True:
+            started_at = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.add_time(name, time.perf_counter() - started_at)
+            yield item
+
+    def count(self, name, value=1):
+        if value is None:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def count_cache(self, prefix, stats, baseline=None):
+        """
+        Record the hit/miss counters of an embedding or clip cache stats dict. Pass
+        the stats from before the run as baseline when the cache outlives the run.
+        """
+        if not stats:
+            return
+        for key in ("hits", "misses"):
+            self.count(f"{prefix}_{key}", stats[key] - (baseline[key] if baseline else 0))
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "script": self.script,
+                "total_seconds": round(time.time() - self.started_at, 3),
+                "spans": {
+                    name: {"count": span["count"], "seconds": round(span["seconds"], 4)}
+                    for name, span in self.spans.items()
+                },
+                "counters": dict(self.counters),
+                **rss_fields(self.rss_baseline),
+            }
+
+    def finish(self, log_path=METRICS_LOG):
+        """Return the snapshot for the result JSON and append it to the metrics log if one is set."""
+        snapshot = self.snapshot()
+        if log_path:
+            try:
+                append_prometheus(log_path, snapshot)
+            except OSError as e:
+                print(f"Could not write metrics log {log_path}: {e}", file=sys.stderr)
+        return snapshot
+
+def append_prometheus(path, snapshot):
+    """
+    Append a snapshot in the Prometheus text exposition format, with sample
+    timestamps. The TYPE of every metric is declared once, when the file is created.
+    """
+    try:
+        with open(path, "x") as f:
+            f.write("".join(f"# TYPE {METRIC_PREFIX}_{name} gauge\n" for name in PROMETHEUS_METRICS))
+    except FileExistsError:
+        pass
+
+    timestamp = int(time.time() * 1000)
+    script = snapshot["script"]
+    lines = [f'{METRIC_PREFIX}_run_seconds{{script="{script}"}} {snapshot["total_seconds"]} {timestamp}']
+    for name, span in snapshot["spans"].items():
+        lines.append(f'{METRIC_PREFIX}_span_seconds{{script="{script}",span="{name}"}} {span["seconds"]} {timestamp}')
+    for name, span in snapshot["spans"].items():
+        lines.append(f'{METRIC_PREFIX}_span_count{{script="{script}",span="{name}"}} {span["count"]} {timestamp}')
+    for name, value in snapshot["counters"].items():
+        lines.append(f'{METRIC_PREFIX}_counter{{script="{script}",name="{name}"}} {value} {timestamp}')
+    for field, metric in (("process_peak_rss_mb", "process_peak_rss_bytes"), ("peak_rss_growth_mb", "peak_rss_growth_bytes")):
+        for process, megabytes in (snapshot[field] or {}).items():
+            lines.append(f'{METRIC_PREFIX}_{metric}{{script="{script}",process="{process}"}} '
+                         f'{int(megabytes * 1024 * 1024)} {timestamp}')
+    with open(path, "a") as f:
+        f.write("\n".join(lines) + "\n")
@@ -0,0 +1,150 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+# Kept free of langchain imports: this module is imported by every parser process.
+
+PDF_PARSER = os.getenv("PDF_PARSER", "pypdfium2")
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "0")) or os.cpu_count() or 1
+# Large PDFs are split into page ranges so one file never sits in memory whole
+PAGES_PER_TASK = int(os.getenv("PAGES_PER_TASK", "50"))
+
+def _font_weight(textpage, index):
+    """Weight of the character's font; standard fonts report none, so fall back to the font name."""
+    import ctypes
+    import pypdfium2.raw as pdfium_c
+
+    weight = pdfium_c.FPDFText_GetFontWeight(textpage.raw, index)
+    if weight > 0:
+        return weight
+    name = ctypes.create_string_buffer(128)
+    pdfium_c.FPDFText_GetFontInfo(textpage.raw, index, name, len(name), None)
+    return 700 if b"bold" in name.value.lower() else 400
+
+def _line_layout(textpage, text):
+    """
+    Return [(line, font_size, font_weight)] for the lines of a page, with the font
+    sampled at the middle of each line, or None when the text does not map one to
+    one onto the page's characters.
+    """
+    import pypdfium2.raw as pdfium_c
+
+    if len(text) != textpage.count_chars():
+        return None
+    lines = []
+    for match in re.finditer(r"[^\r\n]+", text):
+        line = match.group().strip()
+        if not line:
+            continue
+        index = (match.start() + match.end()) // 2
+        lines.append((line, round(pdfium_c.FPDFText_GetFontSize(textpage.raw, index), 1),
+                      _font_weight(textpage, index)))
+    return lines
+
+def _parse_with_pypdfium2(filepath, start, end, layout=False):
+    import pypdfium2 as pdfium
+
+    pages = []
+    pdf = pdfium.PdfDocument(filepath)
+    try:
+        stop = len(pdf) if end is None else min(end, len(pdf))
+        for page_number in range(start or 0, stop):
+            page = pdf[page_number]
+            textpage = page.get_textpage()
+            text = textpage.get_text_range()
+            pages.append((page_number, text, _line_layout(textpage, text)) if layout else (page_number, text))
+            textpage.close()
+            page.close()
+    finally:
+        pdf.close()
+    return pages
+
+def _parse_with_pypdf(filepath, start, end, layout=False):
+    # PyPDFLoader has no font information; pages come back without a layout
+    from langchain_community.document_loaders import PyPDFLoader
+
+    pages = []
+    for idx, doc in enumerate(PyPDFLoader(filepath).load()):
+        page_number = doc.metadata.get("page", idx)
+        if (start is None or page_number >= start) and (end is None or page_number < end):
+            pages.append((page_number, doc.page_content, None) if layout else (page_number, doc.page_content))
+    return pages
+
+PARSERS = {
+    "pypdfium2": _parse_with_pypdfium2,
+    "pypdf": _parse_with_pypdf,
+}
+
+def page_count(filepath):
+    """Cheap page count via pypdfium2, or None if it cannot be determined."""
+    try:
+        import pypdfium2 as pdfium
+
+        pdf = pdfium.PdfDocument(filepath)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+    except Exception:
+        return None
+
+def plan_tasks(filepath, backend=PDF_PARSER, pages_per_task=PAGES_PER_TASK):
+    """
+    Split a file into (filepath, start, end) page-range tasks. Falls back to one
+    whole-file task when the page count is unknown or the backend is pypdf, which
+    always loads the full document.
+    """
+    count = page_count(filepath) if backend == "pypdfium2" else None
+    if not count or count <= pages_per_task:
+        return [(filepath, None, None)]
+    return [(filepath, start, min(start + pages_per_task, count)) for start in range(0, count, pages_per_task)]
+
+def parse_pdf(filepath, backend=PDF_PARSER, start=None, end=None, layout=False):
+    """
+    Extract the text of the pages in [start, end) of a PDF, or all pages.
+
+    Falls back to PyPDFLoader when the requested backend is unavailable or fails
+    on this file. With layout=True every page also carries its lines with their
+    font size and weight (None when the backend cannot tell), for section detection.
+
+    Returns:
+        dict: {"filepath", "start", "end", "pages": [(page_number, text)] or
+        [(page_number, text, lines)] with layout, "backend", "error"}
+    """
+    backends = [backend] if backend == "pypdf" else [backend, "pypdf"]
+    errors = []
+    for name in backends:
+        try:
+            pages = PARSERS[name](filepath, start, end, layout)
+            return {"filepath": filepath, "start": start, "end": end, "pages": pages, "backend": name, "error": None}
+        except Exception as e:
+            errors.append(f"{name}: {e}")
+    return {"filepath": filepath, "start": start, "end": end, "pages": [], "backend": None, "error": "; ".join(errors)}
+
+def iter_parsed_pdfs(tasks, workers=INGEST_WORKERS, backend=PDF_PARSER, layout=False):
+    """
+    Parse (filepath, start, end) tasks across a process pool and yield each result as
+    soon as it is done, in completion order rather than input order. At most two
+    tasks per worker are queued at a time, so results never pile up in memory
+    ahead of the consumer.
+    """
+    tasks = list(tasks)
+    workers = max(1, min(workers, len(tasks)))
+    if workers == 1:
+        for filepath, start, end in tasks:
+            yield parse_pdf(filepath, backend, start, end, layout)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        remaining = iter(tasks)
+        in_flight = set()
+        while True:
+            for filepath, start, end in remaining:
+                in_flight.add(executor.submit(parse_pdf, filepath, backend, start, end, layout))
+                if len(in_flight) >= workers * 2:
+                    break
+            if not in_flight:
+                return
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
@@ -0,0 +1,142 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+# Cold-start profile of the Python entry points. Each case runs a script on a
+# path that exits before doing any real work (--help, a missing argument or a
+# missing API key), so the wall time is interpreter start-up plus module
+# imports. Run from the repo root: python scripts/profile_imports.py
+
+SCRIPTS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+# --- Configuration ---
+# Every early-exit path should return within this many milliseconds
+COLD_START_TARGET_MS = float(os.getenv("COLD_START_TARGET_MS", "300"))
+# None of these may be imported on an early-exit path
+HEAVY_PACKAGES = ("langchain", "langchain_core", "langchain_community", "langchain_google_genai", "chromadb",
+                  "faiss", "numpy", "pypdf", "pypdfium2", "tiktoken", "pydub", "azure", "google")
+MISSING_KEY_ENV = {"GOOGLE_API_KEY": None, "EMBEDDING_PROVIDER": "google", "LLM_PROVIDER": "google"}
+
+# (case name, script, arguments, environment overrides; None removes a variable)
+CASES = [
+    ("query_no_args", "query.py", [], {}),
+    ("query_missing_store", "query.py", ["what is this?"], MISSING_KEY_ENV),
+    ("query_related_missing_index", "query.py", ["--related", "what is this?"], {}),
+    ("insights_help", "insights.py", ["--help"], {}),
+    ("analyse_help", "analyse.py", ["--help"], {}),
+    ("insights_missing_key", "insights.py", ["what is this?"], MISSING_KEY_ENV),
+    ("podcast_help", "generate-podcast.py", ["--help"], {}),
+    ("ingest_help", "ingest.py", ["--help"], {}),
+    ("ingest_jobs_help", "ingest_jobs.py", ["--help"], {}),
+    ("maintain_index_help", "maintain_index.py", ["--help"], {}),
+    ("vector_backends_help", "vector_backends.py", ["--help"], {}),
+]
+
+def case_env(overrides):
+    env = dict(os.environ)
+    for key, value in overrides.items():
+        if value is None:
+            env.pop(key, None)
+        else:
+            env[key] = value
+    return env
+
+def parse_importtime(stderr):
+    """
+    Parse `python -X importtime` output into (module, self_us, cumulative_us, depth)
+    rows. Nesting is encoded as indentation of the module name.
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        module = name.lstrip()
+        depth = (len(name) - len(module) - 1) // 2
+        rows.append((module, int(self_us), int(cumulative_us), depth))
+    return rows
+
+def profile_case(script, arguments, overrides, runs, top, workdir):
+    command = [sys.executable, os.path.join(SCRIPTS_DIRECTORY, script)] + arguments
+    env = case_env(overrides)
+
+    wall_ms = []
+    for _ in range(runs):
+        started_at = time.perf_counter()
+        completed = subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True)
+        wall_ms.append((time.perf_counter() - started_at) * 1000)
+
+    # One extra run with -X importtime; its own overhead is kept out of the wall times
+    profiled = subprocess.run([sys.executable, "-X", "importtime"] + command[1:], cwd=workdir, env=env,
+                              capture_output=True, text=True)
+    rows = parse_importtime(profiled.stderr)
+    top_level = [row for row in rows if row[3] == 0]
+    slowest = sorted(top_level, key=lambda row: row[2], reverse=True)[:top]
+
+    wall_ms.sort()
+    return {
+        "command": " ".join([script] + arguments),
+        "exit_code": completed.returncode,
+        "wall_ms": {
+            "min": round(wall_ms[0], 1),
+            "median": round(wall_ms[len(wall_ms) // 2], 1),
+            "max": round(wall_ms[-1], 1),
+        },
+        "import_ms": round(sum(row[2] for row in top_level) / 1000, 1),
+        "modules_imported": len(rows),
+        "heavy_imports": sorted({row[0] for row in rows if row[0].split(".")[0] in HEAVY_PACKAGES and row[3] == 0}),
+        "slowest_imports": [
+            {"module": module, "cumulative_ms": round(cumulative_us / 1000, 1), "self_ms": round(self_us / 1000, 1)}
+            for module, self_us, cumulative_us, _ in slowest
+        ],
+    }
+
+def interpreter_startup_ms(runs):
+    wall_ms = []
+    for _ in range(runs):
+        started_at = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], capture_output=True)
+        wall_ms.append((time.perf_counter() - started_at) * 1000)
+    wall_ms.sort()
+    return round(wall_ms[len(wall_ms) // 2], 1)
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start and import-time profile of the Python entry points.")
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs per case; the median is checked")
+    parser.add_argument("--top", type=int, default=8, help="Slowest top-level imports to report per case")
+    parser.add_argument("--target-ms", type=float, default=COLD_START_TARGET_MS)
+    parser.add_argument("--output", default="import_profile.json", help="Machine-readable results file")
+    args = parser.parse_args()
+
+    # An empty directory, so cases that look for stores exit on "not found"
+    with tempfile.TemporaryDirectory() as workdir:
+        cases = {}
+        for name, script, arguments, overrides in CASES:
+            result = profile_case(script, arguments, overrides, max(1, args.runs), args.top, workdir)
+            result["within_target"] = result["wall_ms"]["median"] <= args.target_ms and not result["heavy_imports"]
+            cases[name] = result
+            print(f"{name:30s} {result['wall_ms']['median']:8.1f} ms  imports {result['import_ms']:8.1f} ms  "
+                  f"{'ok' if result['within_target'] else 'SLOW'} {' '.join(result['heavy_imports'])}", file=sys.stderr)
+
+    # The bare interpreter is the floor no script can go below
+    baseline = interpreter_startup_ms(max(1, args.runs))
+    results = {
+        "target_ms": args.target_ms,
+        "interpreter_ms": baseline,
+        "python": sys.version.split()[0],
+        "cases": cases,
+        "all_within_target": all(case["within_target"] for case in cases.values()),
+    }
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Import profile written to {os.path.abspath(args.output)}", file=sys.stderr)
+    print("RESULT:", json.dumps(results))
+    sys.exit(0 if results["all_within_target"] else 1)
+
+if __name__ == "__main__":
+    main()
@@ -1,93 +1,480 @@
 import os
 import sys
 import json
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
-from langchain_community.vectorstores import Chroma
-from langchain.prompts import PromptTemplate
-from langchain.chains import RetrievalQA
+import time
+from context_packing import count_tokens, pack_context
+from answer_cache import ANSWER_CACHE, AnswerCache
+from embedding import EMBEDDING_PROVIDER, cache_stats, embedding_model_name, get_embeddings, legacy_embedding_model_names
+from llm import LLM_PROVIDER, get_chat_model
+from metrics import Metrics
+from lexical_index import LEXICAL_INDEX_PATH, LexicalIndex
+from manifest import IngestManifest
+from selection import SelectionResolver
+from vector_backends import (VECTOR_BACKEND, EmbeddingModelMismatch, check_embedding_model, get_vector_backend,
+                             vector_store_exists)
 
 # Get the Google API key from environment variables
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
 # --- Configuration ---
-VECTOR_STORE_DIRECTORY = "./chroma_db"
+TOP_K = 6
+LLM_MODEL = "gemini-2.0-flash"
+LLM_TEMPERATURE = 0.3
+
+PROMPT_TEMPLATE = """
+Use the following pieces of context to respond to the input at the end.
+- If the input is a **question**, answer it directly.
+- If the input is a **term or phrase**, provide a clear explanation.
+Prioritize the given context first, but you may also use your own knowledge if it helps.
+If you still don't know the answer, say that you don't know.
+
+Context:
+{context}
+
+Input: {question}
+
+Response:
+"""
+
+def open_lexical_index():
+    return LexicalIndex() if os.path.exists(LEXICAL_INDEX_PATH) else None
+
+def format_sources(documents):
+    sources = []
+    for source in documents:
+        sources.append({
+            "file": source.metadata.get('source', 'Unknown'),
+            "page": source.metadata.get('page', 'Unknown'),
+            "section": source.metadata.get('section'),
+            "content": source.page_content[:200] + "..." if len(source.page_content) > 200 else source.page_content
+        })
+    return sources
+
+def related_sections(lexical_index, user_query, k=TOP_K):
+    """
+    Lexical-only fast path for "related sections" lookups. Uses the BM25 index
+    alone, so it needs no API key and makes no embedding or LLM call.
+    """
+    if lexical_index is None:
+        return {"error": f"Lexical index '{LEXICAL_INDEX_PATH}' not found. Please run ingest.py first."}
+    from retrieval import lexical_documents
+    return {
+        "sources": format_sources(lexical_documents(lexical_index, user_query, k)),
+        "query": user_query,
+        "retrieval": "lexical"
+    }
+
+def load_resources():
+    """
+    Build everything a query needs exactly once: embeddings client, vector store,
+    retriever, LLM and the prompt | llm answer chain.
+
+    Returns:
+        dict: The loaded resources, or a dict with an "error" key.
+    """
+    # 1. Initialize Embeddings and Vector Store
+    if not vector_store_exists():
+        return {"error": f"No {VECTOR_BACKEND} vector store found. Please run ingest.py first."}
+
+    if not GOOGLE_API_KEY and "google" in (EMBEDDING_PROVIDER, LLM_PROVIDER):
+        return {"error": "GOOGLE_API_KEY not found in environment variables."}
+
+    # langchain is only imported once a query can actually run, so argument and
+    # configuration errors return without paying for it
+    from langchain_core.prompts import PromptTemplate
+    from langchain_core.output_parsers import StrOutputParser
+    from retrieval import RETRIEVAL_MODE, build_retriever
+
+    embeddings = get_embeddings(GOOGLE_API_KEY)
+    vector_store = get_vector_backend(embeddings, read_only=True)
+    try:
+        check_embedding_model(vector_store, embedding_model_name(), legacy_names=legacy_embedding_model_names())
+    except EmbeddingModelMismatch as e:
+        return {"error": str(e)}
+
+    # 2. Initialize the LLM
+    llm = get_chat_model(LLM_MODEL, LLM_TEMPERATURE, GOOGLE_API_KEY)
+
+    # 3. Create a Retriever (BM25 + vector fused with RRF when the lexical index exists)
+    manifest = IngestManifest()
+    store_version = stores_version(manifest)
+    lexical_index = open_lexical_index()
+    retriever = build_retriever(vector_store, lexical_index, mode=RETRIEVAL_MODE, k=TOP_K)
+
+    # 4. Create a Prompt Template
+    QA_PROMPT = PromptTemplate(
+        template=PROMPT_TEMPLATE, input_variables=["context", "question"]
+    )
+
+    # 5. Create the answer chain. Retrieval runs separately so sources can be
+    # reported before generation starts.
+    qa_chain = QA_PROMPT | llm | StrOutputParser()
+
+    return {
+        "embeddings": embeddings,
+        "vector_store": vector_store,
+        "llm": llm,
+        "lexical_index": lexical_index,
+        "retriever": retriever,
+        "qa_chain": qa_chain,
+        "answer_cache": open_answer_cache() if ANSWER_CACHE else None,
+        "manifest": manifest,
+        "store_version": store_version,
+        "selection_resolver": SelectionResolver(vector_store, manifest=manifest),
+    }
+
+def stores_version(manifest):
+    """
+    Changes whenever the stores were written by another process: every ingest and
+    delete commits to the manifest, and reconcile rewrites the lexical index.
+    """
+    lexical_mtime = os.stat(LEXICAL_INDEX_PATH).st_mtime_ns if os.path.exists(LEXICAL_INDEX_PATH) else None
+    return manifest.data_version(), lexical_mtime
+
+def refresh_stores(resources):
+    """
+    Bring a long-lived worker's stores up to date with ingests and deletes made
+    since they were opened: the vector store is re-read, the lexical index opened
+    once it exists, and the retriever rebuilt so hybrid retrieval turns on as soon
+    as there is lexical data.
+    """
+    version = stores_version(resources["manifest"])
+    if version == resources["store_version"]:
+        return False
+    from retrieval import RETRIEVAL_MODE, build_retriever
+
+    resources["vector_store"].refresh()
+    if resources["lexical_index"] is None:
+        resources["lexical_index"] = open_lexical_index()
+    resources["retriever"] = build_retriever(resources["vector_store"], resources["lexical_index"],
+                                             mode=RETRIEVAL_MODE, k=TOP_K)
+    resources["store_version"] = version
+    return True
+
+def open_answer_cache():
+    llm_model = LLM_MODEL if LLM_PROVIDER == "google" else LLM_PROVIDER
+    return AnswerCache(namespace=f"{embedding_model_name()}|{llm_model}")
+
+def lookup_answer(resources, user_query, embed_query=None, scope=""):
+    """Return (cache hit or None, query vector or None); the vector is reused for retrieval."""
+    if resources.get("answer_cache") is None:
+        return None, None
+    return resources["answer_cache"].lookup(user_query, embed_query or resources["embeddings"].embed_query, scope)
+
+def retrieve(resources, user_query, query_vector=None):
+    if query_vector is None:
+        return resources["retriever"].invoke(user_query)
+    from retrieval import RETRIEVAL_MODE, retrieve_by_vector
+    return retrieve_by_vector(resources["vector_store"], resources["lexical_index"], user_query, query_vector,
+                              mode=RETRIEVAL_MODE, k=TOP_K)
+
+def remember_answer(resources, user_query, query_vector, payload, documents, scope=""):
+    if resources.get("answer_cache") is None or query_vector is None or not payload["answer"]:
+        return
+    sources = {doc.metadata.get("source") for doc in documents}
+    resources["answer_cache"].store(user_query, query_vector, payload, sources, scope)
+
+def answer_cache_info(resources, hit):
+    """The "answer_cache" field of a response: hit or miss, match details and counters."""
+    if resources.get("answer_cache") is None:
+        return None
+    info = {"hit": hit is not None, **resources["answer_cache"].stats()}
+    if hit:
+        info.update(match=hit["match"], similarity=hit["similarity"], age_seconds=hit["age_seconds"])
+    return info
+
+def build_context(resources, documents, user_query, query_vector=None):
+    """
+    Pack retrieved chunks into the prompt context within the token budget.
+
+    Returns:
+        tuple: (context string, packing stats including prompt tokens before and after)
+    """
+    context, stats = pack_context(documents, user_query, resources["embeddings"], query_vector=query_vector)
+    prompt_tokens = count_tokens(PROMPT_TEMPLATE.format(context="", question=user_query))
+    stats["prompt_tokens_before"] = prompt_tokens + stats["context_tokens_before"]
+    stats["prompt_tokens_after"] = prompt_tokens + stats["context_tokens_after"]
+    return context, stats
+
+def finish_metrics(metrics, resources, cache_baseline, packing, answer):
+    if resources.get("answer_cache") is not None:
+        metrics.count("answer_cache_misses")
+    metrics.count("llm_calls")
+    metrics.count("prompt_tokens", packing["prompt_tokens_after"])
+    metrics.count("completion_tokens", count_tokens(answer))
+    metrics.count_cache("embedding_cache", cache_stats(resources["embeddings"]), cache_baseline)
+    return metrics.finish()
+
+def answer_query(resources, user_query):
+    """
+    Run a single query against already loaded resources.
+
+    Args:
+        resources (dict): Output of load_resources()
+        user_query (str): The selected text or question
+
+    Returns:
+        dict: JSON-serializable response with answer and sources
+    """
+    metrics = Metrics("query")
+    cache_baseline = cache_stats(resources["embeddings"])
+
+    # 6. Near-duplicate queries are answered from the answer cache
+    with metrics.span("answer_cache"):
+        hit, query_vector = lookup_answer(resources, user_query)
+    if hit:
+        return cached_response(metrics, resources, cache_baseline, user_query, hit)
+
+    # 7. Retrieve and get the Answer
+    with metrics.span("retrieval"):
+        documents = retrieve(resources, user_query, query_vector)
+    with metrics.span("context_packing"):
+        context, packing = build_context(resources, documents, user_query, query_vector)
+    with metrics.span("llm"):
+        answer = resources["qa_chain"].invoke({"context": context, "question": user_query})
+
+    # 8. Format response as JSON
+    payload = {"answer": answer, "sources": format_sources(documents), "context": packing}
+    remember_answer(resources, user_query, query_vector, payload, documents)
+    return {
+        **payload,
+        "query": user_query,
+        "answer_cache": answer_cache_info(resources, None),
+        "embedding_cache": cache_stats(resources["embeddings"]),
+        "metrics": finish_metrics(metrics, resources, cache_baseline, packing, answer)
+    }
+
+def cached_response(metrics, resources, cache_baseline, user_query, hit):
+    metrics.count("answer_cache_hits")
+    metrics.count_cache("embedding_cache", cache_stats(resources["embeddings"]), cache_baseline)
+    return {
+        **hit["payload"],
+        "query": user_query,
+        "answer_cache": answer_cache_info(resources, hit),
+        "embedding_cache": cache_stats(resources["embeddings"]),
+        "metrics": metrics.finish(),
+    }
+
+def stream_query(resources, user_query, emit):
+    """
+    Streaming variant of answer_query. Calls emit(event) with, in order:
+        {"type": "sources", "sources": [...]}   as soon as retrieval finishes
+        {"type": "token", "text": "..."}        for every chunk the LLM streams
+        {"type": "done", ...}                   the same payload answer_query returns
+    An answer cache hit sends the whole cached answer as a single token event.
+    """
+    started_at = time.time()
+    metrics = Metrics("query")
+    cache_baseline = cache_stats(resources["embeddings"])
+    with metrics.span("answer_cache"):
+        hit, query_vector = lookup_answer(resources, user_query)
+    if hit:
+        response = cached_response(metrics, resources, cache_baseline, user_query, hit)
+        emit({"type": "sources", "sources": response["sources"], "query": user_query,
+              "retrieval_seconds": round(time.time() - started_at, 3)})
+        emit({"type": "token", "text": response["answer"]})
+        emit({"type": "done", **response, "first_token_seconds": round(time.time() - started_at, 3),
+              "total_seconds": round(time.time() - started_at, 3)})
+        return
+
+    with metrics.span("retrieval"):
+        documents = retrieve(resources, user_query, query_vector)
+    sources = format_sources(documents)
+    emit({"type": "sources", "sources": sources, "query": user_query,
+          "retrieval_seconds": round(time.time() - started_at, 3)})
+
+    with metrics.span("context_packing"):
+        context, packing = build_context(resources, documents, user_query, query_vector)
+    parts = []
+    first_token_at = None
+    llm_started_at = time.time()
+    for text in resources["qa_chain"].stream({"context": context, "question": user_query}):
+        if not text:
+            continue
+        if first_token_at is None:
+            first_token_at = time.time()
+            metrics.add_time("llm_first_token", first_token_at - llm_started_at)
+        parts.append(text)
+        emit({"type": "token", "text": text})
+    metrics.add_time("llm", time.time() - llm_started_at)
+    answer = "".join(parts)
+    remember_answer(resources, user_query, query_vector,
+                    {"answer": answer, "sources": sources, "context": packing}, documents)
+
+    emit({
+        "type": "done",
+        "answer": answer,
+        "sources": sources,
+        "query": user_query,
+        "context": packing,
+        "answer_cache": answer_cache_info(resources, None),
+        "embedding_cache": cache_stats(resources["embeddings"]),
+        "first_token_seconds": round(first_token_at - started_at, 3) if first_token_at else None,
+        "total_seconds": round(time.time() - started_at, 3),
+        "metrics": finish_metrics(metrics, resources, cache_baseline, packing, answer)
+    })
+
+def warm_up(resources):
+    """
+    Open the connections behind the embeddings client and the vector store so the
+    first real query does not pay for them.
+    """
+    resources["embeddings"].embed_query("warm up")
+    resources["vector_store"].similarity_search("warm up", k=1)
+
+def serve():
+    """
+    Resident worker mode. Reads one JSON request per line from stdin and writes one
+    JSON response per line to stdout, reusing the loaded resources between requests.
+
+    Requests:
+        {"id": 1, "cmd": "query", "query": "..."}
+        {"id": 2, "cmd": "health"}
+        {"id": 3, "cmd": "warmup"}
+        {"id": 4, "cmd": "related", "query": "..."}
+        {"id": 5, "cmd": "stream", "query": "..."}
+        {"id": 6, "cmd": "analyse", "query": "...", "num": 5, "source": "paper.pdf"}
+
+    Streamed requests answer with several lines sharing the request id, each
+    carrying a "type" ("sources", "token", then "done" or "error").
+    """
+    started_at = time.time()
+    resources = None
+    lexical_index = None
+    served = 0
+
+    def reply(request_id, payload):
+        sys.stdout.write(json.dumps({"id": request_id, **payload}) + "\n")
+        sys.stdout.flush()
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            request = json.loads(line)
+        except ValueError:
+            reply(None, {"error": "Invalid JSON request"})
+            continue
+
+        request_id = request.get("id")
+        cmd = request.get("cmd", "query")
+
+        try:
+            if cmd == "health":
+                reply(request_id, {
+                    "ok": True,
+                    "ready": resources is not None and "error" not in resources,
+                    "pid": os.getpid(),
+                    "uptime": round(time.time() - started_at, 3),
+                    "queries_served": served,
+                })
+                continue
+
+            if cmd == "related":
+                if lexical_index is None:
+                    lexical_index = open_lexical_index()
+                reply(request_id, related_sections(lexical_index, request.get("query", "")))
+                continue
+
+            # Resources are (re)loaded lazily so the worker recovers once the
+            # vector store or API key becomes available, and refreshed after
+            # other processes write to the stores.
+            if resources is None or "error" in resources:
+                resources = load_resources()
+            elif refresh_stores(resources):
+                print("[QUERY] Stores changed; reopened vector store and retriever", file=sys.stderr)
+            if "error" in resources:
+                reply(request_id, {"error": resources["error"]})
+                continue
+
+            if cmd == "warmup":
+                warm_up(resources)
+                reply(request_id, {"ok": True, "ready": True})
+            elif cmd == "query":
+                user_query = request.get("query")
+                if not user_query:
+                    reply(request_id, {"error": "No query provided"})
+                    continue
+                response = answer_query(resources, user_query)
+                served += 1
+                reply(request_id, response)
+            elif cmd == "stream":
+                user_query = request.get("query")
+                if not user_query:
+                    reply(request_id, {"type": "error", "error": "No query provided"})
+                    continue
+                try:
+                    stream_query(resources, user_query, lambda event: reply(request_id, event))
+                except Exception as e:
+                    reply(request_id, {"type": "error", "error": f"An error occurred during query execution: {str(e)}"})
+                served += 1
+            elif cmd == "analyse":
+                user_query = request.get("query")
+                if not user_query:
+                    reply(request_id, {"error": "No query provided"})
+                    continue
+                from analyse import analyse_selection
+                response = analyse_selection(resources, user_query, num=int(request.get("num", 5)),
+                                             source=request.get("source"))
+                served += 1
+                reply(request_id, response)
+            else:
+                reply(request_id, {"error": f"Unknown command: {cmd}"})
+        except Exception as e:
+            reply(request_id, {"error": f"An error occurred during query execution: {str(e)}"})
 
 def main():
     """
     Main function to handle user queries and provide answers using the RAG pipeline.
+    Pass --serve to run as a long-lived JSON-lines worker instead,
+    --related <query> for a lexical-only related sections lookup, or
+    --stream <query> to print NDJSON events while the answer is generated.
     """
     if len(sys.argv) < 2:
         print(json.dumps({"error": "No query provided"}))
         return
 
-    user_query = sys.argv[1]
+    if sys.argv[1] == "--serve":
+        serve()
+        return
 
-    try:
-        # 1. Initialize Embeddings and Vector Store
-        if not os.path.exists(VECTOR_STORE_DIRECTORY):
-            print(json.dumps({"error": f"Vector store directory '{VECTOR_STORE_DIRECTORY}' not found. Please run ingest.py first."}))
+    if sys.argv[1] == "--related":
+        if len(sys.argv) < 3:
+            print(json.dumps({"error": "No query provided"}))
             return
+        print(json.dumps(related_sections(open_lexical_index(), sys.argv[2])))
+        return
+
+    if sys.argv[1] == "--stream":
+        if len(sys.argv) < 3:
+            print(json.dumps({"type": "error", "error": "No query provided"}))
+            return
+        resources = load_resources()
+        if "error" in resources:
+            print(json.dumps({"type": "error", "error": resources["error"]}))
+            return
+
+        def emit(event):
+            sys.stdout.write(json.dumps(event) + "\n")
+            sys.stdout.flush()
 
-        if not GOOGLE_API_KEY:
-            print(json.dumps({"error": "GOOGLE_API_KEY not found in environment variables."}))
+        try:
+            stream_query(resources, sys.argv[2], emit)
+        except Exception as e:
+            emit({"type": "error", "error": f"An error occurred during query execution: {str(e)}"})
+        return
+
+    user_query = sys.argv[1]
+
+    try:
+        resources = load_resources()
+        if "error" in resources:
+            print(json.dumps({"error": resources["error"]}))
             return
 
-        embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001", google_api_key=GOOGLE_API_KEY)
-        vector_store = Chroma(persist_directory=VECTOR_STORE_DIRECTORY, embedding_function=embeddings)
-
-        # 2. Initialize the LLM
-        llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", google_api_key=GOOGLE_API_KEY, temperature=0.3)
-
-        # 3. Create a Retriever
-        retriever = vector_store.as_retriever(search_kwargs={"k": 6}) # Retrieve top 6 relevant chunks
-
-        # 4. Create a Prompt Template
-        prompt_template = """
-        Use the following pieces of context to respond to the input at the end.
-        - If the input is a **question**, answer it directly.
-        - If the input is a **term or phrase**, provide a clear explanation.
-        Prioritize the given context first, but you may also use your own knowledge if it helps.
-        If you still don't know the answer, say that you don't know.
-
-        Context:
-        {context}
-
-        Input: {question}
-
-        Response:
-        """
-
-        QA_PROMPT = PromptTemplate(
-            template=prompt_template, input_variables=["context", "question"]
-        )
-
-        # 5. Create RetrievalQA Chain
-        qa_chain = RetrievalQA.from_chain_type(
-            llm,
-            retriever=retriever,
-            chain_type_kwargs={"prompt": QA_PROMPT},
-            return_source_documents=True,
-        )
-
-        # 6. Get the Answer
-        result = qa_chain.invoke({"query": user_query})
-
-        # 7. Format response as JSON
-        sources = []
-        for source in result["source_documents"]:
-            sources.append({
-                "file": source.metadata.get('source', 'Unknown'),
-                "page": source.metadata.get('page', 'Unknown'),
-                "content": source.page_content[:200] + "..." if len(source.page_content) > 200 else source.page_content
-            })
-
-        response = {
-            "answer": result["result"],
-            "sources": sources,
-            "query": user_query
-        }
-
-        print(json.dumps(response))
+        print(json.dumps(answer_query(resources, user_query)))
 
     except Exception as e:
         print(json.dumps({"error": f"An error occurred during query execution: {str(e)}"}))
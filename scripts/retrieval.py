@@ -0,0 +1,89 @@
+import os
+from typing import Any, List
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+# --- Configuration ---
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")  # "hybrid", "vector" or "lexical"
+RRF_K = 60
+# Each retriever contributes this many candidates per requested result before fusion
+FETCH_MULTIPLIER = 3
+
+def doc_key(doc):
+    """Identity of a chunk that holds across the vector store and the lexical index."""
+    return (doc.metadata.get("source"), doc.metadata.get("page"), doc.page_content)
+
+def lexical_documents(lexical_index, query, k):
+    return [
+        Document(page_content=content, metadata={**metadata, "lexical_score": round(score, 4)})
+        for _, score, content, metadata in lexical_index.search(query, k=k)
+    ]
+
+def reciprocal_rank_fusion(ranked_lists, k, rrf_k=RRF_K):
+    """Fuse ranked document lists, scoring each document by sum(1 / (rrf_k + rank))."""
+    scores = {}
+    docs = {}
+    for ranked in ranked_lists:
+        for rank, doc in enumerate(ranked, start=1):
+            key = doc_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            docs.setdefault(key, doc)
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [docs[key] for key in best]
+
+class HybridRetriever(BaseRetriever):
+    """Retrieves with BM25 and vector similarity and fuses both rankings with RRF."""
+
+    vector_store: Any
+    lexical_index: Any
+    k: int = 6
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        fetch_k = self.k * FETCH_MULTIPLIER
+        vector_docs = self.vector_store.similarity_search(query, k=fetch_k)
+        lexical_docs = lexical_documents(self.lexical_index, query, fetch_k)
+        return reciprocal_rank_fusion([vector_docs, lexical_docs], self.k)
+
+class VectorRetriever(BaseRetriever):
+    """Similarity search against any vector backend from vector_backends.py."""
+
+    vector_store: Any
+    k: int = 6
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        return self.vector_store.similarity_search(query, k=self.k)
+
+class LexicalRetriever(BaseRetriever):
+    """BM25-only retriever; never calls the embedding API."""
+
+    lexical_index: Any
+    k: int = 6
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        return lexical_documents(self.lexical_index, query, self.k)
+
+def retrieve_by_vector(vector_store, lexical_index, query, query_vector, mode=RETRIEVAL_MODE, k=6):
+    """
+    Same ranking as build_retriever(...).invoke(query), but reusing a query
+    embedding the caller already has instead of embedding the query again.
+    """
+    if lexical_index is None or lexical_index.chunk_count() == 0:
+        mode = "vector"
+    if mode == "hybrid":
+        fetch_k = k * FETCH_MULTIPLIER
+        vector_docs = vector_store.similarity_search_by_vector(query_vector, k=fetch_k)
+        lexical_docs = lexical_documents(lexical_index, query, fetch_k)
+        return reciprocal_rank_fusion([vector_docs, lexical_docs], k)
+    if mode == "lexical":
+        return lexical_documents(lexical_index, query, k)
+    return vector_store.similarity_search_by_vector(query_vector, k=k)
+
+def build_retriever(vector_store, lexical_index, mode=RETRIEVAL_MODE, k=6):
+    """Pick the retriever for the configured mode, falling back to vector search when there is no lexical index."""
+    if lexical_index is None or lexical_index.chunk_count() == 0:
+        mode = "vector"
+    if mode == "hybrid":
+        return HybridRetriever(vector_store=vector_store, lexical_index=lexical_index, k=k)
+    if mode == "lexical":
+        return LexicalRetriever(lexical_index=lexical_index, k=k)
+    return VectorRetriever(vector_store=vector_store, k=k)
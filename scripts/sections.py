@@ -0,0 +1,141 @@
+import os
+import re
+from collections import Counter
+
+# Section-aware chunking: headings are found from font size and weight, each
+# section becomes one chunk and only sections longer than SECTION_MAX_CHARS are
+# split further. Kept free of langchain imports; the splitter is passed in.
+
+# --- Configuration ---
+SECTION_MAX_CHARS = int(os.getenv("SECTION_MAX_CHARS", "1500"))
+# Sections shorter than this are folded into the previous chunk when it has room
+SECTION_MIN_CHARS = int(os.getenv("SECTION_MIN_CHARS", "200"))
+# A line this much larger than the body text is a heading
+HEADING_SIZE_RATIO = 1.15
+# Bold lines at body size are headings only when they are this short
+HEADING_MAX_CHARS = 120
+BOLD_WEIGHT = 600
+# Joins the headings of sections folded into one chunk
+TITLE_SEPARATOR = "; "
+
+def body_font_size(pages):
+    """The font size most of the text is set in, weighted by characters."""
+    sizes = Counter()
+    for _, _, lines in pages:
+        for line, size, _ in lines or ():
+            sizes[size] += len(line)
+    return sizes.most_common(1)[0][0] if sizes else None
+
+def is_heading(line, size, weight, body_size):
+    if body_size is None or len(line) > HEADING_MAX_CHARS or not re.search(r"[^\W\d_]", line):
+        return False
+    # Sentences that happen to be set large (pull quotes, captions) end with a full stop
+    if line.endswith((".", ",", ";")) and not re.match(r"^[\d.]+\s", line):
+        return False
+    if size >= body_size * HEADING_SIZE_RATIO:
+        return True
+    return weight >= BOLD_WEIGHT and size >= body_size and len(line.split()) <= 12
+
+def build_sections(pages, title=None):
+    """
+    Group the lines of consecutive pages into sections.
+
+    Args:
+        pages (list): [(page_number, text, lines)] in page order; lines is
+            [(line, font_size, font_weight)] or None when the page has no layout,
+            in which case all of its text is body text.
+        title (str): Heading of the section still open at the end of the pages
+            before these, when a document is chunked one page range at a time.
+
+    Returns:
+        list: [{"title": str or None, "parts": [(page_number, text)]}]
+    """
+    body_size = body_font_size(pages)
+    sections = []
+    current = {"title": title, "parts": []}
+    heading_open = False
+    for page_number, text, lines in pages:
+        if not lines:
+            current["parts"].append((page_number, text.strip()))
+            heading_open = False
+            continue
+        for line, size, weight in lines:
+            if is_heading(line, size, weight, body_size):
+                # Consecutive heading lines are one title: a wrapped heading or a chapter and its first section
+                if heading_open:
+                    current["title"] = f"{current['title']} {line}"
+                else:
+                    if current["parts"]:
+                        sections.append(current)
+                    current = {"title": line, "parts": []}
+                    heading_open = True
+                current["parts"].append((page_number, line))
+                continue
+            heading_open = False
+            current["parts"].append((page_number, line))
+    if current["parts"]:
+        sections.append(current)
+    return sections
+
+def section_text(section):
+    """Return (text, [(offset, page_number)]) with the offset where each page's text starts."""
+    text, starts = "", []
+    for page_number, part in section["parts"]:
+        if not part:
+            continue
+        if not starts or starts[-1][1] != page_number:
+            starts.append((len(text) + (1 if text else 0), page_number))
+        text = f"{text}\n{part}" if text else part
+    return text, starts
+
+def page_at(starts, offset):
+    page = starts[0][1]
+    for start, page_number in starts:
+        if start > offset:
+            break
+        page = page_number
+    return page
+
+def join_titles(title, other):
+    titles = title.split(TITLE_SEPARATOR) if title else []
+    if other and other not in titles:
+        titles.append(other)
+    return TITLE_SEPARATOR.join(titles) or None
+
+def section_chunks(sections, split_text, max_chars=SECTION_MAX_CHARS, min_chars=SECTION_MIN_CHARS):
+    """
+    Chunk the output of build_sections. A section that fits in max_chars is one
+    chunk; a longer one is cut with split_text(text) -> [pieces], which must not
+    rewrite the text. Short sections are folded into the chunk before them when
+    the result still fits, and their heading is added to that chunk's.
+
+    Returns:
+        list: [{"text", "page", "page_end", "section"}]; page is where the chunk
+        starts, section the heading (or "; "-joined headings) it belongs to, or
+        None before the first heading.
+    """
+    chunks = []
+    for section in sections:
+        text, starts = section_text(section)
+        if not text:
+            continue
+        previous = chunks[-1] if chunks else None
+        if previous and len(text) < min_chars and len(previous["text"]) + len(text) + 1 <= max_chars:
+            previous["text"] = f"{previous['text']}\n{text}"
+            previous["page_end"] = starts[-1][1]
+            previous["section"] = join_titles(previous["section"], section["title"])
+            continue
+        pieces = [text] if len(text) <= max_chars else split_text(text)
+        cursor = 0
+        for piece in pieces:
+            offset = text.find(piece, cursor)
+            if offset < 0:
+                offset = cursor
+            cursor = offset + 1
+            chunks.append({
+                "text": piece,
+                "page": page_at(starts, offset),
+                "page_end": page_at(starts, offset + len(piece) - 1),
+                "section": section["title"],
+            })
+    return chunks
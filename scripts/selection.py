@@ -0,0 +1,121 @@
+import os
+import re
+import difflib
+from collections import OrderedDict
+from context_packing import shingles
+from manifest import IngestManifest
+
+# --- Configuration ---
+SELECTION_FAST_PATH = os.getenv("SELECTION_FAST_PATH", "on") == "on"
+# Share of the selection's words that stored chunks must cover to skip embedding it
+SELECTION_MIN_COVERAGE = float(os.getenv("SELECTION_MIN_COVERAGE", "0.8"))
+# Shorter selections (a term, a phrase) are embedded: the chunk around them means something else
+SELECTION_MIN_WORDS = int(os.getenv("SELECTION_MIN_WORDS", "12"))
+# Shortest run of words shared with a chunk that counts as overlap rather than coincidence
+MIN_MATCH_WORDS = 5
+# Ingested documents whose chunks are kept in memory
+SELECTION_CACHED_DOCUMENTS = 4
+
+def words(text):
+    """PDF viewers and text extraction differ in whitespace, hyphenation and case, so compare words."""
+    return re.findall(r"\w+", text.casefold())
+
+class SelectionResolver:
+    """
+    Maps a selection from an ingested PDF to the stored chunks it overlaps, so the
+    selection can be searched with embeddings computed at ingest instead of being
+    embedded again. A chunk overlaps when it shares a run of at least
+    MIN_MATCH_WORDS words with the selection; matching runs are found with difflib,
+    so extraction differences only split a run instead of losing the chunk. When
+    the overlapping chunks cover enough of the selection, the query vector is the
+    mean of their vectors weighted by how many selected words each covers.
+
+    Chunks are loaded per document and kept for the documents used most recently,
+    keyed by the manifest's content hash so a re-ingested file is loaded again.
+    """
+
+    def __init__(self, vector_store, min_coverage=SELECTION_MIN_COVERAGE, min_words=SELECTION_MIN_WORDS,
+                 manifest=None):
+        self.vector_store = vector_store
+        self.min_coverage = min_coverage
+        self.min_words = min_words
+        self.manifest = manifest or IngestManifest()
+        self.documents = OrderedDict()
+
+    def _chunks(self, filename):
+        """Return [(words, shingles, vector)] for a document, or None when it is not ingested."""
+        content_hash = self.manifest.file_hash(filename)
+        if content_hash is None:
+            return None
+        key = (filename, content_hash)
+        if key in self.documents:
+            self.documents.move_to_end(key)
+            return self.documents[key]
+
+        # Chunks are stored under the paths given to ingest, while the frontend and the
+        # manifest use file names; the manifest records those paths, so no store scan
+        chunks = []
+        for source in self.manifest.stored_sources(filename) or []:
+            texts, vectors = self.vector_store.source_chunks(source)
+            for text, vector in zip(texts, vectors):
+                chunk_words = words(text)
+                chunks.append((chunk_words, shingles(" ".join(chunk_words)), vector))
+        if not chunks:
+            # Not cached, so the chunks are found once the stored path is recorded
+            return chunks
+        self.documents[key] = chunks
+        while len(self.documents) > SELECTION_CACHED_DOCUMENTS:
+            self.documents.popitem(last=False)
+        return chunks
+
+    def resolve(self, selection, filename):
+        """
+        Return (query vector or None, details). The vector is None whenever the
+        selection has to be embedded; details says why, or which chunks were used.
+        """
+        import numpy as np
+
+        details = {"fast_path": False, "source": filename}
+        selected = words(selection)
+        if not SELECTION_FAST_PATH:
+            return None, {**details, "reason": "disabled"}
+        if not filename:
+            return None, {**details, "reason": "no open document"}
+        if len(selected) < self.min_words:
+            return None, {**details, "reason": "selection too short"}
+        chunks = self._chunks(filename)
+        if not chunks:
+            return None, {**details, "reason": "document not ingested"}
+
+        # Trigrams rule out most chunks before the word-level diff
+        selected_shingles = shingles(" ".join(selected))
+        covered = np.zeros(len(selected), dtype=bool)
+        matches = []
+        for chunk_words, chunk_shingles, vector in chunks:
+            if selected_shingles.isdisjoint(chunk_shingles):
+                continue
+            matcher = difflib.SequenceMatcher(None, selected, chunk_words, autojunk=False)
+            chunk_covered = np.zeros(len(selected), dtype=bool)
+            for start, _, size in matcher.get_matching_blocks():
+                if size >= MIN_MATCH_WORDS:
+                    chunk_covered[start:start + size] = True
+            if chunk_covered.any():
+                covered |= chunk_covered
+                matches.append((int(chunk_covered.sum()), vector))
+
+        coverage = round(float(covered.mean()), 4)
+        details.update(coverage=coverage, chunks=len(matches))
+        if coverage < self.min_coverage:
+            return None, {**details, "reason": "low coverage"}
+
+        # Averaged as directions, then scaled back to the stored vectors' length, since
+        # Chroma ranks by L2 distance
+        weights = np.asarray([weight for weight, _ in matches], dtype="float32")
+        matrix = np.asarray([np.asarray(vector, dtype="float32") for _, vector in matches])
+        norms = np.linalg.norm(matrix, axis=1)
+        direction = weights @ (matrix / norms.clip(min=1e-12)[:, None])
+        query_vector = direction / max(float(np.linalg.norm(direction)), 1e-12) * float(weights @ norms / weights.sum())
+        return query_vector.tolist(), {**details, "fast_path": True}
+
+    def close(self):
+        self.manifest.close()
@@ -0,0 +1,288 @@
+import os
+import sys
+import time
+import wave
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# --- Configuration ---
+TTS_PROVIDER = os.getenv("TTS_PROVIDER", "azure")  # "azure" or "fake"
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", "4"))
+TTS_MAX_RETRIES = int(os.getenv("TTS_MAX_RETRIES", "3"))
+VOICES = {"F": "en-IN-AartiIndicNeural", "M": "en-IN-PrabhatIndicNeural"}
+SAMPLE_RATE = 24000
+SAMPLE_WIDTH = 2
+CHANNELS = 1
+# Format of the clips providers return; part of the clip cache key
+PCM_FORMAT = "raw-24khz-16bit-mono-pcm"
+PODCAST_MAX_AUDIO_MB = float(os.getenv("PODCAST_MAX_AUDIO_MB", "200"))
+
+class TTSError(Exception):
+    """Raised when a line could not be synthesized."""
+
+def log(message):
+    print(f"[PODCAST] {message}", file=sys.stderr)
+
+class AzureTTS:
+    """
+    Azure Speech synthesis returning raw 24kHz 16-bit mono PCM in memory.
+    SpeechSynthesizer objects are not shared between threads, so each worker
+    thread keeps one per voice.
+    """
+
+    def __init__(self, key, region):
+        import azure.cognitiveservices.speech as speechsdk
+
+        self.speechsdk = speechsdk
+        self.key = key
+        self.region = region
+        self.local = threading.local()
+
+    def _synthesizer(self, voice):
+        synthesizers = getattr(self.local, "synthesizers", None)
+        if synthesizers is None:
+            synthesizers = self.local.synthesizers = {}
+        if voice not in synthesizers:
+            speechsdk = self.speechsdk
+            speech_config = speechsdk.SpeechConfig(subscription=self.key, region=self.region)
+            speech_config.speech_synthesis_voice_name = voice
+            speech_config.set_speech_synthesis_output_format(
+                speechsdk.SpeechSynthesisOutputFormat.Raw24Khz16BitMonoPcm
+            )
+            # audio_config=None keeps the audio in result.audio_data instead of a file
+            synthesizers[voice] = speechsdk.SpeechSynthesizer(speech_config=speech_config, audio_config=None)
+        return synthesizers[voice]
+
+    def synthesize(self, text, voice):
+        res = self._synthesizer(voice).speak_text_async(text).get()
+        if res.reason == self.speechsdk.ResultReason.SynthesizingAudioCompleted:
+            return res.audio_data
+        raise TTSError(f"TTS failed: {res.cancellation_details.reason}")
+
+class FakeTTS:
+    """
+    Offline stand-in for tests and benchmarks: sleeps to simulate service latency
+    and returns silence whose length follows the text, optionally failing at random.
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0, seconds_per_char=0.06, seed=0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.seconds_per_char = seconds_per_char
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def synthesize(self, text, voice):
+        with self.lock:
+            self.calls += 1
+            fail = self.failure_rate and self.random.random() < self.failure_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise TTSError("Simulated TTS failure")
+        frames = int(len(text) * self.seconds_per_char * SAMPLE_RATE)
+        return b"\0" * (frames * SAMPLE_WIDTH * CHANNELS)
+
+def get_tts_provider(azure_key=None, azure_region=None):
+    """
+    Build the TTS provider selected by TTS_PROVIDER, wrapped in the clip cache
+    unless TTS_CACHE=off.
+    """
+    if TTS_PROVIDER == "fake":
+        provider = FakeTTS(
+            latency=float(os.getenv("FAKE_TTS_LATENCY", "0.3")),
+            failure_rate=float(os.getenv("FAKE_TTS_FAILURE_RATE", "0")),
+        )
+    else:
+        provider = AzureTTS(azure_key, azure_region)
+
+    from clip_cache import TTS_CACHE, CachedTTS, ClipCache
+    if not TTS_CACHE:
+        return provider
+    return CachedTTS(provider, ClipCache(), PCM_FORMAT)
+
+def clip_cache_stats(provider):
+    """Hit/miss counters of the clip cache, or None when caching is off."""
+    cache = getattr(provider, "cache", None)
+    return cache.stats() if cache is not None else None
+
+def synthesize_with_retries(provider, text, voice, max_retries=TTS_MAX_RETRIES):
+    for attempt in range(max_retries + 1):
+        try:
+            return provider.synthesize(text, voice)
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            log(f"Retrying line after error: {e}")
+            time.sleep(min(8.0, 0.5 * (2 ** attempt)))
+
+class SynthesisPipeline:
+    """
+    Bounded pool that accepts dialogue lines one at a time, so synthesis can start
+    while later lines are still being produced. Clips keep submission order.
+
+    on_clip(index, clip), when given, is called from the synthesis thread as soon
+    as each line finishes (clip is None for a line that failed).
+    """
+
+    def __init__(self, provider, workers=TTS_WORKERS, max_retries=TTS_MAX_RETRIES, on_clip=None):
+        self.provider = provider
+        self.workers = max(1, workers)
+        self.max_retries = max_retries
+        self.on_clip = on_clip
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        self.futures = []
+        self.failures = []
+        self.started_at = time.time()
+
+    def _run(self, idx, text, voice):
+        try:
+            return synthesize_with_retries(self.provider, text, voice, self.max_retries)
+        except Exception as e:
+            log(f"TTS failed for line {idx}: {e}")
+            self.failures.append(idx)
+            return None
+
+    def submit(self, text, voice):
+        idx = len(self.futures)
+        future = self.executor.submit(self._run, idx, text, voice)
+        self.futures.append(future)
+        if self.on_clip:
+            # _run never raises, so result() is the clip or None
+            future.add_done_callback(lambda done: self.on_clip(idx, done.result()))
+
+    def finish(self):
+        """
+        Wait for every submitted line. Every on_clip call has returned by the time
+        this does, since callbacks run on the pool threads it shuts down.
+
+        Returns:
+            tuple: (list of PCM bytes or None for lines that failed, in input order; stats dict)
+        """
+        results = [future.result() for future in self.futures]
+        self.executor.shutdown()
+        return results, {
+            "lines": len(results),
+            "failed_lines": sorted(self.failures),
+            "workers": self.workers,
+            "seconds": round(time.time() - self.started_at, 3),
+        }
+
+def synthesize_lines(provider, lines, workers=TTS_WORKERS, max_retries=TTS_MAX_RETRIES):
+    """
+    Synthesize dialogue lines concurrently with a bounded worker pool.
+
+    Args:
+        lines (list): [(text, voice)] in dialogue order
+
+    Returns:
+        tuple: (list of PCM bytes or None for lines that failed, in input order; stats dict)
+    """
+    pipeline = SynthesisPipeline(provider, workers, max_retries)
+    for text, voice in lines:
+        pipeline.submit(text, voice)
+    return pipeline.finish()
+
+class ProgressiveWavWriter:
+    """
+    Appends clips to a WAV file as soon as they and every clip before them are
+    done. Pass add as a SynthesisPipeline's on_clip so clips are written from the
+    synthesis threads the moment they finish, not when the next script line
+    arrives. The wave module rewrites the header after each write and the file is
+    flushed, so it is playable while the podcast is still being generated.
+    """
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.file = open(output_path, "wb")
+        self.wav = wave.open(self.file, "wb")
+        self.wav.setnchannels(CHANNELS)
+        self.wav.setsampwidth(SAMPLE_WIDTH)
+        self.wav.setframerate(SAMPLE_RATE)
+        # Write the header now so the file is a valid (empty) WAV from the start
+        self.wav.writeframes(b"")
+        self.file.flush()
+        self.lock = threading.Lock()
+        # Finished clips waiting for an earlier one, by line index
+        self.ready = {}
+        self.next_index = 0
+        self.clips = 0
+        self.audio_bytes = 0
+        self.peak_buffered_bytes = 0
+        self.error = None
+
+    def add(self, index, clip):
+        """Take a finished clip and write the run of clips that now follows what is already written."""
+        with self.lock:
+            if self.error:
+                return
+            self.ready[index] = clip
+            try:
+                while self.next_index in self.ready:
+                    clip = self.ready.pop(self.next_index)
+                    if clip:
+                        self.wav.writeframes(clip)
+                        self.clips += 1
+                        self.audio_bytes += len(clip)
+                    self.next_index += 1
+                self.file.flush()
+            except Exception as e:
+                # Raised from close; an exception here would be swallowed by the pool
+                self.error = e
+            buffered = sum(len(pending or b"") for pending in self.ready.values())
+            self.peak_buffered_bytes = max(self.peak_buffered_bytes, buffered)
+
+    def close(self):
+        self.wav.close()
+        self.file.close()
+        if self.error:
+            raise TTSError(f"Writing {self.output_path} failed: {self.error}")
+        return {
+            "clips": self.clips,
+            "audio_seconds": round(self.audio_bytes / (SAMPLE_RATE * SAMPLE_WIDTH * CHANNELS), 2),
+            "peak_buffered_bytes": self.peak_buffered_bytes,
+            "bytes_written": os.path.getsize(self.output_path),
+            "progressive": True,
+        }
+
+def assemble_audio(clips, output_path, audio_format="wav", max_bytes=int(PODCAST_MAX_AUDIO_MB * 1024 * 1024)):
+    """
+    Write PCM clips to a single output file in one pass.
+
+    WAV output writes each clip straight into the file, so nothing is
+    concatenated in memory; compressed formats join the PCM once and encode it
+    with pydub. The buffered audio is capped at max_bytes.
+
+    Returns:
+        dict: peak buffered bytes, bytes written and clip count
+    """
+    clips = [clip for clip in clips if clip]
+    buffered = sum(len(clip) for clip in clips)
+    if buffered > max_bytes:
+        raise TTSError(f"Podcast audio is {buffered} bytes, over the {max_bytes} byte limit")
+
+    if audio_format == "wav":
+        with wave.open(output_path, "wb") as wav:
+            wav.setnchannels(CHANNELS)
+            wav.setsampwidth(SAMPLE_WIDTH)
+            wav.setframerate(SAMPLE_RATE)
+            for clip in clips:
+                wav.writeframes(clip)
+        peak = buffered
+    else:
+        from pydub import AudioSegment
+
+        pcm = b"".join(clips)
+        AudioSegment(data=pcm, sample_width=SAMPLE_WIDTH, frame_rate=SAMPLE_RATE, channels=CHANNELS).export(
+            output_path, format=audio_format
+        )
+        peak = buffered + len(pcm)
+
+    return {
+        "clips": len(clips),
+        "audio_seconds": round(buffered / (SAMPLE_RATE * SAMPLE_WIDTH * CHANNELS), 2),
+        "peak_buffered_bytes": peak,
+        "bytes_written": os.path.getsize(output_path),
+    }
@@ -0,0 +1,830 @@
+import os
+import sys
+import json
+import sqlite3
+import argparse
+
+# --- Configuration ---
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")  # "chroma", "faiss" or "quantized"
+CHROMA_DIRECTORY = "./chroma_db"
+FAISS_DIRECTORY = os.getenv("FAISS_DIRECTORY", "./faiss_index")
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "hnsw")  # "flat", "ivf" or "hnsw"
+FAISS_IVF_NLIST = int(os.getenv("FAISS_IVF_NLIST", "1024"))
+# An "ivf" store searches a flat index until it holds this many vectors, then trains
+FAISS_IVF_MIN_VECTORS = int(os.getenv("FAISS_IVF_MIN_VECTORS", "10000"))
+FAISS_IVF_NPROBE = int(os.getenv("FAISS_IVF_NPROBE", "16"))
+FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+FAISS_HNSW_EF_SEARCH = int(os.getenv("FAISS_HNSW_EF_SEARCH", "64"))
+QUANTIZED_DIRECTORY = os.getenv("QUANTIZED_DIRECTORY", "./quantized_index")
+QUANTIZED_DTYPE = os.getenv("QUANTIZED_DTYPE", "int8")  # "int8" or "float16"
+# First-pass candidates per requested result that are re-scored exactly; 0 skips re-ranking
+QUANTIZED_RERANK_MULTIPLIER = int(os.getenv("QUANTIZED_RERANK_MULTIPLIER", "4"))
+# Rows dequantized at once in the first pass, which bounds its scratch memory
+QUANTIZED_BLOCK_ROWS = 8192
+CHROMA_WRITE_BATCH_SIZE = 1000
+# Built every store that predates recording the embedding model
+LEGACY_EMBEDDING_MODEL = "models/embedding-001"
+
+class EmbeddingModelMismatch(Exception):
+    """Raised when a vector store was built with a different embedding model than the configured one."""
+
+class ChromaBackend:
+    """Vector store backed by a persistent Chroma collection."""
+
+    name = "chroma"
+
+    def __init__(self, embeddings, directory=CHROMA_DIRECTORY):
+        from langchain_community.vectorstores import Chroma
+
+        self.directory = directory
+        self.embeddings = embeddings
+        self.store = Chroma(persist_directory=directory, embedding_function=embeddings)
+
+    def add(self, ids, documents, vectors):
+        """
+        Write chunks with precomputed embeddings. The langchain wrapper always embeds
+        on add_documents, so this goes to the underlying collection directly.
+        """
+        for start in range(0, len(ids), CHROMA_WRITE_BATCH_SIZE):
+            end = start + CHROMA_WRITE_BATCH_SIZE
+            self.store._collection.upsert(
+                ids=ids[start:end],
+                embeddings=vectors[start:end],
+                documents=[doc.page_content for doc in documents[start:end]],
+                metadatas=[doc.metadata for doc in documents[start:end]],
+            )
+
+    def delete(self, ids):
+        if ids:
+            self.store.delete(ids=ids)
+
+    def refresh(self):
+        """
+        Re-read the collection from disk. Chroma keeps one in-memory system per
+        directory and never sees writes from other processes, so the cached system
+        is dropped before reopening.
+        """
+        from chromadb.api.client import SharedSystemClient
+        from langchain_community.vectorstores import Chroma
+
+        SharedSystemClient.clear_system_cache()
+        self.store = Chroma(persist_directory=self.directory, embedding_function=self.embeddings)
+
+    def ids_for_source(self, source):
+        return self.store.get(where={"source": source}, include=[])["ids"]
+
+    def all_ids(self):
+        return self.store.get(include=[])["ids"]
+
+    def source_chunks(self, source):
+        """Return (texts, vectors) of every chunk of a source, with the embeddings stored at ingest."""
+        page = self.store._collection.get(where={"source": source}, include=["documents", "embeddings"])
+        return page["documents"], page["embeddings"]
+
+    def source_counts(self):
+        """Return {source: chunk_count} over the whole collection."""
+        counts = {}
+        offset = 0
+        while True:
+            page = self.store._collection.get(include=["metadatas"], limit=CHROMA_WRITE_BATCH_SIZE, offset=offset)
+            if not page["ids"]:
+                return counts
+            for metadata in page["metadatas"]:
+                source = (metadata or {}).get("source")
+                counts[source] = counts.get(source, 0) + 1
+            offset += len(page["ids"])
+
+    def embedding_model(self):
+        return (self.store._collection.metadata or {}).get("embedding_model")
+
+    def record_embedding_model(self, model):
+        # Chroma refuses to change hnsw:* settings after creation, so only pass the rest back
+        metadata = {key: value for key, value in (self.store._collection.metadata or {}).items()
+                    if not key.startswith("hnsw:")}
+        metadata["embedding_model"] = model
+        self.store._collection.modify(metadata=metadata)
+
+    def similarity_search(self, query, k=6):
+        return self.store.similarity_search(query, k=k)
+
+    def similarity_search_by_vector(self, vector, k=6):
+        return self.store.similarity_search_by_vector(vector, k=k)
+
+    def count(self):
+        return self.store._collection.count()
+
+    def iter_batches(self, batch_size=CHROMA_WRITE_BATCH_SIZE):
+        """Yield (ids, documents, metadatas, embeddings) pages of the whole collection."""
+        offset = 0
+        while True:
+            page = self.store._collection.get(
+                include=["documents", "metadatas", "embeddings"], limit=batch_size, offset=offset
+            )
+            if not page["ids"]:
+                return
+            yield page["ids"], page["documents"], page["metadatas"], page["embeddings"]
+            offset += len(page["ids"])
+
+    def save(self):
+        # Chroma persists on every write
+        pass
+
+    def compact(self):
+        """
+        VACUUM Chroma's SQLite file so space freed by deletes goes back to the disk.
+        The HNSW segment files are managed by Chroma and are left alone.
+        """
+        path = os.path.join(self.directory, "chroma.sqlite3")
+        if not os.path.exists(path):
+            return {"vacuumed": False}
+        conn = sqlite3.connect(path)
+        try:
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+        return {"vacuumed": True}
+
+class SqliteDocstore:
+    """
+    Chunk text, metadata and tombstones in a SQLite docstore, shared by the
+    backends that keep their vectors in files of their own. int_id is the vector's
+    id in those files.
+    """
+
+    def _open_docstore(self, schema, read_only=False):
+        path = os.path.join(self.directory, "docstore.sqlite3")
+        if read_only:
+            # Readers never create anything; the writer that made the store made the tables
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"No {self.name} docstore in '{self.directory}'")
+            self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            return
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(schema + """
+            CREATE INDEX IF NOT EXISTS chunks_source ON chunks(source);
+            CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        """)
+
+    def _setting(self, key):
+        row = self.conn.execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_setting(self, key, value):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
+
+    def _live_int_ids(self, ids):
+        rows = []
+        for start in range(0, len(ids), 500):
+            part = ids[start:start + 500]
+            placeholders = ",".join("?" * len(part))
+            rows.extend(r[0] for r in self.conn.execute(
+                f"SELECT int_id FROM chunks WHERE chunk_id IN ({placeholders}) AND deleted = 0", part
+            ))
+        return rows
+
+    def _tombstone(self, int_ids):
+        # Keep the row as a tombstone, but free its chunk_id for re-adds
+        self.conn.executemany(
+            "UPDATE chunks SET deleted = 1, chunk_id = 'deleted:' || int_id WHERE int_id = ?",
+            [(r,) for r in int_ids],
+        )
+
+    def ids_for_source(self, source):
+        return [r[0] for r in self.conn.execute(
+            "SELECT chunk_id FROM chunks WHERE source = ? AND deleted = 0", (source,)
+        )]
+
+    def all_ids(self):
+        return [r[0] for r in self.conn.execute("SELECT chunk_id FROM chunks WHERE deleted = 0")]
+
+    def source_counts(self):
+        """Return {source: chunk_count} over the whole index."""
+        return dict(self.conn.execute(
+            "SELECT source, COUNT(*) FROM chunks WHERE deleted = 0 GROUP BY source"
+        ).fetchall())
+
+    def embedding_model(self):
+        return self._setting("embedding_model")
+
+    def record_embedding_model(self, model):
+        self._set_setting("embedding_model", model)
+
+    def tombstone_count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM chunks WHERE deleted = 1").fetchone()[0]
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM chunks WHERE deleted = 0").fetchone()[0]
+
+def ivf_nlist(count):
+    """
+    Coarse cells for an IVF index over `count` vectors: about 4 * sqrt(count),
+    keeping the 39 training points per cell FAISS asks for, capped at FAISS_IVF_NLIST.
+    """
+    return max(1, min(FAISS_IVF_NLIST, int(4 * count ** 0.5), count // 39))
+
+class FaissBackend(SqliteDocstore):
+    """
+    Vector store backed by a FAISS index (flat, IVF or HNSW) with chunk text and
+    metadata in a SQLite docstore. Vectors are L2-normalised so inner product is
+    cosine similarity. Read-only instances memory-map the index from disk.
+
+    HNSW indexes cannot remove vectors, so deletes are recorded as tombstones in the
+    docstore and filtered out of results until the index is rebuilt.
+
+    IVF centroids are only as good as their training set, so an "ivf" store keeps
+    an exact flat index until it holds FAISS_IVF_MIN_VECTORS vectors, trains on the
+    whole corpus then, and compact() retrains once the corpus outgrows its nlist.
+    """
+
+    name = "faiss"
+
+    def __init__(self, embeddings, directory=FAISS_DIRECTORY, index_type=FAISS_INDEX_TYPE, read_only=False):
+        import faiss
+
+        self.faiss = faiss
+        self.embeddings = embeddings
+        self.directory = directory
+        self.index_type = index_type
+        self.read_only = read_only
+        self.index_path = os.path.join(directory, "index.faiss")
+        if not read_only:
+            os.makedirs(directory, exist_ok=True)
+
+        self._open_docstore("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                int_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                chunk_id TEXT UNIQUE NOT NULL,
+                source TEXT,
+                content TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                deleted INTEGER NOT NULL DEFAULT 0
+            );
+        """, read_only=read_only)
+        stored_type = self._setting("index_type")
+        if stored_type:
+            self.index_type = stored_type
+
+        self.index = None
+        self.loaded_mtime = None
+        self._load()
+        self.dirty = False
+
+    def _load(self):
+        if not os.path.exists(self.index_path):
+            return
+        flags = self.faiss.IO_FLAG_MMAP | self.faiss.IO_FLAG_READ_ONLY if self.read_only else 0
+        self.loaded_mtime = os.path.getmtime(self.index_path)
+        self.index = self.faiss.read_index(self.index_path, flags)
+        self._configure_search()
+
+    def _reload_if_changed(self):
+        """
+        Long-lived readers pick up indexes written by later ingests. Writers do the
+        same before each write while they have nothing unsaved, so ingests that take
+        turns on the store write lock never overwrite each other's batches.
+        """
+        if (self.read_only or not self.dirty) and os.path.exists(self.index_path):
+            if os.path.getmtime(self.index_path) != self.loaded_mtime:
+                self._load()
+
+    def refresh(self):
+        """Pick up an index written by another process; searches already do this too."""
+        self._reload_if_changed()
+
+    def _configure_search(self):
+        base = self.faiss.downcast_index(self.index.index)
+        if isinstance(base, self.faiss.IndexIVF):
+            base.nprobe = FAISS_IVF_NPROBE
+        elif isinstance(base, self.faiss.IndexHNSW):
+            base.hnsw.efSearch = FAISS_HNSW_EF_SEARCH
+
+    def _new_index(self, vectors):
+        faiss = self.faiss
+        dim = vectors.shape[1]
+        if self.index_type == "flat":
+            base = faiss.IndexFlatIP(dim)
+        elif self.index_type == "ivf" and len(vectors) < FAISS_IVF_MIN_VECTORS:
+            # Too few vectors to train useful centroids; exact search is cheap at this size
+            base = faiss.IndexFlatIP(dim)
+        elif self.index_type == "ivf":
+            nlist = ivf_nlist(len(vectors))
+            base = faiss.IndexIVFFlat(faiss.IndexFlatIP(dim), dim, nlist, faiss.METRIC_INNER_PRODUCT)
+            base.train(vectors)
+        elif self.index_type == "hnsw":
+            base = faiss.IndexHNSWFlat(dim, FAISS_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        else:
+            raise ValueError(f"Unknown FAISS index type: {self.index_type}")
+        self._set_setting("index_type", self.index_type)
+        self.index = faiss.IndexIDMap2(base)
+        self._configure_search()
+
+    def _as_matrix(self, vectors):
+        import numpy as np
+
+        matrix = np.asarray(vectors, dtype="float32")
+        if matrix.ndim == 1:
+            matrix = matrix.reshape(1, -1)
+        matrix = np.ascontiguousarray(matrix)
+        self.faiss.normalize_L2(matrix)
+        return matrix
+
+    def add(self, ids, documents, vectors):
+        import numpy as np
+
+        if self.read_only:
+            raise RuntimeError("FAISS backend was opened read-only")
+        if not ids:
+            return
+        self._reload_if_changed()
+        self.delete(ids)
+        matrix = self._as_matrix(vectors)
+        if self.index is None:
+            self._new_index(matrix)
+
+        int_ids = []
+        with self.conn:
+            for cid, doc in zip(ids, documents):
+                cursor = self.conn.execute(
+                    "INSERT INTO chunks (chunk_id, source, content, metadata) VALUES (?, ?, ?, ?)",
+                    (cid, doc.metadata.get("source"), doc.page_content, json.dumps(doc.metadata)),
+                )
+                int_ids.append(cursor.lastrowid)
+        self.index.add_with_ids(matrix, np.asarray(int_ids, dtype="int64"))
+        self.dirty = True
+        if self._ivf_state() == "untrained":
+            print(f"  - Training IVF index on {self.index.ntotal} vectors", file=sys.stderr)
+            self._rebuild()
+
+    def delete(self, ids):
+        import numpy as np
+
+        if not ids:
+            return
+        self._reload_if_changed()
+        rows = self._live_int_ids(ids)
+        if not rows:
+            return
+        with self.conn:
+            if self.index is not None and self._supports_remove():
+                self.index.remove_ids(np.asarray(rows, dtype="int64"))
+                self.conn.executemany("DELETE FROM chunks WHERE int_id = ?", [(r,) for r in rows])
+            else:
+                self._tombstone(rows)
+        self.dirty = True
+
+    def _supports_remove(self):
+        base = self.faiss.downcast_index(self.index.index)
+        return not isinstance(base, self.faiss.IndexHNSW)
+
+    def similarity_search_by_vector(self, vector, k=6):
+        from langchain_core.documents import Document
+
+        self._reload_if_changed()
+        if self.index is None or self.index.ntotal == 0:
+            return []
+        tombstones = self.conn.execute("SELECT COUNT(*) FROM chunks WHERE deleted = 1").fetchone()[0]
+        fetch_k = min(self.index.ntotal, k + tombstones)
+        scores, int_ids = self.index.search(self._as_matrix(vector), fetch_k)
+
+        docs = []
+        for score, int_id in zip(scores[0], int_ids[0]):
+            if int_id < 0:
+                continue
+            row = self.conn.execute(
+                "SELECT content, metadata FROM chunks WHERE int_id = ? AND deleted = 0", (int(int_id),)
+            ).fetchone()
+            if row:
+                docs.append(Document(page_content=row[0], metadata=json.loads(row[1])))
+            if len(docs) == k:
+                break
+        return docs
+
+    def similarity_search(self, query, k=6):
+        return self.similarity_search_by_vector(self.embeddings.embed_query(query), k=k)
+
+    def source_chunks(self, source):
+        """Return (texts, vectors) of every chunk of a source; vectors are read back from the index."""
+        self._reload_if_changed()
+        rows = self.conn.execute(
+            "SELECT int_id, content FROM chunks WHERE source = ? AND deleted = 0 ORDER BY int_id", (source,)
+        ).fetchall()
+        if self.index is None or not rows:
+            return [], []
+        base = self.faiss.downcast_index(self.index.index)
+        if isinstance(base, self.faiss.IndexIVF):
+            base.make_direct_map()
+        return [row[1] for row in rows], [self.index.reconstruct(row[0]) for row in rows]
+
+    def _ivf_state(self):
+        """
+        For an "ivf" store: "untrained" while a flat index holds enough vectors to
+        train on, "outgrown" when the trained nlist is off by more than 2x from what
+        the corpus size calls for, otherwise None.
+        """
+        if self.index_type != "ivf" or self.index is None:
+            return None
+        base = self.faiss.downcast_index(self.index.index)
+        count = self.index.ntotal
+        if not isinstance(base, self.faiss.IndexIVF):
+            return "untrained" if count >= FAISS_IVF_MIN_VECTORS else None
+        target = ivf_nlist(count) if count >= FAISS_IVF_MIN_VECTORS else 0
+        if not target or not 0.5 <= base.nlist / target <= 2:
+            return "outgrown"
+        return None
+
+    def _rebuild(self):
+        """
+        Recreate the index from the live vectors, which drops tombstoned HNSW
+        entries and retrains IVF for the current corpus size.
+        """
+        import numpy as np
+
+        live = [r[0] for r in self.conn.execute("SELECT int_id FROM chunks WHERE deleted = 0 ORDER BY int_id")]
+        base = self.faiss.downcast_index(self.index.index)
+        if isinstance(base, self.faiss.IndexIVF):
+            base.make_direct_map()
+        vectors = np.vstack([self.index.reconstruct(int_id) for int_id in live]) if live else None
+        if vectors is not None:
+            self._new_index(vectors)
+            self.index.add_with_ids(vectors, np.asarray(live, dtype="int64"))
+        else:
+            self.index = None
+            if os.path.exists(self.index_path):
+                os.remove(self.index_path)
+        with self.conn:
+            self.conn.execute("DELETE FROM chunks WHERE deleted = 1")
+        self.dirty = True
+
+    def compact(self):
+        """
+        Rebuild the index from the live vectors so tombstoned HNSW entries stop
+        costing memory and search time, retrain an IVF index the corpus has
+        outgrown, then VACUUM the docstore.
+        """
+        if self.read_only:
+            raise RuntimeError("FAISS backend was opened read-only")
+        self._reload_if_changed()
+        tombstones = self.tombstone_count()
+        retrain = self._ivf_state() is not None
+        if self.index is not None and (tombstones or retrain):
+            self._rebuild()
+            self.save()
+        self.conn.execute("VACUUM")
+        return {"tombstones_removed": tombstones, "ivf_retrained": retrain}
+
+    def save(self):
+        """Write the index atomically so readers never mmap a half-written file."""
+        if not self.dirty or self.index is None:
+            return
+        tmp_path = self.index_path + ".tmp"
+        self.faiss.write_index(self.index, tmp_path)
+        os.replace(tmp_path, self.index_path)
+        self.loaded_mtime = os.path.getmtime(self.index_path)
+        self.dirty = False
+
+class QuantizedBackend(SqliteDocstore):
+    """
+    Compact vector store: L2-normalised vectors are scalar-quantized to int8 (one
+    float32 scale per vector) or float16 and appended to flat files that searches
+    memory-map, so the resident working set is a quarter (int8) or half (float16)
+    of float32. The first pass scores every vector block by block with numpy; the
+    best candidates are then re-ranked with the exact float32 vectors kept in the
+    docstore, which are only read for those candidates.
+
+    Deletes are tombstones until compact() rewrites the files.
+    """
+
+    name = "quantized"
+
+    def __init__(self, embeddings, directory=QUANTIZED_DIRECTORY, dtype=QUANTIZED_DTYPE, read_only=False,
+                 rerank_multiplier=QUANTIZED_RERANK_MULTIPLIER):
+        import numpy as np
+
+        self.np = np
+        self.embeddings = embeddings
+        self.directory = directory
+        self.read_only = read_only
+        self.rerank_multiplier = rerank_multiplier
+        self.vectors_path = os.path.join(directory, "vectors.bin")
+        self.scales_path = os.path.join(directory, "scales.bin")
+        if not read_only:
+            os.makedirs(directory, exist_ok=True)
+
+        self._open_docstore("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                int_id INTEGER PRIMARY KEY,
+                chunk_id TEXT UNIQUE NOT NULL,
+                source TEXT,
+                content TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                deleted INTEGER NOT NULL DEFAULT 0
+            );
+        """, read_only=read_only)
+        self.dtype = dtype
+        self.dim = None
+        self._load_settings()
+        self.matrix = None
+        self.scales = None
+        self.mapped = None
+
+    def _load_settings(self):
+        """
+        The first write fixes dtype and dimension for the life of the store. Until
+        then they are unset, so readers opened on an empty store read them again
+        once rows appear.
+        """
+        self.dtype = self._setting("dtype") or self.dtype
+        if self.dtype not in ("int8", "float16"):
+            raise ValueError(f"Unknown quantized dtype: {self.dtype}")
+        dim = self._setting("dim")
+        self.dim = int(dim) if dim else None
+
+    def _row_count(self):
+        """Rows in the vector files that the docstore knows about, tombstones included."""
+        return self.conn.execute("SELECT COALESCE(MAX(int_id) + 1, 0) FROM chunks").fetchone()[0]
+
+    def refresh(self):
+        """Pick up rows written by another process; searches already do this too."""
+        self._map()
+
+    def _map(self):
+        """Memory-map the vector files, again whenever another process has grown or rewritten them."""
+        np = self.np
+        rows = self._row_count()
+        if not rows or not os.path.exists(self.vectors_path):
+            self.matrix = self.scales = self.mapped = None
+            return
+        key = (rows, os.stat(self.vectors_path).st_mtime_ns)
+        if key == self.mapped:
+            return
+        if self.dim is None or self.mapped is None or rows != self.mapped[0]:
+            self._load_settings()
+        self.matrix = np.memmap(self.vectors_path, dtype=self.dtype, mode="r", shape=(rows, self.dim))
+        if self.dtype == "int8":
+            self.scales = np.memmap(self.scales_path, dtype="float32", mode="r", shape=(rows,))
+        self.mapped = key
+
+    def _normalize(self, vectors):
+        np = self.np
+        matrix = np.asarray(vectors, dtype="float32")
+        if matrix.ndim == 1:
+            matrix = matrix.reshape(1, -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+    def _quantize(self, matrix):
+        """Return (quantized rows, per-row scales or None)."""
+        np = self.np
+        if self.dtype == "float16":
+            return matrix.astype("float16"), None
+        scales = np.abs(matrix).max(axis=1) / 127
+        scales[scales == 0] = 1
+        return np.round(matrix / scales[:, None]).astype("int8"), scales.astype("float32")
+
+    def _write_rows(self, start, quantized, scales, vectors_path=None, scales_path=None):
+        """
+        Write rows from index `start` on. Anything past `start` is cut first, which
+        drops rows a crashed write appended without committing their docstore entries.
+        """
+        with open(vectors_path or self.vectors_path, "ab") as f:
+            f.truncate(start * self.dim * quantized.itemsize)
+            f.write(quantized.tobytes())
+        if scales is not None:
+            with open(scales_path or self.scales_path, "ab") as f:
+                f.truncate(start * 4)
+                f.write(scales.tobytes())
+
+    def add(self, ids, documents, vectors):
+        if self.read_only:
+            raise RuntimeError("Quantized backend was opened read-only")
+        if not ids:
+            return
+        self.delete(ids)
+        matrix = self._normalize(vectors)
+        if self.dim is None:
+            self.dim = matrix.shape[1]
+            self._set_setting("dim", str(self.dim))
+            self._set_setting("dtype", self.dtype)
+        elif matrix.shape[1] != self.dim:
+            raise ValueError(f"Vector dimension {matrix.shape[1]} does not match the store's {self.dim}")
+
+        start = self._row_count()
+        quantized, scales = self._quantize(matrix)
+        self._write_rows(start, quantized, scales)
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO chunks (int_id, chunk_id, source, content, metadata, vector) VALUES (?, ?, ?, ?, ?, ?)",
+                [(start + i, cid, doc.metadata.get("source"), doc.page_content, json.dumps(doc.metadata),
+                  matrix[i].tobytes()) for i, (cid, doc) in enumerate(zip(ids, documents))],
+            )
+
+    def delete(self, ids):
+        if not ids:
+            return
+        rows = self._live_int_ids(ids)
+        if rows:
+            with self.conn:
+                self._tombstone(rows)
+
+    def _first_pass(self, query, fetch_k):
+        """Approximate scores of every row; return the best fetch_k row ids, best first."""
+        np = self.np
+        best_ids, best_scores = [], []
+        for start in range(0, len(self.matrix), QUANTIZED_BLOCK_ROWS):
+            block = np.asarray(self.matrix[start:start + QUANTIZED_BLOCK_ROWS], dtype="float32") @ query
+            if self.scales is not None:
+                block *= self.scales[start:start + QUANTIZED_BLOCK_ROWS]
+            if len(block) > fetch_k:
+                top = np.argpartition(-block, fetch_k - 1)[:fetch_k]
+            else:
+                top = np.arange(len(block))
+            best_ids.append(top + start)
+            best_scores.append(block[top])
+        ids = np.concatenate(best_ids)
+        scores = np.concatenate(best_scores)
+        order = np.argsort(-scores)[:fetch_k]
+        return ids[order]
+
+    def similarity_search_by_vector(self, vector, k=6):
+        from langchain_core.documents import Document
+
+        np = self.np
+        self._map()
+        if self.matrix is None:
+            return []
+        query = self._normalize(vector)[0]
+        candidates_k = k * max(1, self.rerank_multiplier)
+        fetch_k = min(len(self.matrix), candidates_k + self.tombstone_count())
+        candidates = [int(i) for i in self._first_pass(query, fetch_k)]
+
+        rows = {}
+        for start in range(0, len(candidates), 500):
+            part = candidates[start:start + 500]
+            placeholders = ",".join("?" * len(part))
+            for int_id, content, metadata, blob in self.conn.execute(
+                f"SELECT int_id, content, metadata, vector FROM chunks WHERE int_id IN ({placeholders}) AND deleted = 0",
+                part,
+            ):
+                rows[int_id] = (content, metadata, blob)
+        live = [int_id for int_id in candidates if int_id in rows][:candidates_k]
+
+        if self.rerank_multiplier and live:
+            exact = np.stack([np.frombuffer(rows[int_id][2], dtype="float32") for int_id in live]) @ query
+            live = [live[i] for i in np.argsort(-exact)]
+        return [Document(page_content=rows[int_id][0], metadata=json.loads(rows[int_id][1])) for int_id in live[:k]]
+
+    def similarity_search(self, query, k=6):
+        return self.similarity_search_by_vector(self.embeddings.embed_query(query), k=k)
+
+    def source_chunks(self, source):
+        """Return (texts, vectors) of every chunk of a source, from the exact vectors in the docstore."""
+        np = self.np
+        rows = self.conn.execute(
+            "SELECT content, vector FROM chunks WHERE source = ? AND deleted = 0 ORDER BY int_id", (source,)
+        ).fetchall()
+        return [row[0] for row in rows], [np.frombuffer(row[1], dtype="float32") for row in rows]
+
+    def resident_bytes(self):
+        """Bytes a search maps: the quantized rows and their scales."""
+        return sum(os.path.getsize(path) for path in (self.vectors_path, self.scales_path) if os.path.exists(path))
+
+    def compact(self):
+        """Rewrite the vector files and the docstore without tombstones, then VACUUM."""
+        if self.read_only:
+            raise RuntimeError("Quantized backend was opened read-only")
+        np = self.np
+        tombstones = self.tombstone_count()
+        if tombstones:
+            live = self.conn.execute(
+                "SELECT chunk_id, source, content, metadata, vector FROM chunks WHERE deleted = 0 ORDER BY int_id"
+            ).fetchall()
+            vectors_tmp = self.vectors_path + ".tmp"
+            scales_tmp = self.scales_path + ".tmp"
+            for path in (vectors_tmp, scales_tmp):
+                if os.path.exists(path):
+                    os.remove(path)
+            if live:
+                matrix = np.stack([np.frombuffer(row[4], dtype="float32") for row in live])
+                quantized, scales = self._quantize(matrix)
+                self._write_rows(0, quantized, scales, vectors_tmp, scales_tmp)
+            with self.conn:
+                self.conn.execute("DELETE FROM chunks")
+                self.conn.executemany(
+                    "INSERT INTO chunks (int_id, chunk_id, source, content, metadata, vector) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(i, *row) for i, row in enumerate(live)],
+                )
+                # Swapped in just before the commit so rows and files change together
+                for tmp, path in ((vectors_tmp, self.vectors_path), (scales_tmp, self.scales_path)):
+                    if os.path.exists(tmp):
+                        os.replace(tmp, path)
+                    elif os.path.exists(path):
+                        os.remove(path)
+            self.mapped = None
+        self.conn.execute("VACUUM")
+        return {"tombstones_removed": tombstones}
+
+    def save(self):
+        """Writes are durable as soon as add() returns; nothing is held back."""
+
+def vector_store_exists(backend=VECTOR_BACKEND):
+    directories = {"faiss": FAISS_DIRECTORY, "quantized": QUANTIZED_DIRECTORY}
+    return os.path.exists(directories.get(backend, CHROMA_DIRECTORY))
+
+def check_embedding_model(vector_store, model, record=False, legacy_names=()):
+    """
+    Raise EmbeddingModelMismatch unless the store was built with `model`, or with
+    one of legacy_names, the identities earlier versions recorded for it. An empty
+    store accepts any model. With record=True (ingest) the model is recorded on the
+    store, so later runs with another model are rejected.
+    """
+    stored = vector_store.embedding_model()
+    built_with = None
+    if vector_store.count() > 0:
+        built_with = stored or LEGACY_EMBEDDING_MODEL
+    if built_with and built_with != model and built_with not in legacy_names:
+        raise EmbeddingModelMismatch(
+            f"The {vector_store.name} store was built with embedding model '{built_with}' but '{model}' is "
+            "configured. Switch EMBEDDING_PROVIDER back or rebuild the store with the new model."
+        )
+    if record and stored != model:
+        vector_store.record_embedding_model(model)
+
+def get_vector_backend(embeddings, backend=VECTOR_BACKEND, read_only=False):
+    """Open the vector store selected by VECTOR_BACKEND."""
+    if backend == "faiss":
+        return FaissBackend(embeddings, read_only=read_only)
+    if backend == "quantized":
+        return QuantizedBackend(embeddings, read_only=read_only)
+    if backend == "chroma":
+        return ChromaBackend(embeddings)
+    raise ValueError(f"Unknown vector backend: {backend}")
+
+def migrate_chroma_to_faiss(index_type=FAISS_INDEX_TYPE, directory=FAISS_DIRECTORY):
+    """Copy every chunk and its stored embedding from ./chroma_db into a FAISS index."""
+    if not os.path.exists(CHROMA_DIRECTORY):
+        return {"success": False, "message": f"Chroma directory '{CHROMA_DIRECTORY}' not found"}
+    if os.path.exists(os.path.join(directory, "index.faiss")):
+        return {"success": False, "message": f"FAISS index already exists in '{directory}'"}
+
+    source = ChromaBackend(embeddings=None)
+    target = FaissBackend(embeddings=None, directory=directory, index_type=index_type)
+    target.record_embedding_model(source.embedding_model() or LEGACY_EMBEDDING_MODEL)
+
+    batches = list(source.iter_batches()) if index_type == "ivf" else source.iter_batches()
+    if index_type == "ivf":
+        # Train the coarse quantizer on the whole collection, not just the first page
+        all_vectors = [v for _, _, _, embeddings in batches for v in embeddings]
+        if all_vectors:
+            target._new_index(target._as_matrix(all_vectors))
+
+    migrated = copy_batches(batches, target)
+    return {"success": True, "message": f"Migrated {migrated} chunks to {index_type} FAISS index", "chunks_count": migrated}
+
+def copy_batches(batches, target):
+    """Add (ids, texts, metadatas, vectors) pages to target; return the number of chunks copied."""
+    from langchain_core.documents import Document
+
+    migrated = 0
+    for ids, texts, metadatas, vectors in batches:
+        documents = [Document(page_content=t, metadata=m or {}) for t, m in zip(texts, metadatas)]
+        target.add(list(ids), documents, vectors)
+        migrated += len(ids)
+        print(f"  - Migrated {migrated} chunks", file=sys.stderr)
+    target.save()
+    return migrated
+
+def migrate_chroma_to_quantized(dtype=QUANTIZED_DTYPE, directory=QUANTIZED_DIRECTORY):
+    """Copy every chunk and its stored embedding from ./chroma_db into a quantized store."""
+    if not os.path.exists(CHROMA_DIRECTORY):
+        return {"success": False, "message": f"Chroma directory '{CHROMA_DIRECTORY}' not found"}
+    if os.path.exists(os.path.join(directory, "vectors.bin")):
+        return {"success": False, "message": f"Quantized store already exists in '{directory}'"}
+
+    source = ChromaBackend(embeddings=None)
+    target = QuantizedBackend(embeddings=None, directory=directory, dtype=dtype)
+    target.record_embedding_model(source.embedding_model() or LEGACY_EMBEDDING_MODEL)
+    migrated = copy_batches(source.iter_batches(), target)
+    return {"success": True, "message": f"Migrated {migrated} chunks to {dtype} quantized store", "chunks_count": migrated}
+
+def main():
+    parser = argparse.ArgumentParser(description="Vector store maintenance commands.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate = subparsers.add_parser("migrate", help="Convert ./chroma_db into a FAISS index")
+    migrate.add_argument("--index-type", choices=["flat", "ivf", "hnsw"], default=FAISS_INDEX_TYPE)
+    migrate.add_argument("--directory", default=FAISS_DIRECTORY)
+    quantize = subparsers.add_parser("quantize", help="Convert ./chroma_db into a quantized store")
+    quantize.add_argument("--dtype", choices=["int8", "float16"], default=QUANTIZED_DTYPE)
+    quantize.add_argument("--directory", default=QUANTIZED_DIRECTORY)
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        result = migrate_chroma_to_faiss(args.index_type, args.directory)
+        print("RESULT:", json.dumps(result))
+    elif args.command == "quantize":
+        result = migrate_chroma_to_quantized(args.dtype, args.directory)
+        print("RESULT:", json.dumps(result))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("langchain_core")
+
+import analyse
+from answer_cache import AnswerCache
+from embedding import StubEmbeddings
+from fake_llm import FakeChatModel
+from manifest import IngestManifest
+
+SELECTION = "Centrifugal pumps need priming before start-up."
+DOCUMENTS = [SimpleNamespace(page_content="Prime the pump casing.", metadata={"source": "/app/docs/pump.pdf", "page": 2})]
+
+class CountingChain:
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, inputs):
+        self.calls += 1
+        return f"Answer to {inputs['question']}"
+
+@pytest.fixture
+def resources(tmp_path, monkeypatch):
+    monkeypatch.setattr("retrieval.retrieve_by_vector", lambda *args, **kwargs: DOCUMENTS)
+    monkeypatch.setattr(analyse, "build_context", lambda *args: ("Prime the pump casing.", {"prompt_tokens_after": 10}))
+    manifest = IngestManifest(str(tmp_path / "manifest.sqlite3"))
+    manifest.finalize_file("pump.pdf", "hash-1", 3)
+    cache = AnswerCache(namespace="test", path=str(tmp_path / "answers.sqlite3"), manifest=manifest)
+    yield {
+        "embeddings": StubEmbeddings(dim=16),
+        "vector_store": None,
+        "lexical_index": None,
+        "selection_resolver": None,
+        "llm": FakeChatModel(),
+        "qa_chain": CountingChain(),
+        "answer_cache": cache,
+    }
+    cache.close()
+
+def analyse_once(resources, selection=SELECTION, source="pump.pdf", num=3):
+    return asyncio.run(analyse.run_analysis(resources, selection, num=num, source=source))
+
+def test_repeated_selection_is_served_from_cache(resources):
+    first = analyse_once(resources)
+    assert first["answer_cache"]["hit"] is False
+    assert first["insights"]["key_takeaways"]
+
+    second = analyse_once(resources)
+    assert resources["qa_chain"].calls == 1
+    assert second["answer_cache"]["hit"] is True
+    assert second["answer_cache"]["match"] == "exact"
+    assert second["answer"] == first["answer"]
+    assert second["insights"] == first["insights"]
+    assert second["context_text"] == first["context_text"]
+    assert second["metrics"]["counters"]["answer_cache_hits"] == 1
+
+def test_entries_are_kept_apart_by_source_and_num(resources):
+    analyse_once(resources)
+    assert analyse_once(resources, source="other.pdf")["answer_cache"]["hit"] is False
+    assert analyse_once(resources, num=5)["answer_cache"]["hit"] is False
+    assert resources["qa_chain"].calls == 3
+
+def test_reingested_source_invalidates_analysis(resources):
+    analyse_once(resources)
+    resources["answer_cache"].manifest.finalize_file("pump.pdf", "hash-2", 3)
+    assert analyse_once(resources)["answer_cache"]["hit"] is False
+    assert resources["qa_chain"].calls == 2
+
+def test_failed_part_is_not_cached(resources, monkeypatch):
+    async def failing(inputs):
+        raise RuntimeError("quota exceeded")
+
+    build_insights_chain = analyse.build_insights_chain
+    monkeypatch.setattr(analyse, "build_insights_chain", lambda llm: (None, SimpleNamespace(ainvoke=failing)))
+    assert analyse_once(resources)["errors"] == {"insights": "quota exceeded"}
+
+    monkeypatch.setattr(analyse, "build_insights_chain", build_insights_chain)
+    assert analyse_once(resources)["answer_cache"]["hit"] is False
+    assert resources["qa_chain"].calls == 2
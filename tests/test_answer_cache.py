@@ -0,0 +1,60 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from answer_cache import AnswerCache
+from manifest import IngestManifest
+
+# Chunk metadata carries the absolute path the ingest route resolved
+SOURCE = "/app/docs/foo.pdf"
+PAYLOAD = {"answer": "Torque is 12 Nm.", "sources": [{"file": SOURCE, "page": 0}]}
+
+@pytest.fixture
+def stores(tmp_path):
+    manifest = IngestManifest(str(tmp_path / "manifest.sqlite3"))
+    manifest.finalize_file("foo.pdf", "hash-1", 3)
+    cache = AnswerCache(namespace="test", path=str(tmp_path / "answers.sqlite3"), manifest=manifest)
+    yield cache, manifest
+    cache.close()
+
+def never_embed(query):
+    raise AssertionError("an exact match must not embed the query")
+
+def test_store_accepts_absolute_source_paths(stores):
+    cache, _ = stores
+    assert cache.store("What is the torque?", [1.0, 0.0], PAYLOAD, {SOURCE})
+
+def test_exact_hit_after_store(stores):
+    cache, _ = stores
+    cache.store("What is the torque?", [1.0, 0.0], PAYLOAD, {SOURCE})
+
+    hit, vector = cache.lookup("  what is THE torque? ", never_embed)
+    assert vector is None
+    assert hit["match"] == "exact"
+    assert hit["payload"] == PAYLOAD
+    assert cache.stats()["hits"] == 1
+
+def test_similar_hit_and_miss(stores):
+    cache, _ = stores
+    cache.store("What is the torque?", [1.0, 0.0], PAYLOAD, {SOURCE})
+
+    hit, vector = cache.lookup("Torque value?", lambda query: [0.99, 0.05])
+    assert hit["match"] == "similar"
+    assert vector == [0.99, 0.05]
+
+    hit, _ = cache.lookup("Battery warranty?", lambda query: [0.0, 1.0])
+    assert hit is None
+    assert cache.stats()["misses"] == 1
+
+def test_reingested_source_invalidates_entry(stores):
+    cache, manifest = stores
+    cache.store("What is the torque?", [1.0, 0.0], PAYLOAD, {SOURCE})
+    manifest.finalize_file("foo.pdf", "hash-2", 3)
+
+    hit, _ = cache.lookup("What is the torque?", lambda query: [1.0, 0.0])
+    assert hit is None
+    assert cache.stats()["invalidations"] == 1
+
+def test_unknown_source_is_not_cached(stores):
+    cache, _ = stores
+    assert not cache.store("What is the torque?", [1.0, 0.0], PAYLOAD, {"/app/docs/other.pdf"})
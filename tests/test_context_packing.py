@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+import context_packing
+from context_packing import CONTEXT_SEPARATOR, count_tokens, pack_context
+
+@pytest.fixture(params=["estimate", "tiktoken"], autouse=True)
+def tokenizer(request, monkeypatch):
+    """Run every budget test with the character estimate and, when it can be loaded, with tiktoken."""
+    if request.param == "estimate":
+        monkeypatch.setattr(context_packing, "_encoding", False)
+    else:
+        tiktoken = pytest.importorskip("tiktoken")
+        try:
+            encoding = tiktoken.get_encoding(context_packing.CONTEXT_ENCODING)
+        except Exception:
+            pytest.skip("tiktoken encoding cannot be downloaded here")
+        monkeypatch.setattr(context_packing, "_encoding", encoding)
+    return request.param
+
+def chunk(rank, words):
+    """A chunk whose text shares no trigram with any other, on a page of its own."""
+    text = " ".join(f"r{rank}w{i}" for i in range(words))
+    return SimpleNamespace(page_content=text, metadata={"source": "/app/docs/manual.pdf", "page": rank})
+
+def cost(documents):
+    """What packing the documents spends: each chunk plus a separator between neighbours."""
+    return (sum(count_tokens(doc.page_content) for doc in documents)
+            + count_tokens(CONTEXT_SEPARATOR) * (len(documents) - 1))
+
+def test_chunks_that_exactly_fill_the_budget_are_all_packed(tokenizer):
+    documents = [chunk(0, 40), chunk(1, 30), chunk(2, 20)]
+    context, stats = pack_context(documents, budget=cost(documents))
+    assert stats["chunks_after"] == 3
+    assert stats["context_tokens_after"] <= cost(documents)
+    assert stats["tokenizer"] == ("estimate" if tokenizer == "estimate" else context_packing.CONTEXT_ENCODING)
+
+def test_separator_counts_against_the_budget():
+    documents = [chunk(0, 40), chunk(1, 30)]
+    budget = cost(documents) - 1
+    assert count_tokens(documents[0].page_content) + count_tokens(documents[1].page_content) <= budget
+    context, stats = pack_context(documents, budget=budget)
+    assert stats["chunks_after"] == 1
+    assert context == documents[0].page_content
+
+def test_oversized_chunk_is_skipped_for_smaller_ones_in_rank_order():
+    documents = [chunk(0, 30), chunk(1, 400), chunk(2, 20), chunk(3, 10)]
+    fitting = [documents[0], documents[2], documents[3]]
+    context, stats = pack_context(documents, budget=cost(fitting))
+    assert context == CONTEXT_SEPARATOR.join(doc.page_content for doc in fitting)
+    assert stats["chunks_before"] == 4
+    assert stats["chunks_after"] == 3
+
+def test_only_a_top_chunk_larger_than_the_budget_is_truncated():
+    documents = [chunk(0, 400), chunk(1, 10)]
+    context, stats = pack_context(documents, budget=50)
+    assert stats["chunks_after"] == 1
+    assert documents[0].page_content.startswith(context)
+    assert 0 < stats["context_tokens_after"] <= 50
+    assert stats["context_tokens_before"] == count_tokens(CONTEXT_SEPARATOR.join(doc.page_content for doc in documents))
+
+def test_near_duplicates_do_not_spend_the_budget():
+    original = chunk(0, 40)
+    duplicate = SimpleNamespace(page_content=original.page_content + " r0w40", metadata={"source": "other.pdf", "page": 9})
+    documents = [original, duplicate, chunk(1, 30)]
+    context, stats = pack_context(documents, budget=cost([original, documents[2]]))
+    assert stats["near_duplicates_dropped"] == 1
+    assert stats["chunks_after"] == 2
+    assert context.endswith(documents[2].page_content)
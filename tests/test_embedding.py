@@ -0,0 +1,139 @@
+from types import SimpleNamespace
+
+import pytest
+
+import embedding
+from embedding import EmbeddingError, StubEmbeddings, backoff_delay, embed_texts
+from embedding_cache import CachedEmbeddings, EmbeddingCache, text_hash
+from vector_backends import EmbeddingModelMismatch, QuantizedBackend, check_embedding_model
+
+TEXTS = [f"chunk {i}" for i in range(23)]
+
+class FlakyEmbeddings(StubEmbeddings):
+    """Fails its first `failures` calls with `error`, then embeds like StubEmbeddings."""
+
+    def __init__(self, failures, error="429 Resource has been exhausted (e.g. check quota).", **kwargs):
+        super().__init__(dim=8, **kwargs)
+        self.failures = failures
+        self.error = error
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RuntimeError(self.error)
+        return [self._vector(text) for text in texts]
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(embedding, "backoff_delay", lambda attempt: 0.0)
+
+def test_vectors_keep_input_order_across_concurrent_batches():
+    stub = StubEmbeddings(dim=8, latency=0.01)
+    vectors, stats = embed_texts(TEXTS, stub, batch_size=4, max_concurrency=4)
+    assert vectors == [stub._vector(text) for text in TEXTS]
+    assert stats["batches"] == 6
+    assert stats["requests"] == 6
+    assert stats["retries"] == 0
+
+def test_rate_limits_are_retried_and_halve_concurrency():
+    # Both batches are rate limited (4 -> 2 -> 1), then each success earns back one slot
+    # once a full window at the current limit has succeeded (1 -> 2)
+    stub = FlakyEmbeddings(failures=2)
+    vectors, stats = embed_texts(TEXTS[:8], stub, batch_size=4, max_concurrency=4, max_retries=3)
+    assert vectors == [stub._vector(text) for text in TEXTS[:8]]
+    assert stats["rate_limited"] == 2
+    assert stats["retries"] == 2
+    assert stats["requests"] == 4
+    assert stats["final_concurrency"] == 2
+
+def test_other_errors_are_retried_without_lowering_concurrency():
+    stub = FlakyEmbeddings(failures=1, error="503 backend unavailable")
+    vectors, stats = embed_texts(TEXTS[:4], stub, batch_size=4, max_concurrency=2, max_retries=1)
+    assert vectors == [stub._vector(text) for text in TEXTS[:4]]
+    assert stats["retries"] == 1
+    assert stats["rate_limited"] == 0
+    assert stats["final_concurrency"] == 2
+
+def test_batch_fails_after_max_retries():
+    with pytest.raises(EmbeddingError):
+        embed_texts(TEXTS[:4], FlakyEmbeddings(failures=10), batch_size=4, max_retries=2)
+
+def test_backoff_is_jittered_and_capped():
+    for attempt in range(12):
+        delay = backoff_delay(attempt)
+        assert 0 <= delay <= min(embedding.BACKOFF_MAX_SECONDS, embedding.BACKOFF_BASE_SECONDS * 2 ** attempt)
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite3"))
+    yield cache
+    cache.conn.close()
+
+def expected(stub, texts):
+    return [pytest.approx(stub._vector(text), abs=1e-6) for text in texts]
+
+def test_cache_only_embeds_misses(cache):
+    stub = StubEmbeddings(dim=8)
+    cached = CachedEmbeddings(stub, "model-a", cache)
+    assert cached.embed_documents(["a", "b", "a"]) == expected(stub, "aba")
+    assert stub.calls == 1
+
+    # Vectors come back from the cache as float32, in input order
+    assert cached.embed_documents(["b", "c"]) == expected(stub, "bc")
+    assert stub.calls == 2
+    assert cached.embed_documents(["a", "c"]) == expected(stub, "ac")
+    assert stub.calls == 2
+    assert cache.stats()["hits"] == 3
+
+def test_cache_keys_by_model_and_task(cache):
+    stub = StubEmbeddings(dim=8)
+    CachedEmbeddings(stub, "model-a", cache).embed_documents(["a"])
+    # A different model must never be served model-a's vectors
+    CachedEmbeddings(stub, "model-b", cache).embed_documents(["a"])
+    assert stub.calls == 2
+    # Nor may a query reuse the document embedding of the same text
+    CachedEmbeddings(stub, "model-a", cache).embed_query("a")
+    assert stub.calls == 3
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    vector_bytes = 8 * 4
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite3"), max_bytes=3 * vector_bytes)
+    cached = CachedEmbeddings(StubEmbeddings(dim=8), "model-a", cache)
+    for text in "abcad":
+        cached.embed_documents([text])
+    # Over budget after "d": evicts down to 90% of it, oldest use first, and "a" was just used
+    assert cache.stats()["evictions"] == 2
+    assert set(cache.get_many("model-a", [text_hash(text) for text in "abcd"])) == {text_hash("a"), text_hash("d")}
+    cache.conn.close()
+
+def test_local_models_with_the_same_directory_name_are_different_models(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding, "EMBEDDING_PROVIDER", "local")
+    names = []
+    for parent in ("a", "b"):
+        monkeypatch.setattr(embedding, "LOCAL_EMBEDDING_MODEL_PATH", str(tmp_path / parent / "all-MiniLM-L6-v2"))
+        names.append(embedding.embedding_model_name())
+    assert names[0] != names[1]
+
+    # A relative path names the same model as its absolute form
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(embedding, "LOCAL_EMBEDDING_MODEL_PATH", "./b/all-MiniLM-L6-v2/")
+    assert embedding.embedding_model_name() == names[1]
+
+def test_store_recorded_with_the_legacy_local_name_is_accepted_and_upgraded(tmp_path, monkeypatch):
+    np = pytest.importorskip("numpy")
+
+    monkeypatch.setattr(embedding, "EMBEDDING_PROVIDER", "local")
+    monkeypatch.setattr(embedding, "LOCAL_EMBEDDING_MODEL_PATH", str(tmp_path / "models" / "all-MiniLM-L6-v2"))
+    store = QuantizedBackend(None, directory=str(tmp_path / "store"))
+    store.add(["c0"], [SimpleNamespace(page_content="chunk", metadata={"source": "a.pdf"})],
+              np.ones((1, 4), dtype="float32"))
+    store.record_embedding_model("local:all-MiniLM-L6-v2")
+
+    model, legacy_names = embedding.embedding_model_name(), embedding.legacy_embedding_model_names()
+    check_embedding_model(store, model, legacy_names=legacy_names)
+    check_embedding_model(store, model, record=True, legacy_names=legacy_names)
+    assert store.embedding_model() == model
+
+    monkeypatch.setattr(embedding, "LOCAL_EMBEDDING_MODEL_PATH", str(tmp_path / "other" / "all-MiniLM-L6-v2"))
+    with pytest.raises(EmbeddingModelMismatch):
+        check_embedding_model(store, embedding.embedding_model_name(), legacy_names=embedding.legacy_embedding_model_names())
@@ -0,0 +1,33 @@
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("faiss")
+
+from vector_backends import FaissBackend
+
+def chunks(count, source="/app/docs/foo.pdf"):
+    return [SimpleNamespace(page_content=f"chunk {i}", metadata={"source": source, "page": i}) for i in range(count)]
+
+def vectors(count, dim=16, seed=0):
+    return np.random.default_rng(seed).normal(size=(count, dim)).astype("float32")
+
+def test_read_only_creates_nothing(tmp_path):
+    directory = tmp_path / "missing"
+    with pytest.raises(FileNotFoundError):
+        FaissBackend(None, directory=str(directory), index_type="flat", read_only=True)
+    assert not directory.exists()
+
+def test_read_only_opens_the_docstore_read_only(tmp_path):
+    directory = str(tmp_path / "store")
+    writer = FaissBackend(None, directory=directory, index_type="flat")
+    writer.add([f"c{i}" for i in range(4)], chunks(4), vectors(4))
+    writer.save()
+
+    reader = FaissBackend(None, directory=directory, index_type="flat", read_only=True)
+    assert reader.count() == 4
+    with pytest.raises(RuntimeError):
+        reader.add(["c9"], chunks(1), vectors(1))
+    with pytest.raises(Exception, match="readonly"):
+        reader.conn.execute("DELETE FROM chunks")
@@ -0,0 +1,50 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from fake_llm import FakeChatModel
+from insights import build_insights_chain, insights_sections
+
+DIALOGUE_PROMPT = 'Write a dialogue about pumps. Prefix lines with "Person1:" and "Person2:".'
+
+def test_insights_chain_parses_fake_json():
+    _, chain = build_insights_chain(FakeChatModel())
+    data = chain.invoke({"question": "Centrifugal pumps need priming", "n": 3})
+    sections = insights_sections(data)
+    assert set(sections) == {"key_takeaways", "did_you_know", "contradictions", "examples"}
+    assert len(sections["key_takeaways"]) == 3
+    assert "Centrifugal pumps" in sections["key_takeaways"][0]
+
+def test_stream_matches_invoke_and_alternates_speakers():
+    model = FakeChatModel()
+    streamed = "".join(chunk.content for chunk in model.stream(DIALOGUE_PROMPT))
+    assert streamed == model.invoke(DIALOGUE_PROMPT).content
+    speakers = [line.split(":", 1)[0] for line in streamed.splitlines()]
+    assert speakers == ["Person1", "Person2"] * 6
+
+def test_replies_are_deterministic():
+    assert FakeChatModel().invoke("What is the torque?").content == FakeChatModel().invoke("What is the torque?").content
+    assert FakeChatModel().invoke("What is the torque?").content != FakeChatModel().invoke("Battery life?").content
+
+def test_latency_is_paid_before_the_first_token():
+    model = FakeChatModel(latency=0.05)
+    started_at = time.perf_counter()
+    next(iter(model.stream("What is the torque?")))
+    assert time.perf_counter() - started_at >= 0.05
+
+def test_async_calls_overlap():
+    # analyse.py awaits the answer and insights calls together
+    model = FakeChatModel(latency=0.2)
+
+    async def both():
+        return await asyncio.gather(model.ainvoke("What is the torque?"), model.ainvoke(f"JSON {DIALOGUE_PROMPT}"))
+
+    started_at = time.perf_counter()
+    answer, insights = asyncio.run(both())
+    assert time.perf_counter() - started_at < 0.38
+    assert json.loads(insights.content)["key_takeaways"]
+    assert answer.content.startswith("Based on the context")
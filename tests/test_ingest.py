@@ -0,0 +1,145 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("langchain.text_splitter")
+
+import ingest
+from embedding import StubEmbeddings
+from lexical_index import LexicalIndex
+from manifest import IngestManifest
+from vector_backends import QuantizedBackend
+
+PAGES = ["Pump priming steps.", "Torque is 12 Nm.", "Battery warranty is two years."]
+
+class RecordingEmbeddings(StubEmbeddings):
+    def __init__(self):
+        super().__init__(dim=16)
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return super().embed_documents(texts)
+
+@pytest.fixture
+def pdfs(tmp_path, monkeypatch):
+    """Fake PDFs: {path: [page texts]}. The file bytes follow the text, so edits change the content hash."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ingest, "GOOGLE_API_KEY", "test")
+    pages = {}
+
+    def parse(tasks, workers, backend, layout):
+        for filepath, start, end in tasks:
+            yield {"filepath": filepath, "start": start, "end": end, "backend": "fake", "error": None,
+                   "pages": list(enumerate(pages[filepath]))}
+
+    monkeypatch.setattr(ingest, "plan_tasks", lambda filepath, parser: [(filepath, None, None)])
+    monkeypatch.setattr(ingest, "iter_parsed_pdfs", parse)
+    monkeypatch.setattr(ingest, "get_vector_backend", lambda embeddings: QuantizedBackend(embeddings))
+
+    def write(name, texts):
+        path = str(tmp_path / name)
+        with open(path, "w") as f:
+            f.write("\f".join(texts))
+        pages[path] = list(texts)
+        return path
+
+    return write
+
+@pytest.fixture
+def run(monkeypatch):
+    """Ingest one file a page per batch; returns the result and the texts that were embedded."""
+    def run(path):
+        embeddings = RecordingEmbeddings()
+        monkeypatch.setattr(ingest, "get_embeddings", lambda api_key: embeddings)
+        return ingest.ingest_documents([path], workers=1, batch_size=1), embeddings.texts
+    return run
+
+def stored_texts(path):
+    return sorted(QuantizedBackend(None).source_chunks(path)[0])
+
+def test_unchanged_file_is_skipped(pdfs, run):
+    path = pdfs("manual.pdf", PAGES)
+    result, embedded = run(path)
+    assert result["processed_files"] == ["manual.pdf"]
+    assert sorted(embedded) == sorted(PAGES)
+
+    result, embedded = run(path)
+    assert result["skipped_files"] == ["manual.pdf"]
+    assert embedded == []
+
+def test_only_changed_pages_are_reingested(pdfs, run):
+    path = pdfs("manual.pdf", PAGES)
+    run(path)
+
+    pdfs("manual.pdf", [PAGES[0], "Torque is 15 Nm.", PAGES[2]])
+    result, embedded = run(path)
+    assert embedded == ["Torque is 15 Nm."]
+    assert result["unchanged_pages"] == 2
+    assert result["removed_chunks_count"] == 1
+    assert stored_texts(path) == sorted([PAGES[0], "Torque is 15 Nm.", PAGES[2]])
+    lexical = LexicalIndex()
+    try:
+        assert lexical.chunk_count() == 3
+        assert lexical.search("15", k=1)[0][2] == "Torque is 15 Nm."
+    finally:
+        lexical.close()
+
+def test_interrupted_ingest_resumes_from_manifest(pdfs, run, monkeypatch):
+    path = pdfs("manual.pdf", PAGES)
+    commit_batch = ingest.commit_batch
+    commits = []
+
+    def crash_on_second(*args):
+        if commits:
+            raise RuntimeError("killed")
+        commits.append(1)
+        commit_batch(*args)
+
+    monkeypatch.setattr(ingest, "commit_batch", crash_on_second)
+    result, _ = run(path)
+    assert not result["success"]
+    manifest = IngestManifest()
+    assert manifest.file_hash("manual.pdf") is None
+    assert set(manifest.pages("manual.pdf")) == {0}
+    manifest.close()
+
+    monkeypatch.setattr(ingest, "commit_batch", commit_batch)
+    result, embedded = run(path)
+    assert result["success"]
+    assert result["unchanged_pages"] == 1
+    assert sorted(embedded) == sorted(PAGES[1:])
+    assert stored_texts(path) == sorted(PAGES)
+
+class Recorder:
+    """Stands in for a store and records the order of writes; fails the named method."""
+
+    def __init__(self, name, log, fail=None):
+        self.name = name
+        self.log = log
+        self.fail = fail
+
+    def __getattr__(self, method):
+        def call(*args):
+            if method == self.fail:
+                raise RuntimeError(f"{self.name}.{method} failed")
+            self.log.append(f"{self.name}.{method}")
+        return call
+
+def test_manifest_is_written_last():
+    batch = {"chunks": [], "ids": ["c0"], "pages": [("a.pdf", 0, "h", ["c0"])], "replaced_ids": ["old"]}
+    log = []
+    ingest.commit_batch(batch, [[0.0]], Recorder("vector_store", log), Recorder("lexical_index", log),
+                        Recorder("manifest", log), ingest.Metrics("test"))
+    assert log[-1] == "manifest.record_pages"
+    assert log.index("vector_store.add") < log.index("vector_store.delete")
+
+@pytest.mark.parametrize("fail", [("vector_store", "add"), ("vector_store", "save"), ("lexical_index", "add")])
+def test_failed_store_write_never_reaches_the_manifest(fail):
+    batch = {"chunks": [], "ids": ["c0"], "pages": [("a.pdf", 0, "h", ["c0"])], "replaced_ids": []}
+    log = []
+    stores = {name: Recorder(name, log, fail[1] if fail[0] == name else None)
+              for name in ("vector_store", "lexical_index", "manifest")}
+    with pytest.raises(RuntimeError):
+        ingest.commit_batch(batch, [[0.0]], stores["vector_store"], stores["lexical_index"], stores["manifest"],
+                            ingest.Metrics("test"))
+    assert "manifest.record_pages" not in log
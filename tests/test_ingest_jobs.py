@@ -0,0 +1,43 @@
+import os
+
+import pytest
+
+from ingest_jobs import JobQueue
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    yield queue
+    queue.close()
+
+def test_claim_is_fifo(queue):
+    first = queue.submit(["a.pdf"])
+    second = queue.submit(["b.pdf"])
+    assert queue.claim() == (first, ["a.pdf"])
+    assert queue.claim() == (second, ["b.pdf"])
+    assert queue.claim() is None
+
+def test_requeue_ignores_recorded_pid(queue):
+    # The recorded pid may have been reused by an unrelated live process
+    job_id = queue.submit(["a.pdf"])
+    queue.claim()
+    queue.conn.execute("UPDATE jobs SET worker_pid = ?", (os.getppid(),))
+    assert queue.requeue_orphans() == [job_id]
+    job = queue.get(job_id)
+    assert job["status"] == "queued"
+    assert job["queue_position"] == 0
+
+def test_requeued_job_keeps_its_place(queue):
+    interrupted = queue.submit(["a.pdf"])
+    queue.claim()
+    later = queue.submit(["b.pdf"])
+    queue.requeue_orphans()
+    assert queue.claim()[0] == interrupted
+    assert queue.get(later)["queue_position"] == 0
+
+def test_finished_jobs_are_not_requeued(queue):
+    job_id = queue.submit(["a.pdf"])
+    queue.claim()
+    queue.finish(job_id, {"success": True, "message": "done"})
+    assert queue.requeue_orphans() == []
+    assert queue.get(job_id)["status"] == "succeeded"
@@ -0,0 +1,65 @@
+import math
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+
+import lexical_index
+from lexical_index import BM25_B, BM25_K1, LexicalIndex, tokenize
+
+TEXTS = [
+    "The XR-200 pump needs a torque of 12 Nm on the housing bolts.",
+    "Replace the pump seal when the housing leaks.",
+    "Battery warranty covers the pack for five years.",
+    "The torque wrench must be calibrated every year.",
+    "The housing of the controller is sealed against dust.",
+]
+
+@pytest.fixture
+def index(tmp_path):
+    index = LexicalIndex(str(tmp_path / "lexical.sqlite3"))
+    index.add([f"c{i}" for i in range(len(TEXTS))],
+              [SimpleNamespace(page_content=text, metadata={"page": i}) for i, text in enumerate(TEXTS)])
+    yield index
+    index.close()
+
+def reference_scores(terms):
+    """BM25 over TEXTS computed in Python, as search did before scoring moved into SQL."""
+    docs = [Counter(tokenize(text)) for text in TEXTS]
+    avg_length = sum(sum(doc.values()) for doc in docs) / len(docs)
+    scores = Counter()
+    for term in terms:
+        df = sum(1 for doc in docs if term in doc)
+        idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+        for i, doc in enumerate(docs):
+            if term in doc:
+                tf, length = doc[term], sum(doc.values())
+                scores[f"c{i}"] += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length))
+    return scores
+
+def test_scores_match_reference_bm25(index):
+    results = index.search("xr-200 torque", k=10)
+    expected = reference_scores(["xr-200", "torque", "xr", "200"])
+    assert [cid for cid, *_ in results] == [cid for cid, _ in expected.most_common()]
+    for cid, score, content, metadata in results:
+        assert score == pytest.approx(expected[cid])
+        assert content == TEXTS[int(cid[1:])]
+        assert metadata == {"page": int(cid[1:])}
+
+def test_stopwords_and_common_terms_are_dropped(index):
+    # "the" is a stopword; "housing" is in 3 of 5 chunks, above the default df ratio
+    assert index._query_terms("what is the housing torque", 5) == {"torque": 2}
+    assert index.search("the of is", k=10) == []
+
+def test_only_common_terms_still_rank(index):
+    results = index.search("housing", k=10)
+    assert {cid for cid, *_ in results} == {"c0", "c1", "c4"}
+
+def test_query_terms_are_capped_to_the_rarest(index, monkeypatch):
+    monkeypatch.setattr(lexical_index, "LEXICAL_MAX_QUERY_TERMS", 2)
+    terms = index._query_terms("torque pump battery warranty", 5)
+    assert set(terms) == {"battery", "warranty"}
+
+def test_removed_chunks_are_not_returned(index):
+    index.remove(["c0"])
+    assert "c0" not in {cid for cid, *_ in index.search("torque xr-200", k=10)}
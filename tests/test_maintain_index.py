@@ -0,0 +1,111 @@
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import maintain_index
+from lexical_index import LexicalIndex
+from manifest import IngestManifest
+from vector_backends import QuantizedBackend
+
+@pytest.fixture(autouse=True)
+def stores_dir(tmp_path, monkeypatch):
+    # Every store path is relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(maintain_index, "get_vector_backend", lambda embeddings: QuantizedBackend(embeddings))
+    (tmp_path / "docs").mkdir()
+    return tmp_path
+
+def ingest(name, pages=2, source=None, in_manifest=True):
+    """What ingest.py leaves behind for a file: vectors, lexical rows and, last, the manifest entry."""
+    source = source or f"/app/docs/{name}"
+    ids = [f"{name}-{page}" for page in range(pages)]
+    documents = [SimpleNamespace(page_content=f"{name} torque page {page}", metadata={"source": source, "page": page})
+                 for page in range(pages)]
+    vectors = np.random.default_rng(len(name)).normal(size=(pages, 8)).astype("float32")
+    store = QuantizedBackend(None)
+    store.add(ids, documents, vectors)
+    store.save()
+    index = LexicalIndex()
+    index.add(ids, documents)
+    index.close()
+    if in_manifest:
+        manifest = IngestManifest()
+        manifest.record_pages([(name, page, f"page-hash-{page}", [ids[page]]) for page in range(pages)])
+        manifest.finalize_file(name, "hash", pages, stored_source=source)
+        manifest.close()
+    return ids
+
+def test_delete_removes_vectors_lexical_rows_and_manifest_entry():
+    ingest("a.pdf")
+    kept = ingest("b.pdf")
+
+    result = maintain_index.delete_source("a.pdf")
+    assert result["removed_chunks_count"] == 2
+
+    stores = maintain_index.IndexStores()
+    try:
+        assert set(stores.vector_store.all_ids()) == set(kept)
+        assert stores.lexical_index.chunk_ids() == kept
+        assert set(stores.manifest.files()) == {"b.pdf"}
+        assert stores.orphan_chunks() == (set(), set(), set())
+    finally:
+        stores.close()
+
+def test_sources_named_uses_the_manifest_and_scans_only_legacy_rows(monkeypatch):
+    ingest("a.pdf", source="/old/place/a.pdf")
+    stores = maintain_index.IndexStores()
+    scans = []
+    source_counts = stores.vector_store.source_counts
+    monkeypatch.setattr(stores.vector_store, "source_counts", lambda: scans.append(1) or source_counts())
+    try:
+        assert stores.sources_named("a.pdf") == ["/old/place/a.pdf"]
+        assert scans == []
+
+        # Manifests written before stored paths were recorded
+        with stores.manifest.conn:
+            stores.manifest.conn.execute("UPDATE files SET stored_sources = NULL")
+        assert stores.sources_named("a.pdf") == ["/old/place/a.pdf"]
+        assert scans == [1]
+    finally:
+        stores.close()
+
+def test_reconcile_reports_without_apply(stores_dir):
+    ingest("gone.pdf")
+    (stores_dir / "docs" / "new.pdf").write_bytes(b"%PDF-1.4")
+
+    result = maintain_index.reconcile("./docs")
+    assert result["orphaned_sources"] == ["gone.pdf"]
+    assert result["not_ingested"] == ["new.pdf"]
+    assert not result["applied"]
+    stores = maintain_index.IndexStores()
+    try:
+        assert stores.vector_store.count() == 2
+    finally:
+        stores.close()
+
+def test_reconcile_apply_drops_orphans(stores_dir):
+    ingest("gone.pdf")
+    kept = ingest("kept.pdf")
+    (stores_dir / "docs" / "kept.pdf").write_bytes(b"%PDF-1.4")
+    manifest = IngestManifest()
+    manifest.finalize_file("kept.pdf", maintain_index.file_sha256("docs/kept.pdf"), 2)
+    manifest.close()
+    # Chunks of a file on disk committed by an ingest that died before its manifest entry
+    stray = ingest("stray.pdf", pages=1, source="/app/docs/kept.pdf", in_manifest=False)
+
+    result = maintain_index.reconcile("./docs", apply=True)
+    assert result["orphaned_sources"] == ["gone.pdf"]
+    assert result["changed"] == []
+    assert result["orphan_chunks_count"] == len(stray)
+    assert result["removed_chunks_count"] == 2 + len(stray)
+
+    stores = maintain_index.IndexStores()
+    try:
+        assert set(stores.vector_store.all_ids()) == set(kept)
+        assert set(stores.lexical_index.chunk_ids()) == set(kept)
+        assert set(stores.manifest.files()) == {"kept.pdf"}
+        assert stores.orphan_chunks() == (set(), set(), set())
+    finally:
+        stores.close()
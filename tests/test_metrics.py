@@ -0,0 +1,34 @@
+import pytest
+
+from metrics import METRIC_PREFIX, Metrics
+
+def run(script="query"):
+    metrics = Metrics(script)
+    with metrics.span("retrieval"):
+        pass
+    metrics.count("llm_calls")
+    return metrics
+
+def test_each_type_is_declared_once_across_appends(tmp_path):
+    log = tmp_path / "metrics.prom"
+    run().finish(str(log))
+    run("ingest").finish(str(log))
+
+    lines = log.read_text().splitlines()
+    types = [line for line in lines if line.startswith("# TYPE")]
+    assert len(types) == len(set(types))
+    assert f"# TYPE {METRIC_PREFIX}_span_seconds gauge" in types
+    assert sum(line.startswith(f"{METRIC_PREFIX}_run_seconds") for line in lines) == 2
+
+def test_rss_is_labelled_as_lifetime_and_growth_is_per_run():
+    pytest.importorskip("resource")
+    # Raise the process peak before the run starts
+    ballast = bytearray(64 * 1024 * 1024)
+    metrics = run()
+    del ballast
+
+    snapshot = metrics.snapshot()
+    assert "peak_rss_mb" not in snapshot
+    assert snapshot["process_peak_rss_mb"]["self"] >= 64
+    # The run itself stayed well below the peak it inherited
+    assert 0 <= snapshot["peak_rss_growth_mb"]["self"] < 16
@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from vector_backends import QuantizedBackend
+
+def chunks(count, source="/app/docs/foo.pdf"):
+    return [SimpleNamespace(page_content=f"chunk {i}", metadata={"source": source, "page": i}) for i in range(count)]
+
+def vectors(count, dim=16, seed=0):
+    return np.random.default_rng(seed).normal(size=(count, dim)).astype("float32")
+
+@pytest.mark.parametrize("dtype", ["int8", "float16"])
+def test_reader_opened_on_empty_store_sees_later_writes(tmp_path, dtype):
+    directory = str(tmp_path / "store")
+    writer = QuantizedBackend(None, directory=directory, dtype=dtype)
+    early_reader = QuantizedBackend(None, directory=directory, read_only=True)
+    assert early_reader.dim is None
+
+    matrix = vectors(50)
+    writer.add([f"c{i}" for i in range(50)], chunks(50), matrix)
+    late_reader = QuantizedBackend(None, directory=directory, read_only=True)
+
+    query = matrix[7] / np.linalg.norm(matrix[7])
+    for reader in (early_reader, late_reader):
+        reader._map()
+        assert reader.dim == 16
+        assert reader.dtype == dtype
+        assert int(reader._first_pass(query, 1)[0]) == 7
+
+def test_reader_picks_up_appended_rows(tmp_path):
+    directory = str(tmp_path / "store")
+    writer = QuantizedBackend(None, directory=directory)
+    matrix = vectors(20)
+    writer.add([f"c{i}" for i in range(10)], chunks(10), matrix[:10])
+    reader = QuantizedBackend(None, directory=directory, read_only=True)
+    reader._map()
+    assert len(reader.matrix) == 10
+
+    writer.add([f"c{i}" for i in range(10, 20)], chunks(10), matrix[10:])
+    reader._map()
+    assert len(reader.matrix) == 20
+    query = matrix[15] / np.linalg.norm(matrix[15])
+    assert int(reader._first_pass(query, 1)[0]) == 15
+
+def test_read_only_creates_nothing(tmp_path):
+    directory = tmp_path / "missing"
+    with pytest.raises(FileNotFoundError):
+        QuantizedBackend(None, directory=str(directory), read_only=True)
+    assert not directory.exists()
+
+def test_read_only_rejects_writes(tmp_path):
+    directory = str(tmp_path / "store")
+    QuantizedBackend(None, directory=directory)
+    reader = QuantizedBackend(None, directory=directory, read_only=True)
+    with pytest.raises(RuntimeError):
+        reader.add(["c0"], chunks(1), vectors(1))
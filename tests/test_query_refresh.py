@@ -0,0 +1,69 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+import query
+from lexical_index import LexicalIndex
+from manifest import IngestManifest
+from retrieval import HybridRetriever, VectorRetriever
+
+class StubStore:
+    def __init__(self):
+        self.refreshes = 0
+
+    def refresh(self):
+        self.refreshes += 1
+
+@pytest.fixture
+def resources(tmp_path, monkeypatch):
+    # Every store path is relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    manifest = IngestManifest()
+    vector_store = StubStore()
+    resources = {
+        "vector_store": vector_store,
+        "manifest": manifest,
+        "store_version": query.stores_version(manifest),
+        "lexical_index": query.open_lexical_index(),
+        "retriever": VectorRetriever(vector_store=vector_store, k=query.TOP_K),
+    }
+    yield resources
+    manifest.close()
+    if resources["lexical_index"] is not None:
+        resources["lexical_index"].close()
+
+def ingest(name):
+    """What an ingest in another process leaves behind: lexical rows and a manifest entry."""
+    index = LexicalIndex()
+    index.add([f"{name}-0"], [SimpleNamespace(page_content=f"{name} pump torque", metadata={"source": name})])
+    index.close()
+    manifest = IngestManifest()
+    manifest.finalize_file(name, "hash", 1)
+    manifest.close()
+
+def test_nothing_reloads_while_stores_are_unchanged(resources):
+    assert not query.refresh_stores(resources)
+    assert resources["vector_store"].refreshes == 0
+
+def test_first_ingest_turns_on_hybrid_retrieval(resources, monkeypatch):
+    monkeypatch.setattr("retrieval.RETRIEVAL_MODE", "hybrid")
+    assert resources["lexical_index"] is None
+
+    ingest("a.pdf")
+    assert query.refresh_stores(resources)
+    assert resources["vector_store"].refreshes == 1
+    assert resources["lexical_index"].chunk_count() == 1
+    assert isinstance(resources["retriever"], HybridRetriever)
+    assert not query.refresh_stores(resources)
+
+def test_delete_in_another_process_is_noticed(resources):
+    ingest("a.pdf")
+    query.refresh_stores(resources)
+
+    manifest = IngestManifest()
+    manifest.remove_file("a.pdf")
+    manifest.close()
+    assert query.refresh_stores(resources)
+    assert resources["vector_store"].refreshes == 2
@@ -0,0 +1,80 @@
+import pytest
+
+from metrics import Metrics
+from sections import build_sections, section_chunks
+
+BODY = 10.0
+HEADING = 16.0
+INSTALLATION = "Mount the pump on a level base and align the shaft. " * 6
+TORQUE = "Tighten the flange bolts to 12 Nm in a cross pattern. " * 6
+
+def page(number, *lines):
+    """A page with layout from (text, font size) lines."""
+    return number, "\n".join(text for text, _ in lines), [(text, size, 400) for text, size in lines]
+
+def body(text):
+    return text, BODY
+
+def heading(text):
+    return text, HEADING
+
+def whole(text):
+    return [text]
+
+def test_folded_section_keeps_its_heading():
+    pages = [page(0, heading("Installation"), body(INSTALLATION)), page(1, heading("Warranty"), body("Two years."))]
+    chunks = section_chunks(build_sections(pages), whole)
+    assert len(chunks) == 1
+    assert chunks[0]["section"] == "Installation; Warranty"
+    assert (chunks[0]["page"], chunks[0]["page_end"]) == (0, 1)
+    assert chunks[0]["text"].endswith("Warranty\nTwo years.")
+
+def test_section_is_not_folded_when_the_chunk_would_overflow():
+    pages = [page(0, heading("Installation"), body(INSTALLATION)), page(1, heading("Warranty"), body("Two years."))]
+    chunks = section_chunks(build_sections(pages), whole, max_chars=len(INSTALLATION) + 20)
+    assert [chunk["section"] for chunk in chunks] == ["Installation", "Warranty"]
+
+def test_open_heading_carries_into_the_next_page_range():
+    sections = build_sections([page(50, body(TORQUE))], title="Installation")
+    assert [section["title"] for section in sections] == ["Installation"]
+
+    # A range that opens with a heading leaves no empty section for the carried one
+    sections = build_sections([page(50, heading("Warranty"), body(TORQUE))], title="Installation")
+    assert [section["title"] for section in sections] == ["Warranty"]
+
+class WholeSplitter:
+    def split_text(self, text):
+        return [text]
+
+def chunk_two_ranges(first_heading="Installation", arrival=(0, 1)):
+    """Section-chunk a two-page file parsed as two tasks arriving in the given order."""
+    import ingest
+
+    tasks = [("manual.pdf", 0, 1), ("manual.pdf", 1, 2)]
+    state = ingest.new_file_state("manual.pdf", "hash", {}, tasks)
+    parsed = [
+        {"filepath": "manual.pdf", "start": 0, "end": 1, "backend": "fake", "error": None,
+         "pages": [page(0, heading(first_heading), body(INSTALLATION))]},
+        {"filepath": "manual.pdf", "start": 1, "end": 2, "backend": "fake", "error": None,
+         "pages": [page(1, body(TORQUE))]},
+    ]
+    batches = list(ingest.iter_chunk_batches([parsed[i] for i in arrival], {"manual.pdf": state}, WholeSplitter(),
+                                             100, Metrics("test"), chunker="sections"))
+    assert state["pending"] == {}
+    return batches
+
+def test_ingest_carries_headings_across_tasks_arriving_out_of_order():
+    pytest.importorskip("langchain_core")
+    chunks = [chunk for batch in chunk_two_ranges(arrival=(1, 0)) for chunk in batch["chunks"]]
+    assert [chunk.metadata["page"] for chunk in chunks] == [0, 1]
+    assert [chunk.metadata.get("section") for chunk in chunks] == ["Installation", "Installation"]
+
+def test_carried_heading_is_part_of_the_page_hash():
+    pytest.importorskip("langchain_core")
+
+    def second_range_hash(first_heading):
+        pages = [row for batch in chunk_two_ranges(first_heading) for row in batch["pages"]]
+        return {page_number: page_hash for _, page_number, page_hash, _ in pages}[1]
+
+    # Renaming the heading re-chunks the next range too, so its chunks pick up the new name
+    assert second_range_hash("Installation") != second_range_hash("Setup")
@@ -0,0 +1,62 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from manifest import IngestManifest
+from selection import SelectionResolver
+
+STORED = "/app/docs/manual.pdf"
+CHUNKS = [
+    "The XR-200 pump must be primed before first use by filling the housing with clean water up to the marked line.",
+    "Battery packs are covered by the warranty for five years provided they are charged with the supplied charger only.",
+]
+
+class StubStore:
+    """Vector store with the chunks of one stored path; a full scan fails the test."""
+
+    def __init__(self):
+        self.requested = []
+
+    def source_counts(self):
+        raise AssertionError("resolving a selection must not scan the whole store")
+
+    def source_chunks(self, source):
+        self.requested.append(source)
+        if source != STORED:
+            return [], []
+        return CHUNKS, [[1.0, 0.0], [0.0, 1.0]]
+
+@pytest.fixture
+def manifest(tmp_path):
+    manifest = IngestManifest(str(tmp_path / "manifest.sqlite3"))
+    yield manifest
+    manifest.close()
+
+def test_selection_uses_stored_path_from_manifest(manifest):
+    manifest.finalize_file("manual.pdf", "hash-1", 2, stored_source=STORED)
+    store = StubStore()
+    resolver = SelectionResolver(store, manifest=manifest)
+
+    vector, details = resolver.resolve(CHUNKS[0], "manual.pdf")
+    assert details["fast_path"]
+    assert vector == pytest.approx([1.0, 0.0])
+    assert store.requested == [STORED]
+
+def test_reingest_from_another_path_keeps_both(manifest):
+    manifest.finalize_file("manual.pdf", "hash-1", 2, stored_source=STORED)
+    manifest.finalize_file("manual.pdf", "hash-2", 2, stored_source="/tmp/manual.pdf")
+    assert manifest.stored_sources("manual.pdf") == [STORED, "/tmp/manual.pdf"]
+
+def test_legacy_entry_is_embedded_until_path_recorded(manifest):
+    manifest.finalize_file("manual.pdf", "hash-1", 2)
+    store = StubStore()
+    resolver = SelectionResolver(store, manifest=manifest)
+
+    vector, details = resolver.resolve(CHUNKS[0], "manual.pdf")
+    assert vector is None
+    assert store.requested == []
+
+    # An ingest that skips the unchanged file fills in the path
+    manifest.record_stored_source("manual.pdf", STORED)
+    vector, details = resolver.resolve(CHUNKS[0], "manual.pdf")
+    assert details["fast_path"]
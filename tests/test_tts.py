@@ -0,0 +1,130 @@
+import os
+import threading
+import time
+import wave
+
+import pytest
+
+import tts
+from clip_cache import CachedTTS, ClipCache
+from tts import PCM_FORMAT, SAMPLE_WIDTH, FakeTTS, ProgressiveWavWriter, SynthesisPipeline, synthesize_lines
+
+class GatedTTS:
+    """Returns a clip of len(text) frames; texts listed in gates wait for their event."""
+
+    def __init__(self, gates=None):
+        self.gates = gates or {}
+
+    def synthesize(self, text, voice):
+        if text in self.gates:
+            assert self.gates[text].wait(5)
+        return text.encode() * SAMPLE_WIDTH
+
+def frames(path):
+    with wave.open(str(path), "rb") as wav:
+        return wav.getnframes()
+
+def test_progressive_writer_flushes_without_further_submits(tmp_path):
+    path = tmp_path / "podcast.wav"
+    release = threading.Event()
+    writer = ProgressiveWavWriter(str(path))
+    pipeline = SynthesisPipeline(GatedTTS({"bb": release}), workers=2, max_retries=0, on_clip=writer.add)
+    pipeline.submit("a", "F")
+    pipeline.submit("bb", "M")
+    pipeline.futures[0].result()
+
+    # Line 0 is on disk while line 1 is still synthesizing, with no later submit or poll
+    pipeline.executor.submit(lambda: None).result()
+    assert frames(path) == 1
+
+    release.set()
+    clips, stats = pipeline.finish()
+    assert writer.close()["clips"] == 2
+    assert frames(path) == 3
+    assert stats["failed_lines"] == []
+
+def test_progressive_writer_keeps_dialogue_order(tmp_path):
+    path = tmp_path / "podcast.wav"
+    release = threading.Event()
+    writer = ProgressiveWavWriter(str(path))
+    pipeline = SynthesisPipeline(GatedTTS({"x": release}), workers=3, max_retries=0, on_clip=writer.add)
+    for text in ("x", "yy", "zzz"):
+        pipeline.submit(text, "F")
+    pipeline.futures[2].result()
+    # Later lines are held back until the first one is written
+    assert frames(path) == 0
+    assert writer.ready.keys() <= {1, 2}
+
+    release.set()
+    pipeline.finish()
+    writer.close()
+    with wave.open(str(path), "rb") as wav:
+        assert wav.readframes(6) == b"".join(text.encode() * SAMPLE_WIDTH for text in ("x", "yy", "zzz"))
+
+class StaggeredTTS(FakeTTS):
+    """Earlier lines take longest, so they finish last."""
+
+    def synthesize(self, text, voice):
+        time.sleep(0.01 * (5 - int(text)))
+        return f"{voice}:{text}".encode()
+
+def test_synthesize_lines_keeps_dialogue_order():
+    lines = [(str(i), "F" if i % 2 else "M") for i in range(5)]
+    clips, stats = synthesize_lines(StaggeredTTS(), lines, workers=5, max_retries=0)
+    assert clips == [f"{voice}:{text}".encode() for text, voice in lines]
+    assert stats["lines"] == 5
+    assert stats["failed_lines"] == []
+
+def test_failed_lines_are_retried(monkeypatch):
+    monkeypatch.setattr(tts.time, "sleep", lambda seconds: None)
+    provider = FakeTTS(failure_rate=0.3, seed=1)
+    lines = [(f"line {i}", "F") for i in range(8)]
+    clips, stats = synthesize_lines(provider, lines, workers=2, max_retries=20)
+    assert all(clips)
+    assert stats["failed_lines"] == []
+    assert provider.calls > len(lines)
+
+def test_lines_failing_every_retry_are_reported(monkeypatch):
+    monkeypatch.setattr(tts.time, "sleep", lambda seconds: None)
+    provider = FakeTTS(failure_rate=1.0)
+    clips, stats = synthesize_lines(provider, [("a", "F"), ("b", "M")], workers=2, max_retries=2)
+    assert clips == [None, None]
+    assert stats["failed_lines"] == [0, 1]
+    assert provider.calls == 6
+
+@pytest.fixture
+def clip_cache(tmp_path):
+    return ClipCache(str(tmp_path / "clips"), max_bytes=1000)
+
+def small_clips():
+    return FakeTTS(seconds_per_char=0.0005)
+
+def test_cached_clip_skips_the_provider(clip_cache):
+    provider = small_clips()
+    cached = CachedTTS(provider, clip_cache, PCM_FORMAT)
+    first = cached.synthesize("Hello  there", "F")
+    # Whitespace differences are the same clip
+    assert cached.synthesize(" Hello there\n", "F") == first
+    assert provider.calls == 1
+    assert clip_cache.stats()["hits"] == 1
+
+def test_voice_and_format_are_part_of_the_key(clip_cache):
+    provider = small_clips()
+    CachedTTS(provider, clip_cache, PCM_FORMAT).synthesize("Hello", "F")
+    CachedTTS(provider, clip_cache, PCM_FORMAT).synthesize("Hello", "M")
+    CachedTTS(provider, clip_cache, "riff-24khz-16bit-mono-pcm").synthesize("Hello", "F")
+    assert provider.calls == 3
+
+def test_clip_cache_evicts_least_recently_used(clip_cache):
+    for i, key in enumerate("abc"):
+        clip_cache.put(key, b"x" * 300)
+        os.utime(clip_cache._path(key), (i, i))
+    assert clip_cache.get("a") is not None  # refreshes "a"
+    clip_cache.put("d", b"x" * 300)
+    assert clip_cache.stats()["evictions"] == 1
+    assert clip_cache.get("b") is None
+    assert clip_cache.get("a") is not None
+
+def test_clip_cache_size_survives_restart(clip_cache):
+    clip_cache.put("a", b"x" * 300)
+    assert ClipCache(clip_cache.directory, max_bytes=1000).total_bytes == 300